@@ -1,10 +1,35 @@
-from nearai.agents.environment import Environment
-import requests
 import time
 import json
 import os
+import atexit
 import random
+import tempfile
 from datetime import datetime
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:  # Only for the run() annotation: the runtime passes the environment in
+    from nearai.agents.environment import Environment
+
+from sharded_scan import ShardedRouteTable
+from cycle_detector import CycleDetector, format_cycle
+from price_feed import create_session, fetch_prices, CoinMarketCapSource, ExchangeTickerSource
+from price_store import PriceStore
+from monitoring import PriceMonitor
+from timeseries import TimeSeriesStore, parse_window
+from rolling_stats import StatsEngine, RunningStats
+from order_book import OrderBookStore, best_fill
+from market_sim import MarketSimulator
+from execution import TradeExecutor, build_adapters
+from rate_limiter import RequestScheduler, PRIORITY_MARKET_DATA, PRIORITY_DASHBOARD
+from pipeline import OpportunityPipeline
+from history_store import HistoryStore
+from render_cache import FragmentCache
+from output import split_output_flag, columns_from_records, to_json
+from intent_router import IntentRouter, changes_state
+from config_snapshot import ConfigSnapshot
+from instrumentation import PerfRecorder
 
 #####################################################################
 # USER CONFIGURATION SECTION - MODIFY THESE VALUES
@@ -39,7 +64,10 @@ DEFAULT_CONFIG = {
     "min_profit": 1.0,       # Minimum profit percentage to consider an opportunity
     "trade_amount": 100,     # Amount in USDT per operation
     "max_daily_trades": 10,  # Maximum number of daily trades
-    "auto_trading": False    # Automatic trading disabled by default
+    "auto_trading": False,   # Automatic trading disabled by default
+    "min_spread_sigma": 0,   # Only report spreads this many std devs above their rolling mean (0 = off)
+    "alerts": False,         # Push a reply as soon as a new opportunity appears
+    "output": "text"         # Reply format: "text" or "json" (compact, column-oriented)
 }
 
 # Trading pairs to monitor - Add or remove pairs as needed
@@ -78,6 +106,11 @@ EXCHANGES = {
     }
 }
 
+# Simulated exchange prices: seed (same seed, same prices in every turn) and
+# ticks per second (the variations change once per tick)
+SIMULATION_SEED = 42
+SIMULATION_TICK_RATE = 0.1
+
 # Symbol mapping for CoinMarketCap (some may have different names)
 SYMBOL_MAPPING = {
     "BTC": "BTC",
@@ -93,178 +126,721 @@ SYMBOL_MAPPING = {
 # Cache duration for price data (in seconds)
 CACHE_DURATION = 60
 
+# Per-symbol cache durations (in seconds); volatile assets are refreshed more often.
+# Symbols not listed here use CACHE_DURATION
+SYMBOL_CACHE_DURATIONS = {
+    "USDT": 600,
+    "BTC": 60,
+    "ETH": 60,
+    "XRP": 45,
+    "ADA": 45,
+    "DOT": 45,
+    "NEAR": 30,
+    "SOL": 30
+}
+
+# Prices older than this (in seconds) are refreshed before answering instead of in
+# the background, and a turn waits up to PRICE_REFRESH_WAIT seconds after its reply
+# for the background refreshes it started, so they reach the persisted cache
+PRICE_MAX_STALENESS = 600
+PRICE_REFRESH_WAIT = 5
+
+# Directory for files kept between agent turns (price cache). Can be overridden
+# with the ARBITRAGE_AGENT_DATA_DIR environment variable
+DATA_DIR = os.environ.get(
+    "ARBITRAGE_AGENT_DATA_DIR", os.path.join(tempfile.gettempdir(), "crypto_arbitrage_agent")
+)
+PRICE_CACHE_FILE = os.path.join(DATA_DIR, "price_cache.sqlite3")
+
+# Recorded L2 order book snapshots (JSON lines), loaded at startup if the file exists
+ORDER_BOOK_FILE = os.path.join(DATA_DIR, "order_books.jsonl")
+
+# Opportunity and trade history (SQLite, kept between turns)
+HISTORY_FILE = os.path.join(DATA_DIR, "history.sqlite3")
+
+# CoinMarketCap quotes endpoint
+COINMARKETCAP_API_URL = "https://pro-api.coinmarketcap.com/v1/cryptocurrency/quotes/latest"
+
+# Limits per CoinMarketCap request: symbols (one call credit per 100) and length of the symbol list
+COINMARKETCAP_MAX_SYMBOLS = 100
+COINMARKETCAP_MAX_QUERY_LENGTH = 2000
+
+# Optional public ticker endpoints per exchange. Live prices from these endpoints
+# replace the simulated ones. Example:
+# "binance": "https://api.binance.com/api/v3/ticker/price"
+EXCHANGE_TICKER_URLS = {}
+
+# Optional ticker WebSocket streams per exchange, in the message format of stream_feed.py.
+# Streamed prices take precedence over every other source while they're at most
+# STREAM_MAX_AGE seconds old; the first price lookup of a turn waits up to
+# STREAM_SNAPSHOT_WAIT seconds for each stream's initial snapshot. Example:
+# "binance": "wss://market-stream.example.com/binance"
+EXCHANGE_STREAM_URLS = {}
+STREAM_MAX_AGE = 5
+STREAM_SNAPSHOT_WAIT = 2
+
+# Optional trading API base URLs per exchange. Exchanges with credentials and a URL
+# here send real orders (see execution.py); the others are paper traded. Example:
+# "binance": "https://trading-gateway.example.com/binance"
+EXCHANGE_API_URLS = {}
+
+# Rate limits per API: requests (tokens) per second and burst size. A CoinMarketCap
+# request takes one token per call credit; exchange endpoints take their weight below.
+# Trade orders wait ahead of market data requests, which wait ahead of dashboard refreshes.
+RATE_LIMITS = {
+    "coinmarketcap": {"rate": 0.5, "burst": 5},  # 30 calls per minute
+    "binance": {"rate": 20, "burst": 50},        # 1200 request weight per minute
+    "kucoin": {"rate": 10, "burst": 30},
+    "kraken": {"rate": 1, "burst": 15},
+    "okx": {"rate": 10, "burst": 20}
+}
+ENDPOINT_WEIGHTS = {
+    ("binance", "ticker"): 4,  # All-symbol ticker
+    ("kucoin", "ticker"): 2
+}
+
+# Seconds each leg of a trade may take before it's cancelled (and the other leg unwound)
+TRADE_LEG_TIMEOUT = 5
+
+# Monitoring: seconds between samples, seconds between progress replies, maximum duration
+MONITOR_CHECK_INTERVAL = 10  # Check every 10 seconds (to not overload the API)
+MONITOR_PROGRESS_INTERVAL = 60
+MONITOR_MAX_DURATION = 300
+
+# Free-form messages ("scan please", "dashboard btc") are resolved to commands
+# locally; only messages the router can't place go to the LLM. Monitors asked
+# for without a duration run for MONITOR_DEFAULT_DURATION seconds
+INTENT_ROUTING = True
+MONITOR_DEFAULT_DURATION = 60
+
+# History retention: days of opportunities and trades kept, raw price samples kept per (pair, exchange)
+# and rollup buckets kept per resolution in seconds (10 minutes of 1s, 1 day of 1m, 30 days of 1h)
+HISTORY_RETENTION_DAYS = 90
+PRICE_HISTORY_POINTS = 1000
+PRICE_HISTORY_ROLLUPS = {1: 600, 60: 1440, 3600: 720}
+
+# Rolling statistics over the last STATS_WINDOW price snapshots, EWMA weight of the newest snapshot
+STATS_WINDOW = 60
+STATS_EWMA_ALPHA = 0.1
+
+# An open opportunity stays open (no new alert or trade) until its profit drops
+# this many percentage points below min_profit
+ALERT_HYSTERESIS = 0.1
+
+# Latest records shown by the history and trades commands
+OPPORTUNITIES_SHOWN = 10
+TRADES_SHOWN = 20
+
+# Number of best (buy exchange, sell exchange) routes reported per pair
+TOP_ROUTES_PER_PAIR = 3
+
+# Maximum number of trades/transfers in a multi-hop arbitrage loop
+MAX_CYCLE_HOPS = 4
+
+# Between full searches, only the loops of changed prices are searched again, which can
+# miss a loop that became profitable through unchanged pairs; a full search runs at least
+# every CYCLE_FULL_SEARCH_UPDATES price changes and every CYCLE_FULL_SEARCH_SECONDS seconds
+CYCLE_FULL_SEARCH_UPDATES = 1000
+CYCLE_FULL_SEARCH_SECONDS = 60
+
+# Rendered dashboard rows and sections kept for reuse while their prices are unchanged
+DASHBOARD_CACHE_SIZE = 20000
+
+# Worker processes scoring the route table in shards (0 = in-process, None = every core).
+# Only tables of at least SHARDED_SCAN_MIN_PAIRS pairs are sharded
+SCAN_WORKERS = 0
+SHARDED_SCAN_MIN_PAIRS = 2000
+
+# Per-stage latency histograms and counters (fetch, cache, spreads, execution, rendering, LLM),
+# kept between turns in PERF_FILE. 'perf profile COMMAND' lists the PROFILE_TOP_FUNCTIONS
+# functions with the most cumulative time and saves the full profile to PROFILE_FILE.
+# Setting the ARBITRAGE_AGENT_INSTRUMENTATION environment variable to 0 turns it off
+INSTRUMENTATION = os.environ.get("ARBITRAGE_AGENT_INSTRUMENTATION", "1") != "0"
+PERF_FILE = os.path.join(DATA_DIR, "perf.sqlite3")
+PROFILE_FILE = os.path.join(DATA_DIR, "profile.prof")
+PROFILE_TOP_FUNCTIONS = 15
+
 #####################################################################
 # SYSTEM VARIABLES - DO NOT MODIFY BELOW THIS LINE
 #####################################################################
 
-# For storing history of opportunities and operations
-arbitrage_history = []
-trades_history = []
+# Stage latencies and counters of every turn, saved when the turn ends
+perf_recorder = PerfRecorder(PERF_FILE, INSTRUMENTATION)
+atexit.register(perf_recorder.flush)
+
+# Pair and symbol lookups of TRADING_PAIRS, built once instead of splitting pairs in every call
+config_snapshot = ConfigSnapshot(TRADING_PAIRS)
+
+# History of opportunities and operations, persisted to HISTORY_FILE and indexed by time, pair and exchange
+history_store = HistoryStore(HISTORY_FILE)
+atexit.register(history_store.flush_open_routes)  # Open route changes are written once per turn (see run)
+
+# Records past HISTORY_RETENTION_DAYS are deleted in one batch once the oldest is a day
+# past it, so a turn normally only reads the oldest timestamp (an index lookup)
+oldest_record = history_store.oldest()
+if oldest_record is not None and oldest_record < time.time() - (HISTORY_RETENTION_DAYS + 1) * 86400:
+    history_store.prune(time.time() - HISTORY_RETENTION_DAYS * 86400)
 
 # Current configuration (initialized with default values)
 current_config = DEFAULT_CONFIG.copy()
 
-# Price cache to avoid repeated API calls
-price_cache = {}
-price_cache_timestamp = 0
+# Price cache to avoid repeated API calls (each symbol has its own timestamp and TTL).
+# It's persisted to PRICE_CACHE_FILE so every turn starts with the latest prices
+price_cache = PriceStore(CACHE_DURATION, SYMBOL_CACHE_DURATIONS, PRICE_CACHE_FILE)
 
-def get_token_prices():
-    """Gets current token prices from CoinMarketCap"""
-    global price_cache, price_cache_timestamp
-    
-    # If cache is recent, use it
-    current_time = time.time()
-    if current_time - price_cache_timestamp < CACHE_DURATION and price_cache:
-        return price_cache
+# Latest prices reported by exchange tickers: {exchange: {symbol: price}}
+exchange_price_cache = {}
+
+# L2 order books per (exchange, pair), used to size trades by depth
+order_books = OrderBookStore()
+if os.path.exists(ORDER_BOOK_FILE):
+    try:
+        order_books.load(ORDER_BOOK_FILE)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Couldn't load order books: {str(e)}")
+
+# Pooled keep-alive HTTP session shared by all price sources (created on the first request)
+http_session = None
+
+# Streaming exchange tickers (started on the first price lookup when EXCHANGE_STREAM_URLS is set)
+stream_feed = None
+
+# CoinMarketCap source (chunked, single-flight requests and credit counters)
+coinmarketcap_source = CoinMarketCapSource(
+    COINMARKETCAP_API_KEY, COINMARKETCAP_API_URL, SYMBOL_MAPPING,
+    max_symbols=COINMARKETCAP_MAX_SYMBOLS, max_query_length=COINMARKETCAP_MAX_QUERY_LENGTH
+)
+
+# Rate limits and priority lanes shared by every API call
+request_scheduler = RequestScheduler(RATE_LIMITS, ENDPOINT_WEIGHTS)
+
+# Executes both legs of a trade in parallel through per-exchange adapters with pooled sessions
+trade_executor = TradeExecutor(
+    build_adapters(EXCHANGE_CREDENTIALS, EXCHANGE_API_URLS, TRADE_LEG_TIMEOUT, request_scheduler),
+    TRADE_LEG_TIMEOUT
+)
+
+# Shared table scoring every exchange route of every pair (fee constants are computed once here).
+# Sharded, the workers also pick out the routes above the pipeline threshold while scoring
+route_table = ShardedRouteTable(
+    EXCHANGES, SCAN_WORKERS, SHARDED_SCAN_MIN_PAIRS,
+    candidate_filter=lambda: (TOP_ROUTES_PER_PAIR, current_config["min_profit"] - ALERT_HYSTERESIS)
+)
+atexit.register(route_table.close)
+EXCHANGE_NAMES = route_table.exchange_names
+
+# Background price monitors by pair
+active_monitors = {}
+
+# Intent router for TRADING_PAIRS (rebuilt when they change), how messages were
+# answered and how long LLM completions take
+intent_router = None
+message_stats = {"commands": 0, "routed": 0, "llm": 0}
+llm_latency = RunningStats()
+
+# Price history per (pair, exchange), bounded by PRICE_HISTORY_POINTS and PRICE_HISTORY_ROLLUPS
+price_history = TimeSeriesStore(PRICE_HISTORY_POINTS, PRICE_HISTORY_ROLLUPS)
+price_history_version = None
+
+# Rolling statistics of prices per (pair, exchange) and of spreads per (pair, buy exchange, sell exchange)
+price_stats = StatsEngine(STATS_WINDOW, STATS_EWMA_ALPHA)
+spread_stats = StatsEngine(STATS_WINDOW, STATS_EWMA_ALPHA)
+stats_keys = ([], [], [])  # (pairs, price keys, spread keys)
+
+# Streaming detection: price tick -> route table -> threshold -> hysteresis -> sinks
+# (the stage functions are defined below, so they're looked up when a tick arrives).
+# The open routes are kept in the history file, so they stay open across turns
+opportunity_pipeline = OpportunityPipeline(
+    score=lambda tick: update_route_table(tick["pairs"], tick["prices"], tick["version"], tick["record_history"]),
+    select=lambda table, timestamp, min_profit: filter_opportunities(table, timestamp, min_profit),
+    entry=lambda: current_config["min_profit"],
+    exit=lambda: current_config["min_profit"] - ALERT_HYSTERESIS,
+    sinks=[
+        lambda events, timestamp: record_opportunities(events, timestamp),
+        lambda events, timestamp: auto_trade_opportunities(events, timestamp),
+        lambda events, timestamp: alert_opportunities(events, timestamp)
+    ],
+    load=lambda: history_store.open_routes(),
+    save=lambda settings, opened, closed, reset: history_store.save_open_routes(settings, opened, closed, reset)
+)
+pipeline_env = None  # Where alerts and trade notifications go (the latest environment seen)
+
+# Dashboard fragments, re-rendered only when their inputs (prices, profits) change. Price ages
+# change every second, so they're formatted on every render, outside the cached fragments.
+# The cache lives in this process: it pays off across monitor samples and repeated dashboards
+# of a long-running agent, while a fresh per-turn process renders every fragment once
+dashboard_fragments = FragmentCache(DASHBOARD_CACHE_SIZE)
+
+# Currency graph for multi-hop arbitrage (built once, prices are updated in place),
+# the version of the route table it was last updated from and that table's prices
+cycle_detector = None
+cycle_detector_version = None
+cycle_detector_prices = None
+
+# Simulator of exchange prices around the reference price
+market_simulator = MarketSimulator(EXCHANGES, SIMULATION_SEED, SIMULATION_TICK_RATE)
+
+# Simulated price variation factors, only valid for the current simulator tick
+variation_cache = {}
+variation_cache_tick = None
+
+def get_price_sources():
+    """Builds the list of price sources: CoinMarketCap plus the configured exchange tickers"""
+    # The CoinMarketCap source is shared so concurrent refreshes can join requests in flight
+    coinmarketcap_source.api_key = COINMARKETCAP_API_KEY
+    coinmarketcap_source.url = COINMARKETCAP_API_URL
+    coinmarketcap_source.scheduler = request_scheduler
+    sources = [coinmarketcap_source]
+    for exchange, url in EXCHANGE_TICKER_URLS.items():
+        if exchange in EXCHANGES:
+            source = ExchangeTickerSource(exchange, url, TRADING_PAIRS)
+            source.scheduler = request_scheduler
+            sources.append(source)
+    return sources
+
+def get_config_snapshot():
+    """Gets the lookup tables of the current configuration (rebuilt in memory if TRADING_PAIRS changed)"""
+    global config_snapshot
     
-    # Extract unique symbols that we need to look up
-    symbols_to_fetch = set()
-    for pair in TRADING_PAIRS:
-        base, quote = pair.split('-')
-        symbols_to_fetch.add(base)
-        symbols_to_fetch.add(quote)
+    if config_snapshot.pairs != TRADING_PAIRS:
+        config_snapshot = ConfigSnapshot(TRADING_PAIRS)
+    return config_snapshot
+
+def get_http_session():
+    """Gets the shared HTTP session, creating it (and importing requests) on first use"""
+    global http_session
     
-    # Map symbols to CoinMarketCap IDs
-    symbols_list = ",".join(SYMBOL_MAPPING.get(symbol, symbol) for symbol in symbols_to_fetch)
+    if http_session is None:
+        http_session = create_session()
+    return http_session
+
+def get_stream_feed():
+    """Gets the ticker streams of the exchanges in EXCHANGE_STREAM_URLS, starting them on first use (None without streams)"""
+    global stream_feed
     
-    try:
-        url = "https://pro-api.coinmarketcap.com/v1/cryptocurrency/quotes/latest"
-        parameters = {
-            "symbol": symbols_list,
-            "convert": "USD"  # Use USD as base currency
-        }
-        headers = {
-            "Accepts": "application/json",
-            "X-CMC_PRO_API_KEY": COINMARKETCAP_API_KEY
-        }
-        
-        response = requests.get(url, headers=headers, params=parameters, timeout=10)
-        data = response.json()
-        
-        if "data" not in data:
-            print(f"Error getting prices from CoinMarketCap: {data.get('status', {}).get('error_message', 'Unknown error')}")
-            return price_cache  # Return old cache if there's an error
-            
-        # Update the cache
-        prices = {}
-        for symbol in symbols_to_fetch:
-            mapped_symbol = SYMBOL_MAPPING.get(symbol, symbol)
-            if mapped_symbol in data["data"]:
-                prices[symbol] = float(data["data"][mapped_symbol]["quote"]["USD"]["price"])
-        
-        price_cache = prices
-        price_cache_timestamp = current_time
-        
-        return prices
+    if stream_feed is None and EXCHANGE_STREAM_URLS:
+        from stream_feed import StreamingFeed  # Sockets and hashing are only imported by turns that stream
         
-    except Exception as e:
-        print(f"Error querying CoinMarketCap: {str(e)}")
+        urls = {exchange: url for exchange, url in EXCHANGE_STREAM_URLS.items() if exchange in EXCHANGES}
+        stream_feed = StreamingFeed(urls, get_symbols_to_fetch(), STREAM_MAX_AGE)
+        stream_feed.start(STREAM_SNAPSHOT_WAIT)
+        atexit.register(stream_feed.stop)
+    return stream_feed
+
+def get_symbols_to_fetch():
+    """Gets the unique symbols (bases and quotes) of all trading pairs"""
+    return get_config_snapshot().symbols
+
+@perf_recorder.timed("fetch")
+def refresh_token_prices(symbols, priority=PRIORITY_MARKET_DATA):
+    """
+    Fetches prices for the given symbols and merges them into the cache as each source answers.
+    Requests wait for their rate limit in the given priority lane.
+    """
+    symbols = set(symbols)
+    received = set()
+    
+    def merge_prices(source, result):
+        if isinstance(source, ExchangeTickerSource):
+            exchange_price_cache.setdefault(source.exchange, {}).update(result)
+        else:
+            # Only the symbols in the response are updated; the others keep their entry
+            price_cache.update(result, source.name)
+            received.update(result)
+    
+    # Query all sources concurrently; a slow exchange ticker doesn't delay CoinMarketCap
+    report = fetch_prices(get_price_sources(), get_http_session(), symbols, merge_prices, priority)
+    for name, outcome in report.items():
+        perf_recorder.record(f"fetch.{name}", outcome["latency"])
+        if not outcome["ok"]:
+            perf_recorder.count("fetch.errors")
+            print(f"Error querying {name}: {outcome['error']}")
+    
+    if report[CoinMarketCapSource.name]["ok"]:
+        price_cache.mark_missing(symbols - received)
+    
+    # If this is the first time and there's no cache, create sample data
+    elif not len(price_cache):
+        # Reference prices (only as fallback if API fails)
+        price_cache.update({
+            "BTC": 62000.0,
+            "ETH": 3400.0,
+            "XRP": 0.58,
+            "NEAR": 1.78,
+            "SOL": 145.0,
+            "ADA": 0.45,
+            "DOT": 7.40,
+            "USDT": 1.0
+        }, "reference")
+        print("Using reference prices due to API error")
+    
+    return report
+
+def get_token_prices(priority=PRIORITY_MARKET_DATA):
+    """
+    Gets current token prices from CoinMarketCap (and the configured exchange tickers).
+    Expired prices are served right away while a background refresh runs.
+    """
+    symbols = get_symbols_to_fetch()
+    
+    # Cold cache: there's nothing to serve yet, so wait for the API
+    if not len(price_cache):
+        perf_recorder.count("cache.cold")
+        refresh_token_prices(symbols, priority)
+        return price_cache.prices()
+    
+    # Far too old (e.g. left by a turn that exited mid-refresh): wait for the API
+    too_old = price_cache.expired(symbols, max_age=PRICE_MAX_STALENESS)
+    if too_old:
+        perf_recorder.count("cache.too_old")
+        refresh_token_prices(too_old, priority)
+    
+    # Warm cache: refresh expired and newly added symbols without blocking
+    with perf_recorder.timer("cache"):
+        outdated = price_cache.expired(symbols) + price_cache.missing(symbols)
+        perf_recorder.count("cache.stale" if outdated else "cache.fresh")
+        if outdated:
+            price_cache.refresh_in_background(lambda symbols: refresh_token_prices(symbols, priority), outdated)
         
-        # If this is the first time and there's no cache, create sample data
-        if not price_cache:
-            # Reference prices (only as fallback if API fails)
-            price_cache = {
-                "BTC": 62000.0,
-                "ETH": 3400.0,
-                "XRP": 0.58,
-                "NEAR": 1.78,
-                "SOL": 145.0,
-                "ADA": 0.45,
-                "DOT": 7.40,
-                "USDT": 1.0
-            }
-            price_cache_timestamp = current_time
-            print("Using reference prices due to API error")
-            
-        return price_cache
+        return price_cache.prices()
+
+def resolve_pair(name):
+    """A bare symbol ('BTC') stands for the only trading pair with that base; other names are returned as is"""
+    snapshot = get_config_snapshot()
+    if name in snapshot.pair_set or '-' in name:
+        return name
+    matches = snapshot.pairs_by_base.get(name, [])
+    return matches[0] if len(matches) == 1 else name
+
+def format_price_age(symbol, short=False):
+    """
+    Formats how old the cached price of a symbol is, e.g. '12s' or '95s (stale)'.
+    The short form marks stale prices with '*' and reference prices with 'ref'
+    """
+    return format_age(price_cache.staleness(symbol), short)
+
+def format_price_ages(symbols):
+    """Short and long price ages of several symbols, {symbol: (short, long)}, from one staleness lookup each"""
+    now = time.time()
+    ages = {}
+    for symbol in symbols:
+        info = price_cache.staleness(symbol, now)
+        ages[symbol] = (format_age(info, True), format_age(info))
+    return ages
+
+def format_age(info, short=False):
+    """Formats a price_cache.staleness() result (see format_price_age)"""
+    if info is None:
+        return "-" if short else "not available"
+    
+    age = int(info["age"])
+    text = f"{age}s" if age < 3600 else f"{age // 60}m"
+    if info["source"] == "reference":
+        return "ref" if short else f"{text} (reference prices)"
+    if info["stale"]:
+        if short:
+            return text + "*"
+        text += " (stale, refreshing)" if info["refreshing"] else " (stale)"
+    return text
+
+def get_exchange_variation(exchange, symbol, tick):
+    """Gets the simulated price variation (%) of a symbol in an exchange for a simulator tick"""
+    # The variation is within the configured range and only depends on the seed,
+    # symbol, exchange and tick, so it's the same in every turn and process
+    return float(market_simulator.variations([symbol], tick)[0, EXCHANGE_NAMES.index(exchange)])
 
 def get_exchange_price(exchange, symbol, base_price):
     """Simulates the price in a specific exchange based on CoinMarketCap price"""
-    min_var, max_var = EXCHANGES[exchange]["price_variance"]
-    
-    # Generate a variation within the configured range
-    # We use a hash based on the exchange, symbol and current time (rounded to 5 minutes)
-    # to maintain consistency during short periods of time
-    seed = f"{exchange}{symbol}{time.time()//300}"
-    hash_value = hash(seed) % 10000
-    variation = min_var + (max_var - min_var) * (hash_value / 10000)
-    
-    # Apply variation to base price
-    return base_price * (1 + variation / 100)
+    # Streamed prices, then live ticker prices, take precedence over simulated ones
+    if stream_feed is not None:
+        streamed = stream_feed.price(exchange, symbol)
+        if streamed is not None:
+            return streamed
+    live_price = exchange_price_cache.get(exchange, {}).get(symbol)
+    if live_price is not None:
+        return live_price
+    
+    # Apply the variation of the current tick to the base price
+    factors = get_variation_factors((symbol,))
+    return base_price * float(factors[0, EXCHANGE_NAMES.index(exchange)])
 
-def find_arbitrage_opportunities(env):
-    """Searches for arbitrage opportunities between exchanges using CoinMarketCap data"""
-    opportunities = []
-    
+def get_variation_factors(symbols):
+    """Gets the (symbols x exchanges) price factors of the current simulator tick, cached within the tick"""
+    global variation_cache, variation_cache_tick
+    
+    tick = market_simulator.tick_at(time.time())
+    if tick != variation_cache_tick:
+        variation_cache = {}
+        variation_cache_tick = tick
+    
+    key = tuple(symbols)
+    factors = variation_cache.get(key)
+    if factors is None:
+        factors = 1 + market_simulator.variations(symbols, tick) / 100
+        variation_cache[key] = factors
+    return factors
+
+def get_exchange_price_matrix(symbols, base_prices):
+    """Simulates the prices of several symbols on every exchange as a (symbols x exchanges) matrix"""
+    # Variations only change once per tick, so the factor matrix is reused within a tick
+    factors = get_variation_factors(symbols)
+    
+    bases = np.array([base_prices[symbol] for symbol in symbols], dtype=np.float64)
+    prices = bases[:, None] * factors
+    
+    # Order book mid prices, then live ticker prices, then fresh streamed prices take precedence over simulated ones
+    for j, exchange in enumerate(EXCHANGE_NAMES):
+        for live_prices in (
+            order_books.mid_prices(exchange) if len(order_books) else None,
+            exchange_price_cache.get(exchange),
+            stream_feed.prices(exchange) if stream_feed is not None else None
+        ):
+            if live_prices:
+                for i, symbol in enumerate(symbols):
+                    if symbol in live_prices:
+                        prices[i, j] = live_prices[symbol]
+    
+    return prices
+
+def get_route_table(priority=PRIORITY_MARKET_DATA):
+    """Gets the shared route table, rescoring it only when prices have changed"""
     # Get base prices from CoinMarketCap
-    base_prices = get_token_prices()
+    base_prices = get_token_prices(priority)
     if not base_prices:
-        return []
+        return None
     
-    for pair in TRADING_PAIRS:
-        pair_prices = {}
-        base, quote = pair.split('-')
+    # Simulated exchange prices change with the cache and every simulator tick, streamed ones with every
+    # update and when they expire (checked a few times per STREAM_MAX_AGE, so a dead stream's prices are dropped)
+    streams = get_stream_feed()
+    now = time.time()
+    version = (
+        price_cache.version, order_books.version, market_simulator.tick_at(now), tuple(TRADING_PAIRS),
+        (streams.version, streams.freshness(now)) if streams else None
+    )
+    if route_table.version == version:
+        # Same prices: the pipeline only re-runs detection if the settings changed
+        return publish_prices(route_table.pairs, route_table.prices, version)
+    
+    # Keep only the pairs we have prices for
+    pairs = []
+    bases = []
+    for pair, (base, quote) in get_config_snapshot().pair_parts.items():
         
         # If we don't have the price for either coin, skip
         if base not in base_prices or quote not in base_prices:
             print(f"Missing price for {base} or {quote}, skipping pair {pair}")
             continue
         
-        # Calculate base price in USDT
-        base_price_usd = base_prices[base]
-        
-        # Simulate prices on different exchanges
-        for exchange_name, config in EXCHANGES.items():
-            exchange_price = get_exchange_price(exchange_name, base, base_price_usd)
-            pair_prices[exchange_name] = exchange_price
-        
-        # Identify the best exchange to buy and sell
-        min_exchange = min(pair_prices, key=pair_prices.get)
-        max_exchange = max(pair_prices, key=pair_prices.get)
-        
-        min_price = pair_prices[min_exchange]
-        max_price = pair_prices[max_exchange]
-        
-        # Calculate percentage difference
-        price_diff = ((max_price - min_price) / min_price) * 100
-        
-        # Estimate fees based on exchange configuration
-        buy_fee_pct = EXCHANGES[min_exchange]["fee"]
-        sell_fee_pct = EXCHANGES[max_exchange]["fee"]
-        withdrawal_fee_pct = EXCHANGES[min_exchange]["withdrawal_fee"]
+        pairs.append(pair)
+        bases.append(base)
+    
+    # Simulate prices on all exchanges and score every route at once
+    prices = get_exchange_price_matrix(bases, base_prices)
+    return publish_prices(pairs, prices, version)
+
+def publish_prices(pairs, prices, version, timestamp=None, record_history=True):
+    """Pushes a (pairs x exchanges) price tick through the opportunity pipeline; returns the route table"""
+    opportunity_pipeline.push({
+        "pairs": pairs,
+        "prices": prices,
+        "version": version,
+        "settings": pipeline_settings(),
+        "timestamp": timestamp or datetime.now().isoformat(),
+        "record_history": record_history
+    })
+    return route_table
+
+def update_route_table(pairs, prices, version, record_history=True):
+    """
+    Scores a (pairs x exchanges) price matrix into the shared route table.
+    
+    Each price snapshot (version) is also added once to the rolling statistics
+    and, with record_history, to the price history.
+    """
+    global price_history_version, stats_keys
+    
+    with perf_recorder.timer("spreads"):
+        route_table.update(pairs, prices, version)
+    
+    if price_history_version != version:
+        start = time.perf_counter()
+
+        # (pair, exchange) and (pair, buy, sell) keys only change with the pairs
+        if stats_keys[0] != pairs:
+            stats_keys = (
+                list(pairs),
+                [(pair, exchange_name) for pair in pairs for exchange_name in EXCHANGE_NAMES],
+                [(pair, buy, sell) for pair in pairs for buy in EXCHANGE_NAMES for sell in EXCHANGE_NAMES]
+            )
+        _, price_keys, spread_keys = stats_keys
         
-        buy_fee = min_price * (buy_fee_pct / 100)
-        sell_fee = max_price * (sell_fee_pct / 100)
-        withdrawal_fee = min_price * (withdrawal_fee_pct / 100)
+        if record_history:
+            price_history.append_many(zip(price_keys, prices.ravel().tolist()))
+        price_stats.update(price_keys, prices.ravel())
+        spread_stats.update(spread_keys, route_table.diff_percent.ravel())
+        price_history_version = version
+        perf_recorder.record("statistics", time.perf_counter() - start)
+    
+    return route_table
+
+def find_arbitrage_opportunities(env):
+    """Searches for arbitrage opportunities between exchanges using CoinMarketCap data"""
+    # New opportunities found on the way are recorded and auto-traded by the pipeline sinks
+    set_pipeline_env(env)
+    table = get_route_table()
+    if table is None:
+        return []
+    
+    return filter_opportunities(table)
+
+@perf_recorder.timed("detect")
+def filter_opportunities(table, timestamp=None, min_profit=None):
+    """Picks the opportunities worth reporting from a scored route table (min_profit defaults to the configured one)"""
+    opportunities = []
+    
+    # Keep the best routes that meet the minimum profit and are positive
+    timestamp = timestamp or datetime.now().isoformat()
+    min_profit = current_config["min_profit"] if min_profit is None else min_profit
+    min_sigma = current_config["min_spread_sigma"]
+    for route in table.top_routes(TOP_ROUTES_PER_PAIR, min_profit):
+        # How unusual the spread is compared with its rolling mean
+        zscore = spread_stats.zscore((route["pair"], route["buy_exchange"], route["sell_exchange"]))
+        if min_sigma > 0 and not zscore >= min_sigma:
+            continue
         
-        # Calculate profit after fees
-        net_gain = max_price - min_price - buy_fee - sell_fee - withdrawal_fee
-        net_gain_percent = (net_gain / min_price) * 100
+        # With order books for both exchanges, size the trade by walking the depth
+        depth = evaluate_route_depth(route)
+        if depth is not None and (not depth or depth["profit_percent"] < min_profit):
+            continue  # Slippage eats the spread
         
-        # Check if it meets the minimum profit configured and is positive
-        if net_gain_percent > 0 and net_gain_percent >= current_config["min_profit"]:
-            opportunity = {
-                "pair": pair,
-                "buy_exchange": min_exchange,
-                "buy_price": min_price,
-                "sell_exchange": max_exchange,
-                "sell_price": max_price,
-                "diff_percent": price_diff,
-                "net_gain_percent": net_gain_percent,
-                "timestamp": datetime.now().isoformat()
-            }
-            opportunities.append(opportunity)
-            arbitrage_history.append(opportunity)
-            
-            # If auto-trading is enabled, execute the trade
-            if current_config["auto_trading"] and len(trades_history) < current_config["max_daily_trades"]:
-                execute_trade(opportunity, env)
+        opportunities.append(dict(route, timestamp=timestamp, spread_zscore=zscore, depth=depth))
     
     return opportunities
 
+def pipeline_settings():
+    """The detection settings: a change re-runs detection on the current prices (open routes below the new threshold close)"""
+    return {key: current_config[key] for key in ("min_profit", "min_spread_sigma")}
+
+def set_pipeline_env(env):
+    """Sets the environment that pipeline alerts and auto-trade notifications are sent to"""
+    global pipeline_env
+    if env is not None:
+        pipeline_env = env
+
+def record_opportunities(events, timestamp):
+    """Pipeline sink: adds every new opportunity to the history"""
+    history_store.add_opportunities([opportunity for kind, opportunity in events if kind == "open"])
+
+def auto_trade_opportunities(events, timestamp):
+    """Pipeline sink: trades new opportunities when auto-trading is enabled (only the best route of each pair)"""
+    if not current_config["auto_trading"]:
+        return
+    for kind, opportunity in events:
+        # The daily cap counts the trades of the opportunity's calendar day
+        if kind == "open" and opportunity["rank"] == 1 and history_store.trades_on_day(opportunity["timestamp"]) < current_config["max_daily_trades"]:
+            execute_trade(opportunity, pipeline_env)
+
+def alert_opportunities(events, timestamp):
+    """Pipeline sink: pushes a reply listing new opportunities when alerts are enabled"""
+    if not current_config["alerts"] or pipeline_env is None:
+        return
+    opened = [opportunity for kind, opportunity in events if kind == "open"]
+    if not opened:
+        return
+    
+    alert = f"🚨 {len(opened)} new arbitrage {'opportunity' if len(opened) == 1 else 'opportunities'}:\n"
+    for opportunity in opened:
+        alert += f"- {opportunity['pair']}: buy on {opportunity['buy_exchange'].upper()} at ${opportunity['buy_price']:.4f}, "
+        alert += f"sell on {opportunity['sell_exchange'].upper()} at ${opportunity['sell_price']:.4f} "
+        alert += f"({opportunity['net_gain_percent']:.2f}% after fees)\n"
+    pipeline_env.add_reply(alert.rstrip())
+
+def evaluate_route_depth(route):
+    """
+    Finds the profit-maximizing size of a route from the order books of both exchanges.
+    
+    Returns None without books for both exchanges, {} if no size is profitable
+    and the best_fill result (VWAP prices, size, profit) otherwise.
+    """
+    if not len(order_books):
+        return None
+    
+    buy_book = order_books.get(route["buy_exchange"], route["pair"])
+    sell_book = order_books.get(route["sell_exchange"], route["pair"])
+    if buy_book is None or sell_book is None:
+        return None
+    
+    buy_index = EXCHANGE_NAMES.index(route["buy_exchange"])
+    sell_index = EXCHANGE_NAMES.index(route["sell_exchange"])
+    fill = best_fill(
+        buy_book.asks, sell_book.bids,
+        route_table.buy_cost_factor[buy_index], route_table.sell_value_factor[sell_index],
+        max_cost=current_config["trade_amount"]
+    )
+    return fill or {}
+
+def get_cycle_detector():
+    """Gets the currency graph with the latest prices, building it only when the trading pairs or exchanges change"""
+    global cycle_detector, cycle_detector_version, cycle_detector_prices
+    
+    table = get_route_table()
+    if table is None:
+        return None
+    
+    if cycle_detector is None or cycle_detector.pairs != TRADING_PAIRS or list(cycle_detector.trade_fee) != list(EXCHANGE_NAMES):
+        cycle_detector = CycleDetector(
+            EXCHANGES, TRADING_PAIRS, MAX_CYCLE_HOPS, CYCLE_FULL_SEARCH_UPDATES, CYCLE_FULL_SEARCH_SECONDS
+        )
+        cycle_detector_version = cycle_detector_prices = None
+    
+    if cycle_detector_version != table.version:
+        prices = np.nan_to_num(np.array(table.prices, dtype=float), nan=0.0)
+        previous = cycle_detector_prices
+        if previous is None or previous[0] != table.pairs or previous[1].shape != prices.shape:
+            # Different pairs: reload every edge weight (the next search is a full one)
+            cycle_detector.load_prices(table.pairs, prices, table.exchange_names)
+        else:
+            # Same pairs: only the changed prices are applied, and only their loops searched again
+            rows, columns = np.nonzero(prices != previous[1])
+            cycle_detector.update_prices(
+                (table.exchange_names[j], table.pairs[i], prices[i, j])
+                for i, j in zip(rows.tolist(), columns.tolist())
+            )
+        cycle_detector_version = table.version
+        cycle_detector_prices = (list(table.pairs), prices)
+    
+    return cycle_detector
+
+def find_arbitrage_cycles():
+    """Searches for profitable multi-hop loops within one exchange and across exchanges"""
+    detector = get_cycle_detector()
+    if detector is None:
+        return []
+    
+    with perf_recorder.timer("cycles"):
+        return detector.cycles(current_config["min_profit"])
+
+@perf_recorder.timed("render.cycles")
+def format_cycles(cycles):
+    """Formats multi-hop arbitrage loops to display to the user"""
+    if not cycles:
+        return "No profitable multi-hop arbitrage loops found at this time."
+    
+    result = "🔁 Multi-hop arbitrage loops detected:\n\n"
+    
+    for i, cycle in enumerate(cycles[:10], 1):
+        scope = "cross-exchange" if cycle["cross_exchange"] else "single exchange"
+        result += f"#{i} - {cycle['hops']} hops ({scope})\n"
+        result += f"   {format_cycle(cycle)}\n"
+        result += f"   Profit after fees: {cycle['profit_percent']:.2f}%\n\n"
+    
+    result += "Note: This information does not constitute financial advice."
+    
+    return result
+
+@perf_recorder.timed("execution")
 def execute_trade(opportunity, env):
-    """Executes an arbitrage trade (simulated)"""
-    # In a real implementation, this would call the trading APIs
+    """Executes an arbitrage trade: both legs at once, unwinding any fill mismatch"""
     trade = {
         "pair": opportunity["pair"],
         "buy_exchange": opportunity["buy_exchange"],
@@ -274,11 +850,38 @@ def execute_trade(opportunity, env):
         "amount": current_config["trade_amount"],
         "profit": opportunity["net_gain_percent"],
         "profit_amount": (current_config["trade_amount"] * opportunity["net_gain_percent"]) / 100,
-        "timestamp": datetime.now().isoformat(),
-        "status": "completed"  # In a real implementation, could be "pending", "completed", "failed"
+        "timestamp": opportunity.get("timestamp") or datetime.now().isoformat()
     }
+    quantity = trade["amount"] / trade["buy_price"]
+    
+    # Sized by order book depth: fill at VWAP prices instead of the top of the book
+    depth = opportunity.get("depth")
+    if depth:
+        trade.update({
+            "buy_price": depth["buy_vwap"],
+            "sell_price": depth["sell_vwap"],
+            "amount": depth["cost"],
+            "profit": depth["profit_percent"],
+            "profit_amount": depth["profit"]
+        })
+        quantity = depth["quantity"]
+    
+    # Both legs are limit orders at the quoted prices
+    execution = trade_executor.execute([
+        {"exchange": trade["buy_exchange"], "pair": trade["pair"], "side": "buy", "quantity": quantity, "price": trade["buy_price"]},
+        {"exchange": trade["sell_exchange"], "pair": trade["pair"], "side": "sell", "quantity": quantity, "price": trade["sell_price"]}
+    ])
+    trade["status"] = execution["status"]
+    trade["execution_ms"] = execution["elapsed"] * 1000
+    if execution["status"] != "completed":
+        settle_trade(trade, execution)
+    
+    trade["id"] = history_store.add_trade(trade)
     
-    trades_history.append(trade)
+    if execution["status"] != "completed":
+        if env is not None:
+            env.add_reply(format_execution_failure(trade, execution))
+        return trade
     
     # Notify the user
     notification = f"🔄 Trade executed automatically:\n"
@@ -288,10 +891,64 @@ def execute_trade(opportunity, env):
     notification += f"on {trade['sell_exchange'].upper()} at ${trade['sell_price']:.4f}\n"
     notification += f"Estimated profit: ${trade['profit_amount']:.2f} ({trade['profit']:.2f}%)"
     
-    env.add_reply(notification)
+    if env is not None:
+        env.add_reply(notification)
     
     return trade
 
+def settle_trade(trade, execution):
+    """Replaces the expected profit of a trade with what its fills and unwinds actually made"""
+    buy_leg, sell_leg = execution["legs"]
+    buy = EXCHANGE_NAMES.index(trade["buy_exchange"])
+    sell = EXCHANGE_NAMES.index(trade["sell_exchange"])
+    buy_cost = route_table.buy_cost_factor[buy]
+    sell_value = route_table.sell_value_factor[sell]
+    
+    matched = execution["matched"]
+    profit = 0.0
+    if matched > 0:
+        profit = matched * (sell_leg["average_price"] * sell_value - buy_leg["average_price"] * buy_cost)
+        trade["buy_price"] = buy_leg["average_price"]
+        trade["sell_price"] = sell_leg["average_price"]
+    
+    # Unwinding the excess of one leg costs the price move since it filled, plus trading fees:
+    # the excess is traded back on the exchange it filled on, so it's never withdrawn
+    for unwind in execution["unwinds"]:
+        if not unwind["filled"]:
+            continue
+        if unwind["side"] == "sell":
+            profit += unwind["filled"] * (
+                unwind["average_price"] * route_table.sell_value_factor[buy]
+                - buy_leg["average_price"] * route_table.trade_cost_factor[buy]
+            )
+        else:
+            profit += unwind["filled"] * (
+                sell_leg["average_price"] * sell_value
+                - unwind["average_price"] * route_table.trade_cost_factor[sell]
+            )
+    
+    trade["amount"] = matched * trade["buy_price"]
+    trade["profit_amount"] = float(profit)
+    trade["profit"] = profit / trade["amount"] * 100 if trade["amount"] else 0.0
+
+def format_execution_failure(trade, execution):
+    """Formats the notification of a trade whose legs didn't both fill"""
+    icons = {"partial": "⚠️", "failed": "❌", "unresolved": "🚨"}
+    result = f"{icons.get(execution['status'], '❌')} Trade {execution['status']}: {trade['pair']} "
+    result += f"{trade['buy_exchange'].upper()} → {trade['sell_exchange'].upper()}\n"
+    for leg in execution["legs"] + execution["unwinds"]:
+        label = "Unwind" if leg in execution["unwinds"] else leg["side"].capitalize()
+        result += f"{label} on {leg['exchange'].upper()}: {leg['filled']:.6f}/{leg['quantity']:.6f} filled"
+        result += f" in {leg['latency'] * 1000:.0f} ms"
+        if leg["error"]:
+            result += f" ({leg['error']})"
+        result += "\n"
+    if execution["status"] == "unresolved":
+        result += "Some exposure may still be open: check your exchange accounts.\n"
+    result += f"Realized profit: ${trade['profit_amount']:.2f}"
+    return result
+
+@perf_recorder.timed("render.scan")
 def format_opportunities(opportunities):
     """Formats opportunities to display to the user"""
     if not opportunities:
@@ -303,13 +960,34 @@ def format_opportunities(opportunities):
         result += f"#{i} - Pair: {op['pair']}\n"
         result += f"   Buy on: {op['buy_exchange'].upper()} at ${op['buy_price']:.4f}\n"
         result += f"   Sell on: {op['sell_exchange'].upper()} at ${op['sell_price']:.4f}\n"
-        result += f"   Potential profit: {op['diff_percent']:.2f}%\n\n"
+        result += f"   Potential profit: {op['diff_percent']:.2f}%\n"
+        if op.get("spread_zscore") == op.get("spread_zscore"):  # Not NaN
+            result += f"   Spread vs. rolling mean: {op['spread_zscore']:+.1f}σ\n"
+        if op.get("depth"):
+            depth = op["depth"]
+            result += f"   Executable size: {depth['quantity']:.6f} {op['pair'].split('-')[0]} for ${depth['cost']:.2f} "
+            result += f"(VWAP ${depth['buy_vwap']:.4f} → ${depth['sell_vwap']:.4f}, "
+            result += f"profit ${depth['profit']:.2f} / {depth['profit_percent']:.2f}% after slippage and fees)\n"
+        result += "\n"
     
     result += "Note: This information does not constitute financial advice. "
     result += "Consider trading fees, withdrawal fees and risks before executing any trade."
     
     return result
 
+def format_order_books():
+    """Formats the loaded order books: best bid/ask and depth per (exchange, pair)"""
+    if not len(order_books):
+        return f"No order books loaded. Use 'orderbooks load [PATH]' (default: {ORDER_BOOK_FILE})."
+    
+    result = "📚 Order books:\n\n"
+    for (exchange_name, pair), book in sorted(order_books.books.items()):
+        result += f"{exchange_name.upper()} {pair}: "
+        result += f"bid ${book.bids.best or 0:.4f} ({len(book.bids)} levels, {book.bids.depth:.4f} deep), "
+        result += f"ask ${book.asks.best or 0:.4f} ({len(book.asks)} levels, {book.asks.depth:.4f} deep)\n"
+    
+    return result
+
 def get_agent_status():
     """Gets the current status of the agent"""
     status = "📊 Current Status of Arbitrage Agent:\n\n"
@@ -319,36 +997,92 @@ def get_agent_status():
     status += f"- Minimum profit percentage: {current_config['min_profit']}%\n"
     status += f"- Amount per trade: {current_config['trade_amount']} USDT\n"
     status += f"- Maximum daily trades: {current_config['max_daily_trades']}\n"
-    status += f"- Auto-trading: {'ENABLED' if current_config['auto_trading'] else 'DISABLED'}\n\n"
+    status += f"- Auto-trading: {'ENABLED' if current_config['auto_trading'] else 'DISABLED'}\n"
+    status += f"- Opportunity alerts: {'ENABLED' if current_config['alerts'] else 'DISABLED'}\n"
+    if current_config["min_spread_sigma"] > 0:
+        status += f"- Spread filter: {current_config['min_spread_sigma']}σ above rolling mean\n"
+    status += "\n"
     
     # Configured exchanges
     status += "Configured exchanges:\n"
     for exchange in EXCHANGES:
         has_credentials = bool(EXCHANGE_CREDENTIALS[exchange]["api_key"])
-        status += f"- {exchange}: {'✓' if has_credentials else '✗'}\n"
+        mode = "paper trading" if trade_executor.adapters[exchange].simulated else "live orders"
+        status += f"- {exchange}: {'✓' if has_credentials else '✗'} ({mode})\n"
     
     # Price information
-    cache_time = "Not available" if price_cache_timestamp == 0 else datetime.fromtimestamp(price_cache_timestamp).strftime('%H:%M:%S')
+    last_updated = price_cache.last_updated
+    cache_time = "Not available" if last_updated == 0 else datetime.fromtimestamp(last_updated).strftime('%H:%M:%S')
     status += f"\nLast price update: {cache_time}\n"
-    status += f"Trades today: {len(trades_history)}/{current_config['max_daily_trades']}\n"
+    symbols = get_symbols_to_fetch()
+    status += f"Stale prices: {len(price_cache.expired(symbols))}/{len(symbols)}\n"
+    status += f"Trades today: {history_store.trades_on_day()}/{current_config['max_daily_trades']}\n"
+    status += f"Order books loaded: {len(order_books)}\n"
+    
+    execution_stats = trade_executor.stats
+    if execution_stats["trades"]:
+        status += f"Trade executions: {execution_stats['completed']} completed, {execution_stats['partial']} partial, "
+        status += f"{execution_stats['failed']} failed, {execution_stats['unresolved']} unresolved\n"
+    
+    status += format_intent_stats()
+    status += format_perf_stats()
+    
+    # Ticker streams: connection, sequence gaps (each one resynced from a snapshot) and update lag
+    if stream_feed is not None:
+        for exchange, stream in stream_feed.stats().items():
+            status += f"Stream {exchange}: {'connected' if stream['connected'] else 'disconnected'}, "
+            status += f"{stream['updates']:,} updates, {stream['gaps']} gaps, {stream['snapshots']} snapshots, "
+            status += f"{stream['reconnects']} reconnects"
+            if stream["lag_p50"] is not None:
+                status += f", lag p50 {format_latency(stream['lag_p50'])} / p99 {format_latency(stream['lag_p99'])}"
+            if not stream["connected"] and stream["last_error"]:
+                status += f" (last error: {stream['last_error']})"
+            status += "\n"
+    
+    if route_table.workers > 0:
+        scan_stats = route_table.stats
+        status += f"Sharded scans: {scan_stats['sharded']} on {route_table.workers} workers "
+        status += f"({scan_stats['local']} in-process below {route_table.min_pairs} pairs)\n"
     
     # If API key is configured
     status += f"\nCoinMarketCap API: {'✓ Configured' if COINMARKETCAP_API_KEY != 'YOUR_API_KEY_HERE' else '✗ Not configured'}\n"
     
+    # Request coalescing counters
+    cmc_stats = coinmarketcap_source.stats
+    status += f"CoinMarketCap requests: {cmc_stats['requests']} "
+    status += f"(credits used: {cmc_stats['credits_used']}, credits saved: {cmc_stats['credits_saved']}, "
+    status += f"shared symbols: {cmc_stats['symbols_shared']})\n"
+    
+    # Rate limits: queue depth and wait times of the APIs used so far
+    for source, limit in request_scheduler.stats().items():
+        if not limit["requests"]:
+            continue
+        status += f"Rate limit {source}: {limit['requests']} requests, queue {limit['queue_depth']} (max {limit['max_queue_depth']})"
+        for lane, waits in limit["lanes"].items():
+            status += f", {lane} wait p50 {waits['wait_p50'] * 1000:.0f} ms / p99 {waits['wait_p99'] * 1000:.0f} ms"
+        status += "\n"
+    
     return status
 
-def format_trades_history():
-    """Formats the history of executed trades"""
-    if not trades_history:
+@perf_recorder.timed("render.trades")
+def format_trades_history(pair=None, exchange=None, window=None):
+    """Formats the latest executed trades, optionally of a pair and/or exchange over the last window seconds"""
+    since = time.time() - window if window else None
+    trades = history_store.trades(pair, exchange, since, limit=TRADES_SHOWN)
+    if not trades:
         return "No trade history available."
     
-    result = "📝 Trade History:\n\n"
+    total = history_store.count_trades(pair, exchange, since)
+    result = f"📝 Trade History{format_history_filters(pair, exchange, window)}:\n"
+    if total > len(trades):
+        result += f"(latest {len(trades)} of {total})\n"
+    result += "\n"
     
-    for i, trade in enumerate(trades_history, 1):
+    for i, trade in enumerate(trades, total - len(trades) + 1):
         result += f"#{i} - {trade['timestamp'][:19]} - {trade['pair']}\n"
         result += f"   Buy: {trade['buy_exchange'].upper()} at ${trade['buy_price']:.4f}\n"
         result += f"   Sell: {trade['sell_exchange'].upper()} at ${trade['sell_price']:.4f}\n"
-        result += f"   Amount: ${trade['amount']} USDT\n"
+        result += f"   Amount: ${trade['amount']:.2f} USDT\n"
         result += f"   Profit: ${trade['profit_amount']:.2f} ({trade['profit']:.2f}%)\n"
         result += f"   Status: {trade['status']}\n\n"
     
@@ -361,13 +1095,12 @@ def setup_coinmarketcap_api(api_key):
     if api_key and api_key != "YOUR_API_KEY_HERE":
         COINMARKETCAP_API_KEY = api_key
         # Force cache update to test the new API key
-        global price_cache_timestamp
-        price_cache_timestamp = 0
+        price_cache.invalidate()
         
         # Try to get prices to verify the API key works
         try:
-            prices = get_token_prices()
-            if prices:
+            report = refresh_token_prices(get_symbols_to_fetch())
+            if report[CoinMarketCapSource.name]["ok"]:
                 return f"✅ CoinMarketCap API Key configured successfully. Data retrieved successfully."
             else:
                 return f"⚠️ API Key configured, but couldn't get data. Verify the key and API access."
@@ -376,101 +1109,90 @@ def setup_coinmarketcap_api(api_key):
     else:
         return f"❌ Invalid API Key. Please provide a valid API key."
 
+OPPORTUNITIES_TABLE_HEADER = (
+    "💰 ARBITRAGE OPPORTUNITIES\n"
+    "┌─────────┬─────────────┬────────────┬─────────────┬────────────┬──────────┬────────┐\n"
+    "│   PAIR  │   BUY ON    │   PRICE    │   SELL ON   │   PRICE    │  PROFIT  │  AGE   │\n"
+    "├─────────┼─────────────┼────────────┼─────────────┼────────────┼──────────┼────────┤\n"
+)
+OPPORTUNITIES_TABLE_FOOTER = "└─────────┴─────────────┴────────────┴─────────────┴────────────┴──────────┴────────┘\n\n"
+
+def format_opportunity_row(op):
+    """One row of the dashboard_all opportunities table, up to the AGE column"""
+    buy_ex = op["buy_exchange"].upper()
+    buy_price = f"${op['buy_price']:.4f}"
+    sell_ex = op["sell_exchange"].upper()
+    sell_price = f"${op['sell_price']:.4f}"
+    profit = f"{op['net_gain_percent']:.2f}%"
+    
+    return f"│ {op['pair'].ljust(7)} │ {buy_ex.ljust(11)} │ {buy_price.ljust(10)} │ {sell_ex.ljust(11)} │ {sell_price.ljust(10)} │ {profit.ljust(8)} │"
+
+def format_opportunities_table(opportunities, ages):
+    """The dashboard_all opportunities table; only rows whose route changed are formatted again (the ages always are)"""
+    rows = [OPPORTUNITIES_TABLE_HEADER]
+    for op in opportunities:
+        age = ages[op["pair"].split('-')[0]][0]
+        rows.append(dashboard_fragments.get(
+            ("opportunity", op["pair"], op["buy_exchange"], op["sell_exchange"]),
+            (op["buy_price"], op["sell_price"], op["net_gain_percent"]),
+            format_opportunity_row, op
+        ))
+        rows.append(f" {age.ljust(6)} │\n")
+    rows.append(OPPORTUNITIES_TABLE_FOOTER)
+    return "".join(rows)
+
+def format_average_prices(bases, base_prices, ages):
+    """The dashboard_all average price lines, one cached line per cryptocurrency"""
+    lines = ["📈 AVERAGE PRICES BY CRYPTOCURRENCY\n"]
+    for base in bases:
+        price = base_prices[base]
+        lines.append(dashboard_fragments.get(("average", base), price, lambda: f"{base}: ${price:.4f}"))
+        lines.append(f" (updated {ages[base][1]} ago)\n")
+    return "".join(lines)
+
+def sorted_opportunities(table):
+    """Best routes of every pair with a positive profit after fees, most profitable first"""
+    opportunities = table.top_routes(TOP_ROUTES_PER_PAIR, min_profit=0)
+    opportunities.sort(key=lambda x: x["net_gain_percent"], reverse=True)
+    return opportunities
+
 def show_dashboard_all(env):
     """Shows a dashboard with all pairs and their arbitrage opportunities"""
-    result = "📊 COMPLETE ARBITRAGE DASHBOARD\n\n"
-    
-    # Get current opportunities
-    opportunities = []
-    
     # Get base prices from CoinMarketCap
-    base_prices = get_token_prices()
-    if not base_prices:
+    base_prices = get_token_prices(PRIORITY_DASHBOARD)
+    table = get_route_table(PRIORITY_DASHBOARD)
+    if table is None:
         return "Couldn't get current prices. Try again later."
+    render_start = time.perf_counter()
     
-    for pair in TRADING_PAIRS:
-        base, quote = pair.split('-')
-        
-        if base not in base_prices:
-            continue
-            
-        base_price = base_prices[base]
-        
-        # Get prices on each exchange
-        exchange_data = []
-        for exchange_name, config in EXCHANGES.items():
-            price = get_exchange_price(exchange_name, base, base_price)
-            
-            # Calculate fees
-            buy_fee_pct = config["fee"]
-            withdrawal_fee_pct = config["withdrawal_fee"]
-            cost_after_fees = price * (1 + buy_fee_pct/100) + price * (withdrawal_fee_pct/100)
-            effective_sell_value = price * (1 - buy_fee_pct/100)
-            
-            exchange_data.append({
-                "exchange": exchange_name,
-                "price": price,
-                "cost_after_fees": cost_after_fees,
-                "effective_sell_value": effective_sell_value
-            })
-        
-        # Calculate the best arbitrage opportunity
-        if len(exchange_data) >= 2:
-            best_sell = max(exchange_data, key=lambda x: x["effective_sell_value"])
-            best_buy = min(exchange_data, key=lambda x: x["cost_after_fees"])
-            
-            # Only if they are different exchanges
-            if best_sell["exchange"] != best_buy["exchange"]:
-                net_profit = best_sell["effective_sell_value"] - best_buy["cost_after_fees"]
-                net_profit_pct = (net_profit / best_buy["price"]) * 100
-                
-                # Only add if profit is positive
-                if net_profit_pct > 0:
-                    opportunities.append({
-                        "pair": pair,
-                        "buy_exchange": best_buy["exchange"],
-                        "buy_price": best_buy["price"],
-                        "sell_exchange": best_sell["exchange"],
-                        "sell_price": best_sell["price"],
-                        "net_profit_pct": net_profit_pct
-                    })
-    
-    # Sort opportunities by potential profit
-    opportunities.sort(key=lambda x: x["net_profit_pct"], reverse=True)
-    
-    # Show opportunities table
+    # Routes are only extracted and sorted again when the table was rescored
+    opportunities = dashboard_fragments.get("opportunities", table.version, sorted_opportunities, table)
+    
+    bases = [base for base in get_config_snapshot().pair_bases if base in base_prices]
+    ages = format_price_ages(set(bases))
+    
+    # Sections are reused as a whole while the table and every price age are unchanged
+    short_ages = tuple(ages[base][0] for base in bases)
+    long_ages = tuple(ages[base][1] for base in bases)
+    result = ["📊 COMPLETE ARBITRAGE DASHBOARD\n\n"]
     if opportunities:
-        result += "💰 ARBITRAGE OPPORTUNITIES\n"
-        result += "┌─────────┬─────────────┬────────────┬─────────────┬────────────┬──────────┐\n"
-        result += "│   PAIR  │   BUY ON    │   PRICE    │   SELL ON   │   PRICE    │  PROFIT  │\n"
-        result += "├─────────┼─────────────┼────────────┼─────────────┼────────────┼──────────┤\n"
-        
-        for op in opportunities:
-            pair = op["pair"]
-            buy_ex = op["buy_exchange"].upper()
-            buy_price = f"${op['buy_price']:.4f}"
-            sell_ex = op["sell_exchange"].upper()
-            sell_price = f"${op['sell_price']:.4f}"
-            profit = f"{op['net_profit_pct']:.2f}%"
-            
-            result += f"│ {pair.ljust(7)} │ {buy_ex.ljust(11)} │ {buy_price.ljust(10)} │ {sell_ex.ljust(11)} │ {sell_price.ljust(10)} │ {profit.ljust(8)} │\n"
-        
-        result += "└─────────┴─────────────┴────────────┴─────────────┴────────────┴──────────┘\n\n"
+        result.append(dashboard_fragments.get(
+            "opportunities table", (table.version, short_ages),
+            format_opportunities_table, opportunities, ages
+        ))
     else:
-        result += "No positive arbitrage opportunities found at this time.\n\n"
+        result.append("No positive arbitrage opportunities found at this time.\n\n")
     
-    # Add summary of average prices
-    result += "📈 AVERAGE PRICES BY CRYPTOCURRENCY\n"
-    for pair in TRADING_PAIRS:
-        base, quote = pair.split('-')
-        if base in base_prices:
-            result += f"{base}: ${base_prices[base]:.4f}\n"
+    result.append(dashboard_fragments.get(
+        "average prices", (bases, [base_prices[base] for base in bases], long_ages),
+        format_average_prices, bases, base_prices, ages
+    ))
     
-    cache_time = "Not available" if price_cache_timestamp == 0 else datetime.fromtimestamp(price_cache_timestamp).strftime('%H:%M:%S')
-    result += f"\nℹ️ Data updated: {cache_time}\n"
-    result += "To see details for a specific pair, use the command 'dashboard [PAIR]'.\n"
+    result.append("\nℹ️ AGE: time since each price was updated (* = stale, refresh in progress)\n")
+    result.append("To see details for a specific pair, use the command 'dashboard [PAIR]'.\n")
     
-    return result
+    perf_recorder.record("render.dashboard_all", time.perf_counter() - render_start)
+    return "".join(result)
 
 def show_dashboard(pair, env):
     """
@@ -478,7 +1200,9 @@ def show_dashboard(pair, env):
     showing ordered prices and other relevant data
     """
     # Check if the pair is valid
-    if pair not in TRADING_PAIRS:
+    pair = resolve_pair(pair)
+    snapshot = get_config_snapshot()
+    if pair not in snapshot.pair_set:
         similar_pairs = [p for p in TRADING_PAIRS if pair.split('-')[0] in p]
         if similar_pairs:
             return f"Pair not recognized. Perhaps you meant one of these? {', '.join(similar_pairs)}"
@@ -486,129 +1210,699 @@ def show_dashboard(pair, env):
             return f"Pair not recognized. Available pairs: {', '.join(TRADING_PAIRS)}"
     
     # Get current prices
-    base_prices = get_token_prices()
+    base_prices = get_token_prices(PRIORITY_DASHBOARD)
     if not base_prices:
         return "Couldn't get current prices. Try again later."
     
-    base, quote = pair.split('-')
+    base, quote = snapshot.pair_parts[pair]
     
     # Check if we have the price for this pair
-    if base not in base_prices:
+    table = get_route_table(PRIORITY_DASHBOARD)
+    if base not in base_prices or table is None or pair not in table.pair_index:
         return f"Couldn't get price for {base}."
     
     base_price = base_prices[base]
+    render_start = time.perf_counter()
     
-    # Get prices on each exchange
-    exchange_data = []
-    for exchange_name, config in EXCHANGES.items():
-        price = get_exchange_price(exchange_name, base, base_price)
-        
-        # Calculate additional data
-        buy_fee_pct = config["fee"]
-        withdrawal_fee_pct = config["withdrawal_fee"]
-        
-        # Calculate total cost including fees to buy 1 unit
-        cost_after_fees = price * (1 + buy_fee_pct/100) + price * (withdrawal_fee_pct/100)
-        
-        # Calculate effective value (price after subtracting selling fees)
-        effective_sell_value = price * (1 - buy_fee_pct/100)
-        
-        # Add to list
-        exchange_data.append({
-            "exchange": exchange_name,
-            "price": price,
-            "trading_fee": buy_fee_pct,
-            "withdrawal_fee": withdrawal_fee_pct,
-            "cost_after_fees": cost_after_fees,
-            "effective_sell_value": effective_sell_value
-        })
+    # Exchange prices of the pair as scored in the shared route table; the
+    # sections built from them are only rendered again when they change
+    prices = tuple(table.prices[table.pair_index[pair]].tolist())
+    best_route = table.best_route(pair)
+    best = best_route and tuple(best_route[key] for key in ("buy_exchange", "sell_exchange", "buy_price", "sell_price", "net_gain_percent"))
     
-    # Sort exchanges by price (high to low)
-    exchange_data.sort(key=lambda x: x["price"], reverse=True)
+    # Generate dashboard in text format
+    dashboard = [f"📊 DASHBOARD: {pair} ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})\n\n"]
     
-    # Calculate the best arbitrage opportunity
-    if len(exchange_data) >= 2:
-        # For buying, we need the exchange with lowest total cost after fees
-        best_buy = min(exchange_data, key=lambda x: x["cost_after_fees"])
-        
-        # For selling, we need the exchange with highest effective value after selling fees
-        best_sell = max(exchange_data, key=lambda x: x["effective_sell_value"])
+    # Reference price
+    dashboard.append(f"📈 Reference price ({base}): ${base_price:.4f}\n\n")
+    
+    dashboard.append(dashboard_fragments.get(("ranking", pair), prices, format_exchange_ranking, prices, table))
+    dashboard.append(dashboard_fragments.get(("best route", pair), best, format_best_route, best_route))
+    dashboard.append(dashboard_fragments.get(("variation", pair), prices, format_variation_stats, prices))
+    
+    # Rolling statistics, maintained incrementally as prices arrive
+    rolling = format_rolling_stats(pair, best_route)
+    if rolling:
+        dashboard.append(f"📐 ROLLING STATISTICS (LAST {STATS_WINDOW} SNAPSHOTS)\n" + rolling + "\n")
+    
+    # Recent price history
+    recent = format_price_history(pair, 3600)
+    if recent:
+        dashboard.append("🕒 PRICE HISTORY (LAST 1H)\n" + recent + "\n")
+    
+    # Note about data updates
+    info = price_cache.staleness(base)
+    cache_time = "Not available" if not info or info["timestamp"] == 0 else datetime.fromtimestamp(info["timestamp"]).strftime('%H:%M:%S')
+    dashboard.append(f"ℹ️ Data updated: {cache_time} ({format_price_age(base)})\n")
+    dashboard.append("To update prices, use the 'scan' command.\n")
+    dashboard.append("To see arbitrage opportunities, use the 'dashboard_all' command.\n")
+    
+    perf_recorder.record("render.dashboard", time.perf_counter() - render_start)
+    return "".join(dashboard)
+
+def format_exchange_ranking(prices, table):
+    """Exchange ranking table of a pair from its (exchanges) prices, highest first, with fees applied"""
+    rows = [
+        "🏆 EXCHANGE RANKING BY PRICE (HIGH TO LOW)\n",
+        "┌─────────────┬────────────┬────────────┬────────────┬────────────┐\n",
+        "│   EXCHANGE  │    PRICE   │    FEE %   │ WITH FEES  │  EFF. SELL │\n",
+        "├─────────────┼────────────┼────────────┼────────────┼────────────┤\n"
+    ]
+    
+    # Cost to buy 1 unit includes the trading and withdrawal fees, the sell value only the trading fee
+    ranking = sorted(range(len(prices)), key=lambda j: prices[j], reverse=True)
+    for j in ranking:
+        exchange_name = EXCHANGE_NAMES[j].upper()
+        price = f"${prices[j]:.4f}"
+        fees = f"{EXCHANGES[EXCHANGE_NAMES[j]]['fee']}%"
+        cost = f"${prices[j] * table.buy_cost_factor[j]:.4f}"
+        eff_value = f"${prices[j] * table.sell_value_factor[j]:.4f}"
         
-        # Only if they are different exchanges
-        if best_sell["exchange"] != best_buy["exchange"]:
-            price_diff = ((best_sell["price"] - best_buy["price"]) / best_buy["price"]) * 100
-            net_profit = best_sell["effective_sell_value"] - best_buy["cost_after_fees"]
-            net_profit_pct = (net_profit / best_buy["price"]) * 100
-        else:
-            price_diff = 0
-            net_profit_pct = 0
+        rows.append(f"│ {exchange_name.ljust(11)} │ {price.ljust(10)} │ {fees.ljust(10)} │ {cost.ljust(10)} │ {eff_value.ljust(10)} │\n")
+    
+    rows.append("└─────────────┴────────────┴────────────┴────────────┴────────────┘\n\n")
+    return "".join(rows)
+
+def format_best_route(best_route):
+    """Best arbitrage opportunity section of a pair dashboard"""
+    if not best_route:
+        return "💰 BEST ARBITRAGE OPPORTUNITY\nNo profitable arbitrage opportunity between different exchanges.\n\n"
+    
+    lines = [
+        "💰 BEST ARBITRAGE OPPORTUNITY\n",
+        f"Buy on: {best_route['buy_exchange'].upper()} at ${best_route['buy_price']:.4f}\n",
+        f"Sell on: {best_route['sell_exchange'].upper()} at ${best_route['sell_price']:.4f}\n",
+        f"Price difference: {best_route['diff_percent']:.2f}%\n"
+    ]
+    if best_route['net_gain_percent'] > 0:
+        lines.append(f"Net profit (after fees): {best_route['net_gain_percent']:.2f}%\n\n")
     else:
-        price_diff = 0
-        net_profit_pct = 0
-        best_buy = None
-        best_sell = None
+        lines.append(f"Net profit (after fees): {best_route['net_gain_percent']:.2f}% ❌ Not profitable\n\n")
+    return "".join(lines)
+
+def format_variation_stats(prices):
+    """Price variation section of a pair dashboard"""
+    max_var = max(prices)
+    min_var = min(prices)
+    avg_var = sum(prices) / len(prices)
+    spread = ((max_var - min_var) / avg_var) * 100
     
-    # Generate dashboard in text format
-    dashboard = f"📊 DASHBOARD: {pair} ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})\n\n"
+    return (
+        "📉 VARIATION STATISTICS\n"
+        f"Maximum price: ${max_var:.4f}\n"
+        f"Minimum price: ${min_var:.4f}\n"
+        f"Average price: ${avg_var:.4f}\n"
+        f"Spread between exchanges: {spread:.2f}%\n\n"
+    )
+
+def format_rolling_stats(pair, best_route=None):
+    """Formats the rolling price statistics of a pair and the spread statistics of its best route"""
+    rows = []
+    for exchange_name in EXCHANGES:
+        stats = price_stats.get((pair, exchange_name))
+        if stats:
+            rows.append(
+                f"{exchange_name.upper()}: mean ${stats['mean']:.4f}, σ ${stats['std']:.4f}, "
+                f"EWMA ${stats['ewma']:.4f}, range ${stats['min']:.4f}-${stats['max']:.4f}\n"
+            )
+    
+    if best_route:
+        stats = spread_stats.get((pair, best_route["buy_exchange"], best_route["sell_exchange"]))
+        if stats:
+            rows.append(
+                f"Spread {best_route['buy_exchange'].upper()} → {best_route['sell_exchange'].upper()}: "
+                f"mean {stats['mean']:.2f}%, σ {stats['std']:.2f}%, EWMA {stats['ewma']:.2f}%"
+            )
+            if stats["zscore"] == stats["zscore"]:  # Not NaN
+                rows.append(f", now {stats['zscore']:+.1f}σ")
+            rows.append("\n")
+    
+    return "".join(rows)
+
+def format_window(seconds):
+    """Formats a window in seconds as '90s', '30m', '24h' or '7d'"""
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size and seconds % size == 0:
+            return f"{int(seconds // size)}{unit}"
+    return f"{int(seconds)}s"
+
+def format_price_history(pair, window):
+    """Formats min/max/average price per exchange for a pair over the last window seconds"""
+    rows = []
+    for exchange_name in EXCHANGES:
+        summary = price_history.summary((pair, exchange_name), window)
+        if summary:
+            change = (summary["last"] - summary["first"]) / summary["first"] * 100
+            rows.append(
+                f"{exchange_name.upper()}: min ${summary['min']:.4f}, max ${summary['max']:.4f}, "
+                f"avg ${summary['mean']:.4f}, change {change:+.2f}% ({summary['count']} samples)\n"
+            )
+    return "".join(rows)
+
+def format_history_filters(pair, exchange, window):
+    """Describes history filters, e.g. ' for BTC-USDT on BINANCE (last 24h)'"""
+    text = f" for {pair}" if pair else ""
+    text += f" on {exchange.upper()}" if exchange else ""
+    text += f" (last {format_window(window)})" if window else ""
+    return text
+
+def parse_history_filters(args):
+    """Parses [PAIR] [EXCHANGE] [WINDOW] in any order; returns (pair, exchange, window) or an error message"""
+    pair = exchange = window = None
+    for arg in args:
+        if arg.upper() in TRADING_PAIRS:
+            pair = arg.upper()
+        elif arg.lower() in EXCHANGES:
+            exchange = arg.lower()
+        elif parse_window(arg) is not None:
+            window = parse_window(arg)
+        else:
+            return f"Unrecognized filter '{arg}'. Use a pair ({', '.join(TRADING_PAIRS)}), an exchange ({', '.join(EXCHANGES)}) or a window (e.g., 30m, 24h)."
+    return pair, exchange, window
+
+@perf_recorder.timed("render.history")
+def format_opportunity_history(pair=None, exchange=None, window=None):
+    """Formats the latest recorded opportunities, optionally of a pair and/or exchange over the last window seconds"""
+    since = time.time() - window if window else None
+    opportunities = history_store.opportunities(pair, exchange, since, limit=OPPORTUNITIES_SHOWN)
+    if not opportunities:
+        return "No arbitrage opportunity history recorded" + format_history_filters(pair, exchange, window) + "."
     
-    # Reference price
-    dashboard += f"📈 Reference price ({base}): ${base_price:.4f}\n\n"
-    
-    # Ordered price table
-    dashboard += "🏆 EXCHANGE RANKING BY PRICE (HIGH TO LOW)\n"
-    dashboard += "┌─────────────┬────────────┬────────────┬────────────┬────────────┐\n"
-    dashboard += "│   EXCHANGE  │    PRICE   │    FEE %   │ WITH FEES  │  EFF. SELL │\n"
-    dashboard += "├─────────────┼────────────┼────────────┼────────────┼────────────┤\n"
-    
-    for data in exchange_data:
-        exchange_name = data["exchange"].upper()
-        price = f"${data['price']:.4f}"
-        fees = f"{data['trading_fee']}%"
-        cost = f"${data['cost_after_fees']:.4f}"
-        eff_value = f"${data['effective_sell_value']:.4f}"
+    total = history_store.count_opportunities(pair, exchange, since)
+    result = f"📊 Arbitrage opportunity history{format_history_filters(pair, exchange, window)}:\n"
+    if total > len(opportunities):
+        result += f"(latest {len(opportunities)} of {total})\n"
+    result += "\n"
+    for i, op in enumerate(opportunities, total - len(opportunities) + 1):
+        result += f"#{i} - {op['timestamp'][:19]} - {op['pair']}: "
+        result += f"{op['diff_percent']:.2f}% ({op['buy_exchange']} → {op['sell_exchange']})\n"
+    
+    return result
+
+def format_pair_history(pair, window, exchange=None):
+    """Formats the opportunities and price history of a pair over the last window seconds"""
+    result = format_opportunity_history(pair, exchange, window)
+    
+    prices = format_price_history(pair, window)
+    result += "\nPrices by exchange:\n" + (prices or "No price samples recorded in this window.\n")
+    
+    return result
+
+def sample_exchange_prices(pair):
+    """Gets the current price of a pair on every exchange"""
+    base, quote = pair.split('-')
+    base_prices = get_token_prices()
+    if base not in base_prices:
+        return {}
+    
+    # Every sample is also a price tick for the opportunity pipeline (alerts, auto-trading)
+    get_route_table()
+    return {
+        exchange_name: get_exchange_price(exchange_name, base, base_prices[base])
+        for exchange_name in EXCHANGES
+    }
+
+def format_monitor_report(monitor):
+    """Formats the statistics collected by a monitor so far"""
+    if monitor.finished:
+        status = "stopped" if monitor.stopped else "completed"
+        report = f"✅ Monitoring {status} for {monitor.pair}:\n\n"
+    else:
+        report = f"⏳ Monitoring {monitor.pair}: {int(monitor.elapsed)}/{monitor.duration} seconds, {monitor.sample_count} samples\n\n"
+    
+    for exchange, stats in monitor.stats.items():
+        if stats.count:
+            report += f"{exchange.upper()}:\n"
+            report += f"  Minimum price: ${stats.min:.4f}\n"
+            report += f"  Maximum price: ${stats.max:.4f}\n"
+            report += f"  Average price: ${stats.mean:.4f}\n"
+            report += f"  Standard deviation: ${stats.std:.4f}\n"
+            report += f"  Volatility: {stats.volatility:.2f}%\n\n"
+    
+    if monitor.finished:
+        report += "Use 'scan' to see current arbitrage opportunities."
+    
+    return report
+
+def start_monitors(pairs, duration, env, structured=False):
+    """Starts one background monitor per pair; progress and results are sent as replies (JSON if structured)"""
+    set_pipeline_env(env)
+    report = (lambda monitor: to_json(monitor_data(monitor))) if structured else format_monitor_report
+    
+    def on_progress(monitor):
+        env.add_reply(report(monitor))
+    
+    def on_finish(monitor):
+        if active_monitors.get(monitor.pair) is monitor:
+            del active_monitors[monitor.pair]
+        env.add_reply(report(monitor))
+    
+    for pair in pairs:
+        # Restarting a pair replaces its previous monitor
+        if pair in active_monitors:
+            active_monitors[pair].stop()
         
-        dashboard += f"│ {exchange_name.ljust(11)} │ {price.ljust(10)} │ {fees.ljust(10)} │ {cost.ljust(10)} │ {eff_value.ljust(10)} │\n"
+        monitor = PriceMonitor(
+            pair, duration, MONITOR_CHECK_INTERVAL, sample_exchange_prices, price_history,
+            on_progress=on_progress, on_finish=on_finish, progress_interval=MONITOR_PROGRESS_INTERVAL
+        )
+        active_monitors[pair] = monitor.start()
+    
+    result = f"📈 Monitoring {', '.join(pairs)} for {duration} seconds in the background.\n"
+    result += f"Progress will be reported every {MONITOR_PROGRESS_INTERVAL} seconds. "
+    result += "Use 'monitor status' to see current statistics or 'monitor stop' to stop."
+    return result
+
+def get_monitors_status():
+    """Reports the statistics of every running monitor"""
+    if not active_monitors:
+        return "No active monitors. Use 'monitor [PAIR] [TIME_IN_SECONDS]' to start one."
+    return "\n".join(format_monitor_report(monitor) for monitor in list(active_monitors.values()))
+
+def stop_monitors(pairs):
+    """Stops the monitors of the given pairs (all monitors if no pair is given)"""
+    pairs = pairs or list(active_monitors)
+    stopped = [pair for pair in pairs if pair in active_monitors]
+    for pair in stopped:
+        active_monitors[pair].stop()
+    
+    if not stopped:
+        return "No matching active monitors."
+    return f"⏹️ Stopping monitors: {', '.join(stopped)}"
+
+def opportunities_data(opportunities):
+    """Structured scan result: the opportunities by column"""
+    return {"opportunities": columns_from_records(opportunities)}
+
+def cycles_data(cycles):
+    """Structured cycles result (nested paths, so one record per loop)"""
+    fields = ("path", "hops", "exchanges", "cross_exchange", "profit_percent")
+    return {"cycles": [{field: cycle[field] for field in fields} for cycle in cycles]}
+
+def history_data(pair=None, exchange=None, window=None):
+    """Structured history: filters, total count, latest opportunities by column and, for a pair, price summaries"""
+    since = time.time() - window if window else None
+    opportunities = history_store.opportunities(pair, exchange, since, limit=OPPORTUNITIES_SHOWN)
+    data = {
+        "filters": {"pair": pair, "exchange": exchange, "window": window},
+        "total": history_store.count_opportunities(pair, exchange, since),
+        "opportunities": columns_from_records(opportunities)
+    }
+    if pair:
+        window = window or 3600
+        data["prices"] = {
+            exchange_name: price_history.summary((pair, exchange_name), window)
+            for exchange_name in EXCHANGES
+        }
+    return data
+
+def trades_data(pair=None, exchange=None, window=None):
+    """Structured trade history: filters, total count and the latest trades by column"""
+    since = time.time() - window if window else None
+    trades = history_store.trades(pair, exchange, since, limit=TRADES_SHOWN)
+    return {
+        "filters": {"pair": pair, "exchange": exchange, "window": window},
+        "total": history_store.count_trades(pair, exchange, since),
+        "trades": columns_from_records(trades)
+    }
+
+def order_books_data():
+    """Structured order book summary, one column per field"""
+    books = sorted(order_books.books.items())
+    return {"order_books": {
+        "exchange": [exchange_name for (exchange_name, _), _ in books],
+        "pair": [pair for (_, pair), _ in books],
+        "best_bid": [book.bids.best for _, book in books],
+        "bid_levels": [len(book.bids) for _, book in books],
+        "bid_depth": [book.bids.depth for _, book in books],
+        "best_ask": [book.asks.best for _, book in books],
+        "ask_levels": [len(book.asks) for _, book in books],
+        "ask_depth": [book.asks.depth for _, book in books]
+    }}
+
+def agent_status_data():
+    """Structured agent status"""
+    symbols = get_symbols_to_fetch()
+    return {
+        "config": dict(current_config),
+        "exchanges": {
+            exchange: {
+                "credentials": bool(EXCHANGE_CREDENTIALS[exchange]["api_key"]),
+                "paper_trading": trade_executor.adapters[exchange].simulated
+            }
+            for exchange in EXCHANGES
+        },
+        "last_price_update": price_cache.last_updated or None,
+        "stale_prices": len(price_cache.expired(symbols)),
+        "symbols": len(symbols),
+        "trades_today": history_store.trades_on_day(),
+        "order_books": len(order_books),
+        "executions": dict(trade_executor.stats),
+        "coinmarketcap_api": COINMARKETCAP_API_KEY != 'YOUR_API_KEY_HERE',
+        "coinmarketcap": dict(coinmarketcap_source.stats),
+        "rate_limits": request_scheduler.stats(),
+        "scan": dict(route_table.stats, workers=route_table.workers, min_pairs=route_table.min_pairs),
+        "streams": stream_feed.stats() if stream_feed is not None else {},
+        "messages": dict(message_stats, router=dict(get_intent_router().stats), llm_latency=llm_latency.mean if llm_latency.count else None),
+        "perf": perf_data()
+    }
+
+def dashboard_data(pair):
+    """Structured pair dashboard: exchange prices with fees, best route and statistics"""
+    base = pair.split('-')[0]
+    base_prices = get_token_prices(PRIORITY_DASHBOARD)
+    table = get_route_table(PRIORITY_DASHBOARD)
+    if not base_prices or base not in base_prices or table is None or pair not in table.pair_index:
+        return {"error": f"Couldn't get price for {base}."}
+    
+    prices = table.prices[table.pair_index[pair]]
+    best_route = table.best_route(pair)
+    info = price_cache.staleness(base)
+    return {
+        "pair": pair,
+        "reference_price": base_prices[base],
+        "price_age": info and info["age"],
+        "exchanges": {
+            "exchange": table.exchange_names,
+            "price": prices,
+            "fee_percent": [EXCHANGES[name]["fee"] for name in table.exchange_names],
+            "cost_after_fees": prices * table.buy_cost_factor,
+            "effective_sell_value": prices * table.sell_value_factor
+        },
+        "best_route": best_route,
+        "rolling": {
+            "prices": {name: price_stats.get((pair, name)) for name in EXCHANGES},
+            "spread": best_route and spread_stats.get((pair, best_route["buy_exchange"], best_route["sell_exchange"]))
+        },
+        "history": {name: price_history.summary((pair, name), 3600) for name in EXCHANGES}
+    }
+
+def dashboard_all_data():
+    """Structured complete dashboard: every route with a positive profit, straight from the route table columns"""
+    base_prices = get_token_prices(PRIORITY_DASHBOARD)
+    table = get_route_table(PRIORITY_DASHBOARD)
+    if table is None:
+        return {"error": "Couldn't get current prices. Try again later."}
+    
+    bases = [base for base in get_config_snapshot().bases if base in base_prices]
+    ages = [price_cache.staleness(base) for base in bases]
+    return {
+        "opportunities": table.top_route_columns(TOP_ROUTES_PER_PAIR, min_profit=0),
+        "prices": {
+            "symbol": bases,
+            "price": [base_prices[base] for base in bases],
+            "age": [info and info["age"] for info in ages]
+        }
+    }
+
+def monitor_data(monitor):
+    """Structured monitor report"""
+    return {
+        "pair": monitor.pair,
+        "status": ("stopped" if monitor.stopped else "completed") if monitor.finished else "running",
+        "elapsed": monitor.elapsed,
+        "duration": monitor.duration,
+        "samples": monitor.sample_count,
+        "exchanges": {
+            exchange: {
+                "min": stats.min, "max": stats.max, "mean": stats.mean,
+                "std": stats.std, "volatility": stats.volatility
+            }
+            for exchange, stats in monitor.stats.items() if stats.count
+        }
+    }
+
+def command_data(cmd, env):
+    """
+    Runs a command for structured output and returns its result as plain data
+    (dicts, lists and NumPy columns), or None for commands that only reply in text
+    """
+    cmd_lower = cmd.lower()
+    parts = cmd.split()
+    
+    if cmd_lower == "scan":
+        return opportunities_data(find_arbitrage_opportunities(env))
+    
+    elif cmd_lower == "cycles":
+        return cycles_data(find_arbitrage_cycles())
+    
+    elif parts and parts[0].lower() in ("history", "trades"):
+        filters = parse_history_filters(parts[1:])
+        if isinstance(filters, str):
+            return {"error": filters}
+        return history_data(*filters) if parts[0].lower() == "history" else trades_data(*filters)
     
-    dashboard += "└─────────────┴────────────┴────────────┴────────────┴────────────┘\n\n"
+    elif cmd_lower == "orderbooks":
+        return order_books_data()
+    
+    elif cmd_lower == "status":
+        return agent_status_data()
+    
+    elif cmd_lower == "perf":
+        return perf_data()
+    
+    elif cmd_lower.startswith("dashboard ") and len(parts) == 2:
+        pair = resolve_pair(parts[1].upper())
+        if pair not in TRADING_PAIRS:
+            return {"error": f"Pair not recognized. Available pairs: {', '.join(TRADING_PAIRS)}"}
+        return dashboard_data(pair)
     
-    # Arbitrage opportunity
-    dashboard += "💰 BEST ARBITRAGE OPPORTUNITY\n"
-    if len(exchange_data) >= 2 and best_buy and best_sell and best_buy["exchange"] != best_sell["exchange"]:
-        dashboard += f"Buy on: {best_buy['exchange'].upper()} at ${best_buy['price']:.4f}\n"
-        dashboard += f"Sell on: {best_sell['exchange'].upper()} at ${best_sell['price']:.4f}\n"
-        dashboard += f"Price difference: {price_diff:.2f}%\n"
+    elif cmd_lower == "dashboard_all":
+        return dashboard_all_data()
+    
+    elif cmd_lower == "monitor status":
+        return {"monitors": [monitor_data(monitor) for monitor in list(active_monitors.values())]}
+    
+    elif cmd_lower == "monitor stop" or cmd_lower.startswith("monitor stop "):
+        pairs = [p.upper() for p in parts[2:]] or list(active_monitors)
+        stopped = [pair for pair in pairs if pair in active_monitors]
+        if stopped:
+            stop_monitors(stopped)
+        return {"stopped": stopped}
+    
+    elif cmd_lower.startswith("monitor ") and len(parts) > 1 and parts[1].lower() != "stop":
+        request = parse_monitor_command(cmd)
+        if isinstance(request, str):
+            return {"error": request}
         
-        if net_profit_pct > 0:
-            dashboard += f"Net profit (after fees): {net_profit_pct:.2f}%\n\n"
-        else:
-            dashboard += f"Net profit (after fees): {net_profit_pct:.2f}% ❌ Not profitable\n\n"
-    else:
-        dashboard += "No profitable arbitrage opportunity between different exchanges.\n\n"
+        pairs, duration = request
+        start_monitors(pairs, duration, env, structured=True)
+        return {"monitoring": pairs, "duration": duration, "progress_interval": MONITOR_PROGRESS_INTERVAL}
     
-    # Price variations
-    max_var = max(exchange_data, key=lambda x: x["price"])["price"]
-    min_var = min(exchange_data, key=lambda x: x["price"])["price"]
-    avg_var = sum(data["price"] for data in exchange_data) / len(exchange_data)
-    spread = ((max_var - min_var) / avg_var) * 100
+    return None
+
+def parse_monitor_command(cmd):
+    """Parses 'monitor [PAIR] [PAIR...] [TIME_IN_SECONDS]'; returns (pairs, duration) or an error message"""
+    parts = cmd.replace(",", " ").split()
+    if len(parts) < 3:
+        return "Correct format: monitor [PAIR] [PAIR...] [TIME_IN_SECONDS]"
     
-    dashboard += "📉 VARIATION STATISTICS\n"
-    dashboard += f"Maximum price: ${max_var:.4f}\n"
-    dashboard += f"Minimum price: ${min_var:.4f}\n"
-    dashboard += f"Average price: ${avg_var:.4f}\n"
-    dashboard += f"Spread between exchanges: {spread:.2f}%\n\n"
+    pairs = [resolve_pair(p.upper()) for p in parts[1:-1]]
+    try:
+        duration = int(parts[-1])
+    except:
+        return "Time must be a number in seconds."
     
-    # Note about data updates
-    cache_time = "Not available" if price_cache_timestamp == 0 else datetime.fromtimestamp(price_cache_timestamp).strftime('%H:%M:%S')
-    dashboard += f"ℹ️ Data updated: {cache_time}\n"
-    dashboard += "To update prices, use the 'scan' command.\n"
-    dashboard += "To see arbitrage opportunities, use the 'dashboard_all' command.\n"
+    if duration > MONITOR_MAX_DURATION:  # Limit to 5 minutes
+        return f"Please use a maximum time of {MONITOR_MAX_DURATION} seconds (5 minutes)."
+    
+    # Check if the pairs are valid
+    for pair in pairs:
+        if pair not in TRADING_PAIRS:
+            similar_pairs = [p for p in TRADING_PAIRS if pair.split('-')[0] in p]
+            if similar_pairs:
+                return f"Pair {pair} not recognized. Perhaps you meant one of these? {', '.join(similar_pairs)}"
+            else:
+                return f"Pair {pair} not recognized. Available pairs: {', '.join(TRADING_PAIRS)}"
     
-    return dashboard
+    return pairs, duration
+
+def get_intent_router():
+    """Gets the intent router for the current pairs and exchanges"""
+    global intent_router
+    
+    if intent_router is None or intent_router.pairs != TRADING_PAIRS:
+        previous = intent_router
+        intent_router = IntentRouter(TRADING_PAIRS, EXCHANGES, MONITOR_DEFAULT_DURATION)
+        if previous:
+            # Keep the counters across rebuilds
+            intent_router.stats = previous.stats
+            intent_router.latencies = previous.latencies
+    return intent_router
+
+def respond(messages, env, prompt):
+    """
+    Answers the last of the user messages: exact commands first, then
+    commands the intent router recognizes, and the LLM (with the system
+    prompt and every message) only for everything else
+    """
+    message = messages[-1]["content"]
+    start = time.perf_counter()
+    response = handle_command(message, env)
+    if response:
+        message_stats["commands"] += 1
+        record_command_latency(message, start)
+        return response
+    
+    if INTENT_ROUTING:
+        # A trailing --json applies to the command the message resolves to
+        message, json_output = split_output_flag(message)
+        command = get_intent_router().route(message)
+        if command and json_output:
+            command += " --json"
+        start = time.perf_counter()
+        response = handle_command(command, env) if command else None
+        if response:
+            message_stats["routed"] += 1
+            record_command_latency(command, start)
+            if changes_state(command) and not json_output and current_config["output"] != "json":
+                # Say what a free-form message was taken to mean before acting on settings or monitors
+                response = f"↪️ Understood as '{command}'\n{response}"
+            return response
+    
+    message_stats["llm"] += 1
+    start = time.perf_counter()
+    response = env.completion([prompt] + messages)
+    elapsed = time.perf_counter() - start
+    llm_latency.add(elapsed)
+    perf_recorder.record("llm", elapsed)
+    return response
+
+def record_command_latency(command, start):
+    """Records how long a command took to answer (since start) as the command.<name> stage"""
+    name = command.split()[0].lower()
+    perf_recorder.record(f"command.{name}", time.perf_counter() - start)
+
+def format_intent_stats():
+    """One status line on how free-form messages were answered, or '' before the first one"""
+    free_form = message_stats["routed"] + message_stats["llm"]
+    if not free_form:
+        return ""
+    
+    p50, p99 = get_intent_router().latency_percentiles()
+    line = f"Intent router: {message_stats['routed']}/{free_form} free-form messages answered without the LLM "
+    line += f"({message_stats['routed'] / free_form * 100:.0f}%), routing p50 {p50 * 1e6:.0f} µs / p99 {p99 * 1e6:.0f} µs"
+    if llm_latency.count:
+        # Each routed message saves about one average LLM completion
+        line += f", ~{message_stats['routed'] * llm_latency.mean:.1f}s of LLM time saved (avg completion {llm_latency.mean:.2f}s)"
+    return line + "\n"
+
+def format_latency(seconds):
+    """A latency in the most readable unit: '850 µs', '12.3 ms' or '1.42 s'"""
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.0f} µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:.1f} ms"
+    return f"{seconds:.2f} s"
+
+def cache_hit_ratio(counters):
+    """Share of price lookups served from a fresh cache, or None before the first one"""
+    lookups = sum(counters.get(name, 0) for name in ("cache.fresh", "cache.stale", "cache.cold"))
+    return counters.get("cache.fresh", 0) / lookups if lookups else None
+
+def format_perf_stats():
+    """One status line with the p50 / p99 of the main stages, or '' before anything was measured"""
+    _, histograms = perf_recorder.snapshot()
+    stages = [stage for stage in ("fetch", "cache", "spreads", "detect", "execution", "llm") if stage in histograms]
+    if not stages:
+        return ""
+    
+    latencies = [
+        f"{stage} {format_latency(histograms[stage].percentile(0.5))} / {format_latency(histograms[stage].percentile(0.99))}"
+        for stage in stages
+    ]
+    return f"Latency p50 / p99: {', '.join(latencies)} (details: 'perf')\n"
+
+def perf_data():
+    """Structured stage latencies (seconds) and counters of every turn so far"""
+    counters, histograms = perf_recorder.snapshot()
+    stages = sorted(histograms)
+    return {
+        "enabled": perf_recorder.enabled,
+        "stages": columns_from_records([
+            {
+                "stage": stage,
+                "count": histograms[stage].count,
+                "mean": histograms[stage].mean,
+                "p50": histograms[stage].percentile(0.5),
+                "p90": histograms[stage].percentile(0.9),
+                "p99": histograms[stage].percentile(0.99),
+                "max": histograms[stage].max
+            }
+            for stage in stages
+        ], ["stage", "count", "mean", "p50", "p90", "p99", "max"]),
+        "counters": counters,
+        "cache_hit_ratio": cache_hit_ratio(counters)
+    }
+
+def format_perf_report():
+    """Table of the latency percentiles of every stage, plus the counters"""
+    counters, histograms = perf_recorder.snapshot()
+    if not histograms and not counters:
+        if not perf_recorder.enabled:
+            return "Instrumentation is disabled (INSTRUMENTATION = False)."
+        return "No measurements yet. Run a few commands, then try 'perf' again."
+    
+    result = "⏱️ STAGE LATENCIES (ALL TURNS)\n"
+    result += f"{'STAGE':<26} {'CALLS':>7} {'P50':>10} {'P90':>10} {'P99':>10} {'MAX':>10}\n"
+    for stage in sorted(histograms):
+        histogram = histograms[stage]
+        result += f"{stage:<26} {histogram.count:>7} "
+        result += " ".join(f"{format_latency(value):>10}" for value in (
+            histogram.percentile(0.5), histogram.percentile(0.9), histogram.percentile(0.99), histogram.max
+        ))
+        result += "\n"
+    
+    if counters:
+        result += "\n🔢 COUNTERS\n"
+        for name in sorted(counters):
+            result += f"{name}: {counters[name]}\n"
+    hit_ratio = cache_hit_ratio(counters)
+    if hit_ratio is not None:
+        result += f"Price cache hit ratio: {hit_ratio * 100:.1f}%\n"
+    
+    if not perf_recorder.enabled:
+        result += "\nInstrumentation is disabled: these are earlier measurements.\n"
+    result += "\nUse 'perf reset' to start over, 'perf profile [COMMAND]' to profile one command.\n"
+    return result
+
+def profile_command(cmd, env):
+    """Runs one command under cProfile; returns its reply followed by the functions with the most cumulative time"""
+    import cProfile
+    import io
+    import pstats
+    
+    profiler = cProfile.Profile()
+    response = profiler.runcall(handle_command, cmd, env)
+    if response is None:
+        return f"Unknown command: {cmd}"
+    
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+    try:
+        stats.dump_stats(PROFILE_FILE)
+        saved = f"Full profile saved to {PROFILE_FILE} (open it with pstats or snakeviz)"
+    except OSError as e:
+        saved = f"Couldn't save the full profile: {str(e)}"
+    
+    # Skip the pstats preamble down to the table itself
+    table = stream.getvalue()
+    table = table[table.find("   ncalls"):].rstrip()
+    return f"{response}\n\n🔬 PROFILE: {cmd} (top {PROFILE_TOP_FUNCTIONS} by cumulative time)\n{table}\n\n{saved}"
 
 def handle_command(cmd, env):
     """Handles specific user commands"""
     global COINMARKETCAP_API_KEY
     
+    # Structured output: '--json' after a command, or every command with 'config output json'
+    cmd, json_output = split_output_flag(cmd)
+    if json_output or current_config["output"] == "json":
+        data = command_data(cmd, env)
+        if data is not None:
+            with perf_recorder.timer("render.json"):
+                return to_json(data)
+    
     # Main commands
     cmd_lower = cmd.lower()
     
@@ -617,26 +1911,60 @@ def handle_command(cmd, env):
         opportunities = find_arbitrage_opportunities(env)
         return format_opportunities(opportunities)
     
-    # History command
-    elif cmd_lower == "history":
-        if not arbitrage_history:
-            return "No arbitrage opportunity history recorded."
-        
-        result = "📊 Arbitrage opportunity history:\n\n"
-        for i, op in enumerate(arbitrage_history[-10:], 1):  # Show last 10
-            result += f"#{i} - {op['timestamp'][:19]} - {op['pair']}: "
-            result += f"{op['diff_percent']:.2f}% ({op['buy_exchange']} → {op['sell_exchange']})\n"
-        
-        return result
+    # Multi-hop loops command
+    elif cmd_lower == "cycles":
+        return format_cycles(find_arbitrage_cycles())
     
-    # Trades command
-    elif cmd_lower == "trades":
-        return format_trades_history()
+    # History of opportunities, optionally filtered by pair, exchange and time window
+    elif cmd_lower == "history" or cmd_lower.startswith("history "):
+        filters = parse_history_filters(cmd.split()[1:])
+        if isinstance(filters, str):
+            return filters
+        
+        pair, exchange, window = filters
+        if pair:
+            # A pair also gets its price summary (over the last hour by default)
+            return format_pair_history(pair, window or 3600, exchange)
+        return format_opportunity_history(pair, exchange, window)
+    
+    # Trades command (same filters as history)
+    elif cmd_lower == "trades" or cmd_lower.startswith("trades "):
+        filters = parse_history_filters(cmd.split()[1:])
+        if isinstance(filters, str):
+            return filters
+        return format_trades_history(*filters)
+    
+    # Order book commands
+    elif cmd_lower == "orderbooks":
+        return format_order_books()
+    
+    elif cmd_lower.startswith("orderbooks load"):
+        parts = cmd.split()
+        path = parts[2] if len(parts) > 2 else ORDER_BOOK_FILE
+        try:
+            count = order_books.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            return f"❌ Couldn't load order books from {path}: {str(e)}"
+        return f"✅ Loaded {count} order books from {path}"
     
     # Status command
     elif cmd_lower == "status":
         return get_agent_status()
     
+    # Performance diagnostics
+    elif cmd_lower == "perf":
+        return format_perf_report()
+    
+    elif cmd_lower == "perf reset":
+        perf_recorder.reset()
+        return "✅ Performance measurements cleared"
+    
+    elif cmd_lower.startswith("perf profile"):
+        command = cmd.split(None, 2)[2] if len(cmd.split()) > 2 else ""
+        if not command:
+            return "Correct format: perf profile [COMMAND] (e.g., perf profile scan)"
+        return profile_command(command, env)
+    
     # Dashboards
     elif cmd_lower.startswith("dashboard "):
         parts = cmd.split()
@@ -655,19 +1983,35 @@ def handle_command(cmd, env):
         help_message = """📚 Available commands:
 
 scan - Search for current arbitrage opportunities
-history - View history of detected opportunities
-trades - View history of executed trades
+cycles - Search for multi-hop (triangular) arbitrage loops
+history [PAIR] [EXCHANGE] [WINDOW] - View detected opportunities, optionally filtered (e.g., history BTC-USDT 24h); a pair also shows its prices
+trades [PAIR] [EXCHANGE] [WINDOW] - View executed trades, optionally filtered (e.g., trades binance 7d)
+orderbooks - Show loaded order books
+orderbooks load [PATH] - Load recorded order book snapshots (JSON lines)
 status - View current agent status
+perf - Show latency percentiles of every stage (fetch, cache, spreads, rendering, LLM...)
+perf reset - Clear the performance measurements
+perf profile [COMMAND] - Run a command under the profiler and show where the time goes
 dashboard [PAIR] - Show detailed dashboard for a specific pair (e.g., dashboard BTC-USDT)
 dashboard_all - Show dashboard with all pairs and opportunities
 config [param] [value] - Configure trading parameters
+monitor [PAIR] [PAIR...] [SECONDS] - Monitor one or more pairs in the background
+monitor status - Show statistics of running monitors
+monitor stop [PAIR] - Stop monitors (all if no pair is given)
+[command] --json - Reply with compact JSON instead of text (e.g., scan --json)
 setup_api [api_key] - Configure CoinMarketCap API key
 help - Show this help
 
+Plain requests work too (e.g., "scan please", "btc dashboard", "watch eth for 2 minutes").
+
 Usage examples:
 dashboard BTC-USDT - Shows detailed analysis for Bitcoin
 config min_profit 1.5 - Sets the minimum profit to 1.5%
 config auto_trading true - Enables auto-trading
+config min_spread_sigma 2 - Only reports spreads 2 standard deviations above their rolling mean
+config alerts on - Reports new opportunities as soon as they appear (e.g. while monitoring)
+config output json - Replies to scan, cycles, history, trades, orderbooks, status, perf, dashboards and monitors with JSON
+monitor BTC-USDT ETH-USDT 120 - Monitors Bitcoin and Ethereum for 2 minutes
 setup_api YOUR_API_KEY - Configures the CoinMarketCap API key
 """
         return help_message
@@ -711,6 +2055,32 @@ setup_api YOUR_API_KEY - Configures the CoinMarketCap API key
             except:
                 return "Value must be an integer."
         
+        elif param == "min_spread_sigma":
+            try:
+                current_config["min_spread_sigma"] = float(value)
+                if current_config["min_spread_sigma"] > 0:
+                    return f"Only spreads at least {value} standard deviations above their rolling mean will be reported"
+                return "Spread filter DISABLED"
+            except:
+                return "Value must be a number."
+        
+        elif param == "alerts":
+            if value in ["true", "1", "yes", "on"]:
+                current_config["alerts"] = True
+                return "Opportunity alerts ENABLED: new opportunities are reported as soon as prices update"
+            elif value in ["false", "0", "no", "off"]:
+                current_config["alerts"] = False
+                return "Opportunity alerts DISABLED"
+            else:
+                return "Invalid value. Use 'true' or 'false'."
+        
+        elif param == "output":
+            if value in ("text", "json"):
+                current_config["output"] = value
+                return f"Output format set to {value}"
+            else:
+                return "Invalid value. Use 'text' or 'json'."
+        
         elif param == "auto_trading":
             if value in ["true", "1", "yes", "on"]:
                 current_config["auto_trading"] = True
@@ -724,84 +2094,26 @@ setup_api YOUR_API_KEY - Configures the CoinMarketCap API key
         else:
             return f"Parameter '{param}' not recognized."
     
-    # Monitoring command
-    elif cmd_lower.startswith("monitor "):
+    # Monitoring commands
+    elif cmd_lower in ("monitor status", "monitor stop") or cmd_lower.startswith("monitor stop "):
         parts = cmd.split()
-        if len(parts) != 3:
-            return "Correct format: monitor [PAIR] [TIME_IN_SECONDS]"
-        
-        pair = parts[1].upper()
-        try:
-            duration = int(parts[2])
-        except:
-            return "Time must be a number in seconds."
-        
-        if duration > 300:  # Limit to 5 minutes
-            return "Please use a maximum time of 300 seconds (5 minutes)."
-        
-        # Check if the pair is valid
-        if pair not in TRADING_PAIRS:
-            similar_pairs = [p for p in TRADING_PAIRS if pair.split('-')[0] in p]
-            if similar_pairs:
-                return f"Pair not recognized. Perhaps you meant one of these? {', '.join(similar_pairs)}"
-            else:
-                return f"Pair not recognized. Available pairs: {', '.join(TRADING_PAIRS)}"
-        
-        result = f"📈 Monitoring {pair} for {duration} seconds...\n\n"
-        
-        # Perform monitoring
-        start_time = time.time()
-        end_time = start_time + duration
-        check_interval = 10  # Check every 10 seconds (to not overload the API)
-        next_check = start_time
-        
-        price_history = {}
-        base, quote = pair.split('-')
-        
-        while time.time() < end_time:
-            if time.time() >= next_check:
-                # Get base prices
-                base_prices = get_token_prices()
-                if base in base_prices:
-                    base_price = base_prices[base]
-                    
-                    # Simulate prices on different exchanges
-                    for exchange_name in EXCHANGES:
-                        price = get_exchange_price(exchange_name, base, base_price)
-                        if exchange_name not in price_history:
-                            price_history[exchange_name] = []
-                        price_history[exchange_name].append(price)
-                
-                next_check = time.time() + check_interval
-                
-                # Wait a small interval to not completely block
-                time.sleep(1)
-        
-        # Analyze monitoring results
-        report = f"✅ Monitoring completed for {pair}:\n\n"
-        
-        for exchange, prices in price_history.items():
-            if prices:
-                min_price = min(prices)
-                max_price = max(prices)
-                avg_price = sum(prices) / len(prices)
-                volatility = ((max_price - min_price) / avg_price) * 100 if avg_price > 0 else 0
-                
-                report += f"{exchange.upper()}:\n"
-                report += f"  Minimum price: ${min_price:.4f}\n"
-                report += f"  Maximum price: ${max_price:.4f}\n"
-                report += f"  Average price: ${avg_price:.4f}\n"
-                report += f"  Volatility: {volatility:.2f}%\n\n"
-        
-        report += "Use 'scan' to see current arbitrage opportunities."
+        if parts[1].lower() == "status":
+            return get_monitors_status()
+        return stop_monitors([p.upper() for p in parts[2:]])
+    
+    elif cmd_lower.startswith("monitor "):
+        request = parse_monitor_command(cmd)
+        if isinstance(request, str):
+            return request
         
-        return report
+        pairs, duration = request
+        return start_monitors(pairs, duration, env)
     
     # If not a known command, indicate it
     else:
         return None
 
-def run(env: Environment):
+def run(env: "Environment"):
     # Basic system
     system_message = """You are an advanced cryptocurrency arbitrage agent that helps identify buying and selling 
     opportunities across different exchanges. You can scan the market in real-time 
@@ -809,12 +2121,14 @@ def run(env: Environment):
     
     Available commands:
     - 'scan': Search for current arbitrage opportunities
+    - 'cycles': Search for multi-hop arbitrage loops
     - 'history': Show history of detected opportunities
     - 'trades': Show history of executed trades
     - 'status': Show current agent status
     - 'dashboard [PAIR]': Show detailed dashboard for a pair
     - 'dashboard_all': Show dashboard with all pairs
     - 'config [param] [value]': Configure trading parameters
+    - 'monitor [PAIR] [PAIR...] [SECONDS]': Monitor pairs in the background
     - 'setup_api [api_key]': Configure CoinMarketCap API key
     - 'help': Show detailed help
     
@@ -822,22 +2136,20 @@ def run(env: Environment):
     
     prompt = {"role": "system", "content": system_message}
     
+    set_pipeline_env(env)
+    
     # Process messages
     user_messages = env.list_messages()
     
     if user_messages:
-        last_message = user_messages[-1]["content"]
+        # Commands (exact or recognized by the intent router) are answered
+        # directly, anything else by the model
+        env.add_reply(respond(user_messages, env, prompt))
         
-        # Check if it's a command
-        command_response = handle_command(last_message, env)
-        
-        if command_response:
-            # If it was a command, use the command response
-            env.add_reply(command_response)
-        else:
-            # If it wasn't a command, use the model to respond
-            result = env.completion([prompt] + user_messages)
-            env.add_reply(result)
+        # The process may end with the turn: let background price refreshes finish first
+        price_cache.wait(PRICE_REFRESH_WAIT)
+        history_store.flush_open_routes()
+        perf_recorder.flush()
     else:
         # Welcome message
         welcome_message = """Welcome to the advanced cryptocurrency arbitrage agent. Here you can find buying and selling opportunities across different exchanges and execute trades automatically.
@@ -847,12 +2159,14 @@ Remember that cryptocurrency trading involves significant risks, including loss
 To get started, I recommend you review the available commands:
 
 * 'scan': Search for current arbitrage opportunities
+* 'cycles': Search for multi-hop arbitrage loops
 * 'history': Show history of detected opportunities
 * 'trades': Show history of executed trades
 * 'status': Show current agent status
 * 'dashboard [PAIR]': Show detailed dashboard for a pair
 * 'dashboard_all': Show dashboard with all pairs
 * 'config [param] [value]': Configure trading parameters
+* 'monitor [PAIR] [PAIR...] [SECONDS]': Monitor pairs in the background
 * 'setup_api [api_key]': Configure CoinMarketCap API key
 * 'help': Show detailed help
 
@@ -864,4 +2178,5 @@ Which command would you like to execute?"""
     # Request next input
     env.request_user_input()
 
-run(env)
+if globals().get("env", None):
+    run(globals().get("env"))
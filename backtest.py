@@ -0,0 +1,289 @@
+"""
+Backtester for the arbitrage settings.
+
+Ticks are stored column by column in a directory and memory-mapped, so files
+larger than RAM stream through without being loaded:
+
+    meta.json       {"symbols": [...], "exchanges": [...], "tick_rate": ..., "ticks": N}
+    timestamps.npy  (ticks,) float64
+    quotes.npy      (ticks x symbols x exchanges) float64, prices in USDT
+
+Every tick goes through the agent's own opportunity pipeline (publish_prices:
+route scoring, threshold and hysteresis, so a persisting opportunity is traded
+once) and execute_trade with auto-trading on. Each trade is then filled fill_delay_ticks later at the quotes of that tick, which gives the
+realized PnL, hit rate (share of trades that made money once filled), fee
+drag and per-route statistics. sweep() runs a grid of settings in parallel
+across a process pool.
+
+Usage:
+    python backtest.py simulate DIR [--symbols N] [--ticks N] [--seed N]
+    python backtest.py run DIR [--min_profit X] [--trade_amount X] [--max_daily_trades N] [--min_spread_sigma X]
+    python backtest.py sweep DIR --min_profit 0.1,0.2,0.5 --trade_amount 100,1000 [--processes N]
+"""
+import argparse
+import atexit
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+# Importing the agent opens (and prunes) the history in its data directory and
+# records stage timings into its perf file: backtests, and the sweep workers
+# (which import this module too), get a throwaway directory and no instrumentation
+_DATA_DIR = os.environ["ARBITRAGE_AGENT_DATA_DIR"] = tempfile.mkdtemp(prefix="backtest_")
+os.environ["ARBITRAGE_AGENT_INSTRUMENTATION"] = "0"
+_DATA_DIR_OWNER = os.getpid()
+atexit.register(lambda: os.getpid() == _DATA_DIR_OWNER and shutil.rmtree(_DATA_DIR, ignore_errors=True))
+
+import agent  # noqa: E402
+from history_store import HistoryStore  # noqa: E402
+from market_sim import MarketSimulator  # noqa: E402
+from order_book import OrderBookStore  # noqa: E402
+from rolling_stats import StatsEngine  # noqa: E402
+
+# Settings a backtest can override (the rest of current_config keeps its defaults)
+PARAMETERS = {
+    "min_profit": float,
+    "trade_amount": float,
+    "max_daily_trades": int,
+    "min_spread_sigma": float
+}
+
+
+class TickFile:
+    """Memory-mapped columnar tick file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.symbols = self.meta["symbols"]
+        self.exchanges = self.meta["exchanges"]
+        self.timestamps = np.load(os.path.join(path, "timestamps.npy"), mmap_mode="r")
+        self.quotes = np.load(os.path.join(path, "quotes.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.timestamps)
+
+
+def write_tick_file(path, symbols, exchanges, timestamps, quotes, tick_rate=None):
+    """Writes ticks ((ticks x symbols x exchanges) quotes) as a columnar tick file"""
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "timestamps.npy"), np.asarray(timestamps, dtype=np.float64))
+    np.save(os.path.join(path, "quotes.npy"), np.asarray(quotes, dtype=np.float64))
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"symbols": list(symbols), "exchanges": list(exchanges), "tick_rate": tick_rate, "ticks": len(timestamps)}, f)
+
+
+def simulate_tick_file(path, exchanges, base_prices, ticks, seed=0, tick_rate=1.0, start_time=None, chunk=10000):
+    """Writes ticks of a MarketSimulator random walk straight to a tick file, chunk by chunk"""
+    simulator = MarketSimulator(exchanges, seed, tick_rate)
+    start_time = time.time() if start_time is None else start_time
+    first_tick = simulator.tick_at(start_time)
+    simulator.reset(base_prices, first_tick)
+
+    os.makedirs(path, exist_ok=True)
+    shape = (ticks, len(simulator.symbols), len(simulator.exchange_names))
+    timestamps = np.lib.format.open_memmap(os.path.join(path, "timestamps.npy"), mode="w+", dtype=np.float64, shape=(ticks,))
+    quotes = np.lib.format.open_memmap(os.path.join(path, "quotes.npy"), mode="w+", dtype=np.float64, shape=shape)
+    for begin in range(0, ticks, chunk):
+        count = min(chunk, ticks - begin)
+        tick_indexes, _, block = simulator.walk(count)
+        timestamps[begin:begin + count] = tick_indexes / tick_rate
+        quotes[begin:begin + count] = block
+    timestamps.flush()
+    quotes.flush()
+
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"symbols": simulator.symbols, "exchanges": simulator.exchange_names, "tick_rate": tick_rate, "ticks": ticks}, f)
+    return TickFile(path)
+
+
+class QuietEnv:
+    """Stands in for the NEAR AI environment: counts replies instead of sending them"""
+
+    def __init__(self):
+        self.replies = 0
+
+    def add_reply(self, message):
+        self.replies += 1
+
+
+def reset_agent(pairs, config):
+    """Puts the agent in a clean state for a backtest of pairs with the given settings"""
+    agent.TRADING_PAIRS = list(pairs)
+    agent.current_config = dict(agent.DEFAULT_CONFIG, **config, auto_trading=True)
+    agent.history_store = HistoryStore()  # In memory, apart from the agent's history file
+    agent.order_books = OrderBookStore()  # Recorded books would size every trade
+    agent.price_stats = StatsEngine(agent.STATS_WINDOW, agent.STATS_EWMA_ALPHA)
+    agent.spread_stats = StatsEngine(agent.STATS_WINDOW, agent.STATS_EWMA_ALPHA)
+    agent.price_history_version = None
+    agent.route_table.version = None
+    agent.opportunity_pipeline.reset()
+
+
+def run_backtest(path, config=None, fill_delay_ticks=1, start=0, end=None):
+    """
+    Replays a tick file through the agent with the given settings.
+
+    Returns {"config", "ticks", "elapsed", "speedup", "opportunities", "trades",
+    "expected_pnl", "pnl", "gross_pnl", "fee_drag", "hit_rate", "routes"}.
+    """
+    ticks = TickFile(path)
+    config = dict(config or {})
+    end = len(ticks) if end is None else min(end, len(ticks))
+
+    pairs = [f"{symbol}-USDT" for symbol in ticks.symbols]
+    reset_agent(pairs, config)
+    agent.pipeline_env = QuietEnv()
+
+    # Quote columns in the agent's exchange order (NaN for exchanges missing from the file)
+    columns = [ticks.exchanges.index(name) if name in ticks.exchanges else -1 for name in agent.EXCHANGE_NAMES]
+    missing = [j for j, column in enumerate(columns) if column < 0]
+
+    fills = []  # (trade, tick index)
+    started = time.perf_counter()
+    for t in range(start, end):
+        quotes = np.asarray(ticks.quotes[t])
+        prices = quotes[:, columns]
+        prices[:, missing] = np.nan
+
+        traded = agent.history_store.last_trade_id()
+        timestamp = datetime.fromtimestamp(float(ticks.timestamps[t])).isoformat()
+        agent.publish_prices(pairs, prices, t, timestamp, record_history=False)
+        fill_tick = min(t + fill_delay_ticks, end - 1)
+        fills.extend((trade, fill_tick) for trade in agent.history_store.trades(after_id=traded))
+    elapsed = time.perf_counter() - started
+
+    # Fill every trade fill_delay_ticks later at the quotes of that tick (read in one gather)
+    pair_index = {pair: i for i, pair in enumerate(pairs)}
+    exchange_index = {name: ticks.exchanges.index(name) for name in agent.EXCHANGE_NAMES if name in ticks.exchanges}
+    fill_ticks = np.array([fill_tick for _, fill_tick in fills], dtype=np.intp)
+    fill_pairs = np.array([pair_index[trade["pair"]] for trade, _ in fills], dtype=np.intp)
+    buy_columns = np.array([exchange_index[trade["buy_exchange"]] for trade, _ in fills], dtype=np.intp)
+    sell_columns = np.array([exchange_index[trade["sell_exchange"]] for trade, _ in fills], dtype=np.intp)
+    buy_prices = ticks.quotes[fill_ticks, fill_pairs, buy_columns]
+    sell_prices = ticks.quotes[fill_ticks, fill_pairs, sell_columns]
+
+    # Fee factors of the agent's fee model, per trade
+    agent_index = {name: j for j, name in enumerate(agent.EXCHANGE_NAMES)}
+    buy_cost = agent.route_table.buy_cost_factor[[agent_index[trade["buy_exchange"]] for trade, _ in fills]]
+    sell_value = agent.route_table.sell_value_factor[[agent_index[trade["sell_exchange"]] for trade, _ in fills]]
+
+    quantities = np.array([trade["amount"] / trade["buy_price"] for trade, _ in fills])
+    gross = quantities * (sell_prices - buy_prices)
+    realized = quantities * (sell_prices * sell_value - buy_prices * buy_cost)
+    expected_pnl = sum(trade["profit_amount"] for trade, _ in fills)
+    gross_pnl = float(gross.sum())
+    pnl = float(realized.sum())
+    hits = int((realized > 0).sum())
+
+    routes = {}
+    for (trade, _), profit in zip(fills, realized.tolist()):
+        route = routes.setdefault(f"{trade['pair']} {trade['buy_exchange']}→{trade['sell_exchange']}", {"trades": 0, "pnl": 0.0, "hits": 0})
+        route["trades"] += 1
+        route["pnl"] += profit
+        route["hits"] += profit > 0
+
+    ticks_run = end - start
+    duration = ticks_run / ticks.meta["tick_rate"] if ticks.meta.get("tick_rate") else None
+    return {
+        "config": config,
+        "ticks": ticks_run,
+        "elapsed": elapsed,
+        "speedup": duration / elapsed if duration and elapsed else None,
+        "opportunities": agent.opportunity_pipeline.stats["opened"],
+        "trades": len(fills),
+        "expected_pnl": expected_pnl,
+        "pnl": pnl,
+        "gross_pnl": gross_pnl,
+        "fee_drag": gross_pnl - pnl,
+        "hit_rate": hits / len(fills) if fills else 0.0,
+        "routes": dict(sorted(routes.items(), key=lambda item: item[1]["pnl"], reverse=True))
+    }
+
+
+def _run_job(job):
+    path, config, kwargs = job
+    return run_backtest(path, config, **kwargs)
+
+
+def sweep(path, grid, processes=None, **kwargs):
+    """
+    Runs run_backtest for every combination of a parameter grid ({param: [values]}) in a process pool.
+
+    processes defaults to every core. Results are in the order of the combinations.
+    """
+    names = list(grid)
+    configs = [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+    jobs = [(path, config, kwargs) for config in configs]
+    with ProcessPoolExecutor(max_workers=processes or os.cpu_count()) as pool:
+        return list(pool.map(_run_job, jobs))
+
+
+def format_summary(result, routes=5):
+    """Formats a backtest result"""
+    settings = ", ".join(f"{name}={value}" for name, value in result["config"].items()) or "default settings"
+    text = f"Backtest ({settings}): {result['ticks']} ticks in {result['elapsed']:.2f}s"
+    if result["speedup"]:
+        text += f" ({result['speedup']:,.0f}x real time)"
+    text += "\n"
+    text += f"  Opportunities: {result['opportunities']}, trades: {result['trades']}, hit rate: {result['hit_rate'] * 100:.1f}%\n"
+    text += f"  PnL: ${result['pnl']:.2f} (expected ${result['expected_pnl']:.2f}, gross ${result['gross_pnl']:.2f}, "
+    text += f"fee drag ${result['fee_drag']:.2f})\n"
+    for name, route in list(result["routes"].items())[:routes]:
+        text += f"  {name}: {route['trades']} trades, ${route['pnl']:.2f}, {route['hits'] / route['trades'] * 100:.0f}% hits\n"
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the arbitrage settings on recorded or simulated ticks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    simulate = commands.add_parser("simulate", help="write a simulated tick file")
+    simulate.add_argument("path")
+    simulate.add_argument("--symbols", type=int, default=100)
+    simulate.add_argument("--ticks", type=int, default=100000)
+    simulate.add_argument("--seed", type=int, default=0)
+    simulate.add_argument("--tick_rate", type=float, default=1.0)
+
+    for name in ("run", "sweep"):
+        command = commands.add_parser(name, help=f"{name} backtests on a tick file")
+        command.add_argument("path")
+        command.add_argument("--fill_delay_ticks", type=int, default=1)
+        for param in PARAMETERS:
+            command.add_argument(f"--{param}", help="comma-separated values to sweep" if name == "sweep" else None)
+    commands.choices["sweep"].add_argument("--processes", type=int, default=None)
+
+    args = parser.parse_args()
+
+    if args.command == "simulate":
+        base_prices = {f"SYM{i:04d}": 1.0 + i for i in range(args.symbols)}
+        simulate_tick_file(args.path, agent.EXCHANGES, base_prices, args.ticks, args.seed, args.tick_rate)
+        print(f"Wrote {args.ticks} ticks of {args.symbols} symbols to {args.path}")
+        return
+
+    if args.command == "run":
+        config = {param: cast(getattr(args, param)) for param, cast in PARAMETERS.items() if getattr(args, param) is not None}
+        print(format_summary(run_backtest(args.path, config, args.fill_delay_ticks)))
+        return
+
+    grid = {
+        param: [cast(value) for value in getattr(args, param).split(",")]
+        for param, cast in PARAMETERS.items() if getattr(args, param) is not None
+    }
+    started = time.perf_counter()
+    results = sweep(args.path, grid, args.processes, fill_delay_ticks=args.fill_delay_ticks)
+    for result in sorted(results, key=lambda result: result["pnl"], reverse=True):
+        print(format_summary(result, routes=0))
+    print(f"{len(results)} backtests in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
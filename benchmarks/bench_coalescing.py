@@ -0,0 +1,73 @@
+"""
+Benchmark: chunked, single-flight CoinMarketCap fetching under concurrent callers.
+
+Several callers (as scan, dashboard and monitor would) refresh overlapping
+symbol sets at the same time against a local FakeMarketServer.
+
+Usage: python benchmarks/bench_coalescing.py
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fake_servers import FakeMarketServer  # noqa: E402
+from price_feed import CoinMarketCapSource, chunk_symbols, cmc_credits, create_session  # noqa: E402
+
+SYMBOL_COUNT = 1000
+CALLERS = 8
+SERVER_DELAY = 0.2
+
+
+def run_callers(source, session, symbol_sets):
+    """Starts all callers at once and returns the wall time until the last one finished"""
+    barrier = threading.Barrier(len(symbol_sets))
+    results = [None] * len(symbol_sets)
+
+    def caller(i):
+        barrier.wait()
+        results[i] = source.fetch(session, symbol_sets[i])
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(len(symbol_sets))]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, results
+
+
+def main():
+    symbols = [f"S{i:05d}" for i in range(SYMBOL_COUNT)]
+    prices = {symbol: float(i + 1) for i, symbol in enumerate(symbols)}
+
+    # Callers ask for overlapping windows of the symbol list
+    step = SYMBOL_COUNT // (CALLERS * 2)
+    symbol_sets = [symbols[i * step:i * step + SYMBOL_COUNT // 2] for i in range(CALLERS)]
+
+    chunks = chunk_symbols(symbols, 100, 2000)
+    print(f"{SYMBOL_COUNT} symbols -> {len(chunks)} chunks of {min(map(len, chunks))}-{max(map(len, chunks))} symbols\n")
+
+    with FakeMarketServer(prices, delays={"coinmarketcap": SERVER_DELAY}) as server:
+        session = create_session()
+
+        # Baseline: one unchunked request per caller, no sharing (the original behaviour)
+        naive_requests = len(symbol_sets)
+        naive_credits = sum(cmc_credits(len(s)) for s in symbol_sets)
+
+        source = CoinMarketCapSource("bench", server.cmc_url())
+        elapsed, results = run_callers(source, session, symbol_sets)
+        assert all(len(result) == len(wanted) for result, wanted in zip(results, symbol_sets))
+
+        stats = source.stats
+        print(f"{CALLERS} concurrent callers, {len(symbol_sets[0])} symbols each, {SERVER_DELAY * 1000:.0f} ms per request")
+        print(f"  without coalescing: {naive_requests} requests, {naive_credits} credits")
+        print(f"  single-flight:      {stats['requests']} requests, {stats['credits_used']} credits "
+              f"({stats['credits_saved']} saved, {stats['symbols_shared']} symbols shared), {elapsed * 1000:.0f} ms")
+        print(f"  server saw {server.requests.get('coinmarketcap', 0)} requests")
+
+
+if __name__ == "__main__":
+    main()
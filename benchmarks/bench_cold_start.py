@@ -0,0 +1,107 @@
+"""
+Benchmark: import time and first-reply latency per command.
+
+Every message is a fresh Python process that imports the agent and calls
+run(env) once, like the NEAR AI runtime. For each command this runs TURNS
+such processes against a warm data directory (cached prices) and reports
+the median import time, the time to the reply and which heavy modules the
+turn loaded. The "eager" column imports requests,
+asyncio and the multiprocessing modules up front, as every turn did before
+they were deferred to the code that needs them.
+
+CoinMarketCap is a local FakeMarketServer, used only if a cached price
+expires during the run.
+
+Usage: python benchmarks/bench_cold_start.py
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from fake_servers import FakeMarketServer
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+TURNS = 5
+
+COMMANDS = [
+    "help", "status", "scan", "scan --json", "cycles", "dashboard BTC-USDT", "dashboard_all",
+    "history", "trades", "scan please", "show me the eth dashboard"
+]
+
+HEAVY_MODULES = ["requests", "asyncio", "multiprocessing.shared_memory", "concurrent.futures.process", "nearai"]
+
+REFERENCE_PRICES = {
+    "BTC": 62000.0, "ETH": 3400.0, "XRP": 0.58, "NEAR": 1.78,
+    "SOL": 145.0, "ADA": 0.45, "DOT": 7.40, "USDT": 1.0
+}
+
+# One turn: import the agent, then answer one message through run(env)
+TURN_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+if {eager!r}:
+    import requests, asyncio, concurrent.futures.process, multiprocessing.shared_memory
+sys.path.insert(0, {root!r})
+import agent
+imported = time.perf_counter()
+
+class Env:
+    def __init__(self, message):
+        self.messages = [{{"role": "user", "content": message}}]
+        self.replies = []
+    def list_messages(self):
+        return self.messages
+    def add_reply(self, message):
+        self.replies.append(message)
+    def completion(self, messages):
+        return "(model reply)"
+    def request_user_input(self):
+        pass
+
+agent.COINMARKETCAP_API_URL = {url!r}
+env = Env({command!r})
+agent.run(env)
+done = time.perf_counter()
+print(json.dumps({{
+    "import": imported - start, "reply": done - imported,
+    "modules": [name for name in {modules!r} if name in sys.modules]
+}}))
+"""
+
+
+def run_turn(url, data_dir, command, eager=False):
+    script = TURN_SCRIPT.format(root=ROOT, url=url, command=command, eager=eager, modules=HEAVY_MODULES)
+    env = dict(os.environ, ARBITRAGE_AGENT_DATA_DIR=data_dir)
+    output = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    data_dir = tempfile.mkdtemp(prefix="bench_cold_start_")
+    with FakeMarketServer(REFERENCE_PRICES) as server:
+        url = server.cmc_url()
+
+        print(f"Median of {TURNS} turns per command (fresh process each), warm data directory\n")
+        print(f"{'command':>26} {'import (ms)':>12} {'eager (ms)':>11} {'reply (ms)':>11} {'turn (ms)':>10}  modules loaded")
+        for command in COMMANDS:
+            # An untimed turn keeps the price cache warm
+            run_turn(url, data_dir, command)
+            turns = [run_turn(url, data_dir, command) for _ in range(TURNS)]
+            eager = [run_turn(url, data_dir, command, eager=True) for _ in range(TURNS)]
+
+            imported = statistics.median(turn["import"] for turn in turns) * 1000
+            eager_imported = statistics.median(turn["import"] for turn in eager) * 1000
+            reply = statistics.median(turn["reply"] for turn in turns) * 1000
+            modules = sorted({name for turn in turns for name in turn["modules"]})
+            print(
+                f"{command:>26} {imported:>12.1f} {eager_imported:>11.1f} {reply:>11.1f} {imported + reply:>10.1f}  "
+                f"{', '.join(modules) or '-'}"
+            )
+        print(f"\nCoinMarketCap requests: {server.requests.get('coinmarketcap', 0)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: multi-hop cycle detector, full search vs incremental single-price updates.
+
+Usage: python benchmarks/bench_cycles.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from cycle_detector import CycleDetector  # noqa: E402
+
+SYMBOL_COUNTS = [50, 200, 500]
+EXCHANGE_COUNT = 12
+CROSS_PAIRS = 20  # Symbols also quoted in BTC, so triangular loops exist
+UPDATES = 2000
+
+
+def build_market(symbol_count, rng):
+    """Builds synthetic exchanges, pairs and reference prices"""
+    exchanges = {
+        f"ex{i:02d}": {"fee": rng.uniform(0.05, 0.2), "withdrawal_fee": rng.uniform(0.03, 0.1)}
+        for i in range(EXCHANGE_COUNT)
+    }
+    symbols = ["BTC"] + [f"SYM{i:04d}" for i in range(symbol_count - 1)]
+    prices = {symbol: rng.uniform(0.1, 1000) for symbol in symbols}
+    prices["BTC"] = 62000.0
+
+    pairs = {f"{symbol}-USDT": prices[symbol] for symbol in symbols}
+    for symbol in symbols[1:CROSS_PAIRS + 1]:
+        pairs[f"{symbol}-BTC"] = prices[symbol] / prices["BTC"]
+    return exchanges, pairs
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'symbols':>8} {'nodes':>7} {'edges':>8} {'build (ms)':>11} {'full search (ms)':>17} {'update (us)':>12} {'updates/s':>10}")
+    for symbol_count in SYMBOL_COUNTS:
+        exchanges, pairs = build_market(symbol_count, rng)
+
+        start = time.perf_counter()
+        detector = CycleDetector(exchanges, list(pairs))
+        for exchange in exchanges:
+            for pair, price in pairs.items():
+                detector.set_price(exchange, pair, price * (1 + rng.uniform(-0.003, 0.003)))
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        detector.find_cycles()
+        full_ms = (time.perf_counter() - start) * 1000
+
+        # Random single-price ticks, as a live feed would deliver them
+        names = list(exchanges)
+        pair_names = list(pairs)
+        ticks = [
+            (rng.choice(names), pair, pairs[pair] * (1 + rng.uniform(-0.003, 0.003)))
+            for pair in (rng.choice(pair_names) for _ in range(UPDATES))
+        ]
+        start = time.perf_counter()
+        for exchange, pair, price in ticks:
+            detector.update_price(exchange, pair, price)
+        update_us = (time.perf_counter() - start) / UPDATES * 1e6
+
+        print(f"{symbol_count:>8} {len(detector.nodes):>7} {len(detector.edge_src):>8} {build_ms:>11.1f} "
+              f"{full_ms:>17.1f} {update_us:>12.1f} {1e6 / update_us:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
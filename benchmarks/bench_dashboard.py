@@ -0,0 +1,129 @@
+"""
+Benchmark: dashboard_all and dashboard rendering at 500 pairs.
+
+Compares the original renderer (string concatenation, every row formatted on
+every call) with the fragment-cached one: a cold render (empty cache), a
+refresh where nothing changed, one a second later (every price age changed,
+but the ages aren't part of the cached fragments), and refreshes where the
+reference price of a few pairs moved, so only their rows are formatted again.
+
+Usage: python benchmarks/bench_dashboard.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+os.environ["ARBITRAGE_AGENT_DATA_DIR"] = tempfile.mkdtemp(prefix="bench_dashboard_")
+
+import agent  # noqa: E402
+
+PAIR_COUNT = 500
+CHANGED_COUNTS = [1, 10, 100]
+REPEATS = 20
+
+
+def legacy_dashboard_all():
+    """The original show_dashboard_all rendering (+= concatenation, no caching)"""
+    result = "📊 COMPLETE ARBITRAGE DASHBOARD\n\n"
+    base_prices = agent.get_token_prices(agent.PRIORITY_DASHBOARD)
+    table = agent.get_route_table(agent.PRIORITY_DASHBOARD)
+    opportunities = table.top_routes(agent.TOP_ROUTES_PER_PAIR, min_profit=0)
+    opportunities.sort(key=lambda x: x["net_gain_percent"], reverse=True)
+
+    result += "💰 ARBITRAGE OPPORTUNITIES\n"
+    result += "┌─────────┬─────────────┬────────────┬─────────────┬────────────┬──────────┬────────┐\n"
+    result += "│   PAIR  │   BUY ON    │   PRICE    │   SELL ON   │   PRICE    │  PROFIT  │  AGE   │\n"
+    result += "├─────────┼─────────────┼────────────┼─────────────┼────────────┼──────────┼────────┤\n"
+    for op in opportunities:
+        pair = op["pair"]
+        buy_ex = op["buy_exchange"].upper()
+        buy_price = f"${op['buy_price']:.4f}"
+        sell_ex = op["sell_exchange"].upper()
+        sell_price = f"${op['sell_price']:.4f}"
+        profit = f"{op['net_gain_percent']:.2f}%"
+        age = agent.format_price_age(pair.split('-')[0], short=True)
+        result += f"│ {pair.ljust(7)} │ {buy_ex.ljust(11)} │ {buy_price.ljust(10)} │ {sell_ex.ljust(11)} │ {sell_price.ljust(10)} │ {profit.ljust(8)} │ {age.ljust(6)} │\n"
+    result += "└─────────┴─────────────┴────────────┴─────────────┴────────────┴──────────┴────────┘\n\n"
+
+    result += "📈 AVERAGE PRICES BY CRYPTOCURRENCY\n"
+    for pair in agent.TRADING_PAIRS:
+        base, quote = pair.split('-')
+        if base in base_prices:
+            result += f"{base}: ${base_prices[base]:.4f} (updated {agent.format_price_age(base)} ago)\n"
+    result += "\nℹ️ AGE: time since each price was updated (* = stale, refresh in progress)\n"
+    result += "To see details for a specific pair, use the command 'dashboard [PAIR]'.\n"
+    return result
+
+
+def setup_market():
+    """Fills the agent with PAIR_COUNT synthetic pairs whose simulated routes are all profitable"""
+    symbols = [f"SYM{i:04d}" for i in range(PAIR_COUNT)]
+    agent.TRADING_PAIRS = [f"{symbol}-USDT" for symbol in symbols]
+    prices = {symbol: 1.0 + i for i, symbol in enumerate(symbols)}
+    prices["USDT"] = 1.0
+    agent.price_cache.clear()
+    agent.price_cache.update(prices)
+    agent.opportunity_pipeline.sinks = []  # Rendering only: no history or alerts
+    agent.opportunity_pipeline.reset()
+    return symbols, prices
+
+
+def timed(fn, before=None):
+    """Returns the best wall time of REPEATS calls of fn in milliseconds (before() runs untimed first)"""
+    best = float("inf")
+    for _ in range(REPEATS):
+        if before:
+            before()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    symbols, prices = setup_market()
+    step = [0]
+
+    def move_prices(count):
+        # New reference prices for count pairs: the route table is rescored and those rows change
+        step[0] += 1
+        agent.price_cache.update({symbol: prices[symbol] * (1 + step[0] * 1e-4) for symbol in symbols[:count]})
+        agent.get_route_table(agent.PRIORITY_DASHBOARD)
+
+    def age_prices():
+        # Every cached price a second older, as on a refresh a second later
+        for entry in agent.price_cache.entries.values():
+            entry["timestamp"] -= 1
+
+    def dashboard_all():
+        return agent.show_dashboard_all(None)
+
+    def dashboard():
+        return agent.show_dashboard(agent.TRADING_PAIRS[0], None)
+
+    # The cached renderer must produce exactly what the original one did
+    move_prices(PAIR_COUNT)
+    assert dashboard_all() == legacy_dashboard_all()
+
+    print(f"dashboard_all, {PAIR_COUNT} pairs, {len(agent.EXCHANGES)} exchanges, {len(agent.dashboard_fragments)} fragments cached")
+    print(f"{'':>24} {'time (ms)':>10}")
+    print(f"{'original':>24} {timed(legacy_dashboard_all):>10.3f}")
+    print(f"{'cold cache':>24} {timed(dashboard_all, agent.dashboard_fragments.clear):>10.3f}")
+    print(f"{'unchanged':>24} {timed(dashboard_all):>10.3f}")
+    print(f"{'ages 1s older':>24} {timed(dashboard_all, age_prices):>10.3f}")
+    for count in CHANGED_COUNTS:
+        print(f"{f'{count} pairs changed':>24} {timed(dashboard_all, lambda: move_prices(count)):>10.3f}")
+
+    print(f"\ndashboard {agent.TRADING_PAIRS[0]}")
+    print(f"{'cold cache':>24} {timed(dashboard, agent.dashboard_fragments.clear):>10.3f}")
+    print(f"{'unchanged':>24} {timed(dashboard):>10.3f}")
+
+    stats = agent.dashboard_fragments.stats
+    print(f"\nFragment hit rate: {stats['hits'] / (stats['hits'] + stats['misses']) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
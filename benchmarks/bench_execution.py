@@ -0,0 +1,133 @@
+"""
+Benchmark: two-leg trade execution against a local mock exchange API.
+
+Compares sending the legs one after the other on a fresh connection each
+(the naive way) with the TradeExecutor (parallel legs, pooled authenticated
+sessions), then runs the partial-fill, timeout and rejection scenarios end to
+end and checks every trade ends with no open exposure.
+
+Usage: python benchmarks/bench_execution.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+os.environ["ARBITRAGE_AGENT_DATA_DIR"] = tempfile.mkdtemp(prefix="bench_execution_")
+
+import agent  # noqa: E402
+from execution import RestExchangeAdapter, TradeExecutor, build_adapters  # noqa: E402
+from fake_servers import FakeExchangeServer  # noqa: E402
+
+PAIR = "BTC-USDT"
+PRICES = {"binance": {PAIR: 62000.0}, "kraken": {PAIR: 62400.0}}
+CREDENTIALS = {
+    "binance": {"api_key": "binance-key", "api_secret": "binance-secret"},
+    "kraken": {"api_key": "kraken-key", "api_secret": "kraken-secret"}
+}
+EXCHANGE_DELAY = 0.02  # Simulated matching engine + network latency per order
+LEG_TIMEOUT = 0.5
+ROUNDS = 100
+
+LEGS = [
+    {"exchange": "binance", "pair": PAIR, "side": "buy", "quantity": 0.01, "price": 62000.0},
+    {"exchange": "kraken", "pair": PAIR, "side": "sell", "quantity": 0.01, "price": 62400.0}
+]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def sequential(urls):
+    """One leg after the other, each on a new connection (new adapter)"""
+    start = time.perf_counter()
+    for leg in LEGS:
+        adapter = RestExchangeAdapter(leg["exchange"], CREDENTIALS[leg["exchange"]], urls[leg["exchange"]])
+        adapter.place_order(leg["pair"], leg["side"], leg["quantity"], leg["price"], f"seq-{time.perf_counter_ns()}")
+        adapter.close()
+    return time.perf_counter() - start
+
+
+def latency(server):
+    urls = {exchange: server.url(exchange) for exchange in PRICES}
+    executor = TradeExecutor(build_adapters(CREDENTIALS, urls), LEG_TIMEOUT)
+    executor.execute(LEGS)  # Opens the pooled connections
+
+    connections = server.connections
+    naive = [sequential(urls) for _ in range(ROUNDS)]
+    naive_connections = server.connections - connections
+
+    connections = server.connections
+    parallel, legs = [], []
+    for _ in range(ROUNDS):
+        execution = executor.execute(LEGS)
+        assert execution["status"] == "completed"
+        parallel.append(execution["elapsed"])
+        legs.extend(leg["latency"] for leg in execution["legs"])
+    pooled_connections = server.connections - connections
+    executor.close()
+
+    print(f"Two-leg trade, {EXCHANGE_DELAY * 1000:.0f} ms exchange latency, {ROUNDS} trades")
+    print(f"{'':>28} {'p50 (ms)':>9} {'p99 (ms)':>9} {'new connections':>16}")
+    for name, values, connections in (
+        ("sequential, new connection", naive, naive_connections),
+        ("parallel, pooled sessions", parallel, pooled_connections)
+    ):
+        print(f"{name:>28} {percentile(values, 0.5) * 1000:>9.1f} {percentile(values, 0.99) * 1000:>9.1f} {connections:>16}")
+    print(f"{'single leg (pooled)':>28} {percentile(legs, 0.5) * 1000:>9.1f} {percentile(legs, 0.99) * 1000:>9.1f}")
+
+
+def scenarios(server):
+    """End-to-end checks of fill mismatches through agent.execute_trade"""
+    agent.EXCHANGE_CREDENTIALS.update(CREDENTIALS)
+    urls = {exchange: server.url(exchange) for exchange in PRICES}
+    agent.trade_executor = TradeExecutor(build_adapters(agent.EXCHANGE_CREDENTIALS, urls, LEG_TIMEOUT), LEG_TIMEOUT)
+    opportunity = {
+        "pair": PAIR, "buy_exchange": "binance", "buy_price": 62000.0,
+        "sell_exchange": "kraken", "sell_price": 62400.0, "net_gain_percent": 0.2
+    }
+
+    class QuietEnv:
+        def add_reply(self, message):
+            pass
+
+    cases = [
+        ("both legs fill", {}, {}, "completed", 0),
+        ("sell leg fills 40%", {}, {"kraken": 0.4}, "partial", 1),
+        ("sell leg times out", {"kraken": LEG_TIMEOUT * 2}, {}, "completed", 0),
+        ("sell leg rejected (limit)", {}, {"kraken": 0.0}, "failed", 1)
+    ]
+    print(f"\n{'scenario':>26} {'status':>10} {'unwinds':>8} {'time (ms)':>10} {'net position':>13}")
+    for name, delays, fill_ratios, expected, expected_unwinds in cases:
+        server.delays, server.fill_ratios = delays, fill_ratios
+        server.orders.clear()
+        unwinds = agent.trade_executor.stats["unwinds"]
+        trade = agent.execute_trade(opportunity, QuietEnv())
+        unwinds = agent.trade_executor.stats["unwinds"] - unwinds
+
+        # Net base position across all orders the mock exchange filled
+        position = sum(
+            order["filled_quantity"] * (1 if order["side"] == "buy" else -1)
+            for order in list(server.orders.values())
+        )
+        print(f"{name:>26} {trade['status']:>10} {unwinds:>8} {trade['execution_ms']:>10.0f} {position:>13.6f}")
+        assert trade["status"] == expected, (name, trade["status"])
+        assert unwinds == expected_unwinds and abs(position) < 1e-12, (name, unwinds, position)
+    time.sleep(LEG_TIMEOUT * 2)  # Let the slow answer arrive before the server stops
+    print(f"\nExecutor stats: {agent.trade_executor.stats}")
+
+
+def main():
+    secrets = {keys["api_key"]: keys["api_secret"] for keys in CREDENTIALS.values()}
+    delays = {exchange: EXCHANGE_DELAY for exchange in PRICES}
+    with FakeExchangeServer(PRICES, secrets, delays) as server:
+        latency(server)
+        scenarios(server)
+
+
+if __name__ == "__main__":
+    main()
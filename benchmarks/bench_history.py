@@ -0,0 +1,96 @@
+"""
+Benchmark: indexed SQLite history queries vs scanning an in-memory list.
+
+Fills a history store with synthetic opportunities spread over 30 days and
+times the queries behind the history and trades commands: the latest
+opportunities of a pair over the last 24 hours (plus their count) and the
+number of records of a calendar day (the query behind the auto-trading cap,
+without the per-day cache in front of it). The list scan is what the agent
+did before, filtering every record of an in-memory list.
+
+Usage: python benchmarks/bench_history.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from history_store import HistoryStore, day_bounds  # noqa: E402
+
+ROW_COUNTS = [10000, 100000, 1000000]
+PAIRS = ["BTC-USDT", "ETH-USDT", "XRP-USDT", "NEAR-USDT", "SOL-USDT", "ADA-USDT", "DOT-USDT"]
+EXCHANGES = ["binance", "kucoin", "kraken", "okx"]
+SPAN = 30 * 86400
+REPEATS = 20
+SEED = 3
+
+
+def synthetic_records(count, now):
+    rng = random.Random(SEED)
+    records = []
+    for i in range(count):
+        buy, sell = rng.sample(EXCHANGES, 2)
+        timestamp = now - SPAN + SPAN * i / count
+        records.append({
+            "pair": rng.choice(PAIRS),
+            "buy_exchange": buy,
+            "sell_exchange": sell,
+            "diff_percent": rng.uniform(0, 1),
+            "timestamp": datetime.fromtimestamp(timestamp).isoformat()
+        })
+    return records
+
+
+def timed(fn):
+    """Returns the best wall time of REPEATS calls in milliseconds"""
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    now = time.time()
+    since_iso = datetime.fromtimestamp(now - 86400).isoformat()
+    start_iso, end_iso = (datetime.fromtimestamp(bound).isoformat() for bound in day_bounds(now))
+    print(f"{'rows':>9} {'insert (s)':>11} {'pair 24h list (ms)':>19} {'pair 24h sqlite (ms)':>21} {'day count list (ms)':>20} {'day count sqlite (ms)':>22}")
+    for count in ROW_COUNTS:
+        records = synthetic_records(count, now)
+        store = HistoryStore(os.path.join(tempfile.mkdtemp(prefix="bench_history_"), "history.sqlite3"))
+        start = time.perf_counter()
+        store.add_opportunities(records)
+        insert_s = time.perf_counter() - start
+
+        def pair_list():
+            matches = [r for r in records if r["pair"] == "BTC-USDT" and r["timestamp"] >= since_iso]
+            return len(matches), matches[-10:]
+
+        def pair_sqlite():
+            return store.count_opportunities("BTC-USDT", since=now - 86400), store.opportunities("BTC-USDT", since=now - 86400, limit=10)
+
+        def day_list():
+            return sum(1 for r in records if start_iso <= r["timestamp"] < end_iso)
+
+        def day_sqlite():
+            start, end = day_bounds(now)
+            return store.count_opportunities(since=start, until=end)
+
+        # Both sides must agree before being compared
+        assert pair_list()[0] == pair_sqlite()[0]
+        assert [r["timestamp"] for r in pair_list()[1]] == [r["timestamp"] for r in pair_sqlite()[1]]
+        assert day_list() == day_sqlite()
+
+        print(
+            f"{count:>9} {insert_s:>11.2f} {timed(pair_list):>19.3f} {timed(pair_sqlite):>21.3f} "
+            f"{timed(day_list):>20.3f} {timed(day_sqlite):>22.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
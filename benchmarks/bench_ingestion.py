@@ -0,0 +1,110 @@
+"""
+Benchmark: concurrent price ingestion vs the original blocking, one-source-at-a-time fetch.
+
+Runs against a local FakeMarketServer where one exchange ticker is artificially
+slow, to show that it no longer stalls CoinMarketCap and the other exchanges.
+
+Usage: python benchmarks/bench_ingestion.py
+"""
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import agent  # noqa: E402
+from fake_servers import FakeMarketServer  # noqa: E402
+from price_feed import create_session, fetch_prices  # noqa: E402
+from rate_limiter import RequestScheduler  # noqa: E402
+
+SLOW_EXCHANGE = "kraken"
+SLOW_DELAY = 2.0
+TICKER_TIMEOUT = 0.5
+ROUNDS = 50
+
+REFERENCE_PRICES = {
+    "BTC": 62000.0, "ETH": 3400.0, "XRP": 0.58, "NEAR": 1.78,
+    "SOL": 145.0, "ADA": 0.45, "DOT": 7.40, "USDT": 1.0
+}
+
+
+def symbols():
+    result = set()
+    for pair in agent.TRADING_PAIRS:
+        result.update(pair.split('-'))
+    return result
+
+
+def sequential(sources, wanted):
+    """The original behaviour: one blocking requests.get per source, a new connection each time"""
+    arrivals = {}
+    start = time.perf_counter()
+    for source in sources:
+        try:
+            source.fetch(requests, wanted)
+        except Exception:
+            pass
+        arrivals[source.name] = time.perf_counter() - start
+    return arrivals, time.perf_counter() - start
+
+
+def concurrent(sources, wanted, session):
+    """The concurrent ingestion layer; records when each source was merged"""
+    arrivals = {}
+    start = time.perf_counter()
+
+    def on_prices(source, prices):
+        arrivals[source.name] = time.perf_counter() - start
+
+    report = fetch_prices(sources, session, wanted, on_prices)
+    for name, outcome in report.items():
+        arrivals.setdefault(name, outcome["latency"])
+    return arrivals, time.perf_counter() - start
+
+
+def main():
+    server = FakeMarketServer(REFERENCE_PRICES, agent.EXCHANGES, delays={SLOW_EXCHANGE: SLOW_DELAY})
+    with server:
+        agent.COINMARKETCAP_API_URL = server.cmc_url()
+        agent.EXCHANGE_TICKER_URLS = {exchange: server.ticker_url(exchange) for exchange in agent.EXCHANGES}
+        agent.request_scheduler = RequestScheduler()  # The fake server has no rate limits
+        sources = agent.get_price_sources()
+        for source in sources[1:]:
+            source.timeout = TICKER_TIMEOUT
+        wanted = symbols()
+
+        print(f"Slow source: {SLOW_EXCHANGE} ({SLOW_DELAY}s delay, {TICKER_TIMEOUT}s timeout)\n")
+        seq_arrivals, seq_total = sequential(sources, wanted)
+        con_arrivals, con_total = concurrent(sources, wanted, create_session())
+
+        print(f"{'source':>14} {'sequential (ms)':>16} {'concurrent (ms)':>16}")
+        for source in sources:
+            print(f"{source.name:>14} {seq_arrivals[source.name] * 1000:>16.1f} {con_arrivals[source.name] * 1000:>16.1f}")
+        print(f"{'total':>14} {seq_total * 1000:>16.1f} {con_total * 1000:>16.1f}\n")
+
+        # Throughput without the slow source: pooled keep-alive session vs a new connection per request
+        fast_sources = [source for source in sources if source.name != SLOW_EXCHANGE]
+        session = create_session()
+        connections_before = server.connections
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            fetch_prices(fast_sources, session, wanted, lambda source, prices: None)
+        pooled = time.perf_counter() - start
+        pooled_connections = server.connections - connections_before
+
+        connections_before = server.connections
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            sequential(fast_sources, wanted)
+        unpooled = time.perf_counter() - start
+        unpooled_connections = server.connections - connections_before
+
+        print(f"{ROUNDS} refresh rounds of {len(fast_sources)} sources:")
+        print(f"  sequential, no pooling: {ROUNDS / unpooled:8.1f} rounds/s, {unpooled_connections} connections")
+        print(f"  concurrent, pooled:     {ROUNDS / pooled:8.1f} rounds/s, {pooled_connections} connections")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark: cost of the per-stage instrumentation.
+
+Times the recorder itself (record(), a timer block and a timed function
+call) and then the scan, dashboard_all and history commands with
+INSTRUMENTATION on and off, so the overhead of the latency histograms on
+the hot path is visible. Each command run rescans fresh prices (the price
+cache is bumped every run), like a turn with new market data.
+
+CoinMarketCap is a local FakeMarketServer, queried once before timing, so
+the fetch stage shows up in the final 'perf' table too.
+
+Usage: python benchmarks/bench_instrumentation.py
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ["ARBITRAGE_AGENT_DATA_DIR"] = tempfile.mkdtemp(prefix="bench_instrumentation_")
+
+import agent  # noqa: E402
+from instrumentation import PerfRecorder  # noqa: E402
+
+from fake_servers import FakeMarketServer  # noqa: E402
+
+RECORDS = 200000
+RUNS = 300
+COMMANDS = ["scan", "dashboard_all", "history"]
+
+REFERENCE_PRICES = {
+    "BTC": 62000.0, "ETH": 3400.0, "XRP": 0.58, "NEAR": 1.78,
+    "SOL": 145.0, "ADA": 0.45, "DOT": 7.40, "USDT": 1.0
+}
+
+
+class Env:
+    def add_reply(self, message):
+        pass
+
+
+def per_call(function, count):
+    """Mean seconds per call of function over count calls"""
+    start = time.perf_counter()
+    for _ in range(count):
+        function()
+    return (time.perf_counter() - start) / count
+
+
+def bench_recorder():
+    recorder = PerfRecorder()
+    timed = recorder.timed("stage")(lambda: None)
+
+    def timer_block():
+        with recorder.timer("stage"):
+            pass
+
+    baseline = per_call(lambda: None, RECORDS)
+    print(f"{'operation':>22} {'ns/call':>9}")
+    print(f"{'record()':>22} {per_call(lambda: recorder.record('stage', 0.0012), RECORDS) * 1e9:>9.0f}")
+    print(f"{'count()':>22} {per_call(lambda: recorder.count('counter'), RECORDS) * 1e9:>9.0f}")
+    print(f"{'timer block':>22} {per_call(timer_block, RECORDS) * 1e9:>9.0f}")
+    print(f"{'timed call (overhead)':>22} {(per_call(timed, RECORDS) - baseline) * 1e9:>9.0f}")
+    print()
+
+
+def run_command(command, env):
+    """Seconds to answer a command with freshly updated prices"""
+    agent.price_cache.update(dict(REFERENCE_PRICES), "coinmarketcap")
+    start = time.perf_counter()
+    agent.handle_command(command, env)
+    return time.perf_counter() - start
+
+
+def main():
+    bench_recorder()
+
+    env = Env()
+    agent.opportunity_pipeline.sinks = []  # Time detection, not the history writes
+    agent.current_config["min_profit"] = 0.0  # Every positive route is reported, so scans have rows to render
+    with FakeMarketServer(REFERENCE_PRICES) as server:
+        agent.COINMARKETCAP_API_URL = server.cmc_url()
+        agent.refresh_token_prices(agent.get_symbols_to_fetch())
+
+        print(f"Median of {RUNS} runs per command")
+        print(f"{'command':>14} {'off (µs)':>10} {'on (µs)':>10} {'overhead':>9}")
+        for command in COMMANDS:
+            results = {}
+            for enabled in (False, True):
+                agent.perf_recorder.enabled = enabled
+                run_command(command, env)
+                results[enabled] = statistics.median(run_command(command, env) for _ in range(RUNS))
+            off, on = results[False] * 1e6, results[True] * 1e6
+            print(f"{command:>14} {off:>10.1f} {on:>10.1f} {(on - off) / off * 100:>8.1f}%")
+
+    print()
+    print(agent.format_perf_report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark: depth-aware route sizing on order books with 1000 price levels per side.
+
+Compares best_fill (sorted arrays, binary search) with a plain Python walk of
+the levels, then times sizing every route of every pair for one tick.
+
+Usage: python benchmarks/bench_order_book.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from order_book import OrderBook, best_fill  # noqa: E402
+
+LEVELS = 1000
+EXCHANGE_COUNT = 4
+PAIR_COUNTS = [10, 100, 1000]
+BUY_COST_FACTOR = 1.002
+SELL_VALUE_FACTOR = 0.999
+REPEATS = 200
+
+
+def random_book(mid, rng, levels=LEVELS):
+    """Book around mid with levels 1 bp apart and random sizes"""
+    bids = [(mid * (1 - 0.0001 * (i + 1)), rng.uniform(0.01, 1)) for i in range(levels)]
+    asks = [(mid * (1 + 0.0001 * (i + 1)), rng.uniform(0.01, 1)) for i in range(levels)]
+    return OrderBook(bids, asks)
+
+
+def python_walk(asks, bids, buy_cost_factor, sell_value_factor):
+    """Reference sizing: consume both sides level by level while the marginal unit is profitable"""
+    ask_prices, ask_sizes = asks
+    bid_prices, bid_sizes = bids
+    i = j = 0
+    ask_left, bid_left = ask_sizes[0], bid_sizes[0]
+    quantity = profit = 0.0
+    while i < len(ask_prices) and j < len(bid_prices):
+        marginal = bid_prices[j] * sell_value_factor - ask_prices[i] * buy_cost_factor
+        if marginal <= 0:
+            break
+        step = min(ask_left, bid_left)
+        quantity += step
+        profit += step * marginal
+        ask_left -= step
+        bid_left -= step
+        if ask_left <= 0:
+            i += 1
+            ask_left = ask_sizes[i] if i < len(ask_sizes) else 0
+        if bid_left <= 0:
+            j += 1
+            bid_left = bid_sizes[j] if j < len(bid_sizes) else 0
+    return quantity, profit
+
+
+def timed(fn, repeats=REPEATS):
+    """Returns the average wall time of fn in microseconds"""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def main():
+    rng = random.Random(7)
+
+    # Build time of one book from raw levels (sort + cumulative sums)
+    bids = [(100 * (1 - 0.0001 * (i + 1)), rng.uniform(0.01, 1)) for i in range(LEVELS)]
+    asks = [(100 * (1 + 0.0001 * (i + 1)), rng.uniform(0.01, 1)) for i in range(LEVELS)]
+    rng.shuffle(bids)
+    print(f"Load one snapshot ({LEVELS} levels per side): {timed(lambda: OrderBook(bids, asks), 50):.1f} us\n")
+
+    # One route across two books, from a shallow to a deep crossing of the spread
+    print(f"{'crossing':>9} {'size':>10} {'levels':>7} {'python walk (us)':>17} {'best_fill (us)':>15} {'speedup':>8}")
+    for crossing in (0.005, 0.02, 0.1):
+        buy_book = random_book(100, rng)
+        sell_book = random_book(100 * (1 + crossing), rng)
+        # The Python walk gets its levels as plain lists, converted once up front
+        asks_list = (buy_book.asks.prices.tolist(), buy_book.asks.sizes.tolist())
+        bids_list = (sell_book.bids.prices.tolist(), sell_book.bids.sizes.tolist())
+        fill = best_fill(buy_book.asks, sell_book.bids, BUY_COST_FACTOR, SELL_VALUE_FACTOR)
+        quantity, profit = python_walk(asks_list, bids_list, BUY_COST_FACTOR, SELL_VALUE_FACTOR)
+        assert abs(fill["quantity"] - quantity) < 1e-6 and abs(fill["profit"] - profit) < 1e-6
+
+        walk_us = timed(lambda: python_walk(asks_list, bids_list, BUY_COST_FACTOR, SELL_VALUE_FACTOR))
+        fill_us = timed(lambda: best_fill(buy_book.asks, sell_book.bids, BUY_COST_FACTOR, SELL_VALUE_FACTOR))
+        levels = max(fill["buy_levels"], fill["sell_levels"])
+        print(f"{crossing * 100:>8.1f}% {fill['quantity']:>10.2f} {levels:>7} {walk_us:>17.1f} {fill_us:>15.1f} {walk_us / fill_us:>7.1f}x")
+
+    # Every ordered route of every pair on one tick (books with slightly offset mids)
+    print(f"\n{'pairs':>6} {'routes':>7} {'profitable':>11} {'tick (ms)':>10}")
+    for pair_count in PAIR_COUNTS:
+        books = [
+            [random_book(100 * (1 + rng.uniform(-0.003, 0.003)), rng) for _ in range(EXCHANGE_COUNT)]
+            for _ in range(pair_count)
+        ]
+
+        def tick():
+            found = 0
+            for pair_books in books:
+                for buy in pair_books:
+                    for sell in pair_books:
+                        if buy is not sell and best_fill(buy.asks, sell.bids, BUY_COST_FACTOR, SELL_VALUE_FACTOR):
+                            found += 1
+            return found
+
+        found = tick()
+        tick_ms = timed(tick, 3) / 1000
+        routes = pair_count * EXCHANGE_COUNT * (EXCHANGE_COUNT - 1)
+        print(f"{pair_count:>6} {routes:>7} {found:>11} {tick_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
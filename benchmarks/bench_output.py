@@ -0,0 +1,78 @@
+"""
+Benchmark: text replies vs structured (JSON) replies.
+
+Times dashboard_all, scan and history at several pair counts as formatted
+text, as plain data for in-process consumers (agent.command_data: NumPy
+columns and dicts, nothing formatted) and as --json replies, which encode
+that data, and reports the reply sizes. With pyarrow installed, also times
+handing the dashboard_all route columns to Arrow.
+
+The text dashboards reuse cached row fragments, while JSON encodes every
+float at full precision on each call, so for large tables the JSON reply
+can take longer to build than the cached text one.
+
+Usage: python benchmarks/bench_output.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+os.environ["ARBITRAGE_AGENT_DATA_DIR"] = tempfile.mkdtemp(prefix="bench_output_")
+
+import agent  # noqa: E402
+from output import to_arrow  # noqa: E402
+
+PAIR_COUNTS = [10, 100, 500]
+COMMANDS = ["dashboard_all", "scan", "history"]
+REPEATS = 20
+
+
+def setup_market(pair_count):
+    """Fills the agent with synthetic pairs and records one round of opportunities"""
+    symbols = [f"SYM{i:04d}" for i in range(pair_count)]
+    agent.TRADING_PAIRS = [f"{symbol}-USDT" for symbol in symbols]
+    prices = {symbol: 1.0 + i for i, symbol in enumerate(symbols)}
+    prices["USDT"] = 1.0
+    agent.price_cache.clear()
+    agent.price_cache.update(prices)
+    agent.current_config.update(min_profit=0.0, auto_trading=False)
+    agent.history_store.clear()
+    agent.opportunity_pipeline.reset()
+    agent.find_arbitrage_opportunities(None)
+
+
+def timed(fn):
+    """Returns (best wall time of REPEATS calls in milliseconds, last result)"""
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    print(f"{'pairs':>6} {'command':>14} {'text (ms)':>10} {'data (ms)':>10} {'json (ms)':>10} {'text bytes':>11} {'json bytes':>11}")
+    for pair_count in PAIR_COUNTS:
+        setup_market(pair_count)
+        for command in COMMANDS:
+            text_ms, text = timed(lambda: agent.handle_command(command, None))
+            data_ms, _ = timed(lambda: agent.command_data(command, None))
+            json_ms, data = timed(lambda: agent.handle_command(command + " --json", None))
+            print(
+                f"{pair_count:>6} {command:>14} {text_ms:>10.3f} {data_ms:>10.3f} {json_ms:>10.3f} "
+                f"{len(text.encode()):>11} {len(data.encode()):>11}"
+            )
+
+    try:
+        arrow_ms, batch = timed(lambda: to_arrow(agent.dashboard_all_data()["opportunities"]))
+        print(f"\ndashboard_all routes to Arrow ({batch.num_rows} rows): {arrow_ms:.3f} ms")
+    except ImportError as e:
+        print(f"\nArrow handoff skipped: {str(e)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: per-tick latency of the event-driven opportunity pipeline and alert suppression.
+
+Simulated price ticks are pushed through agent.publish_prices with alerts and
+auto-trading on. Reports the time per tick end to end (route scoring
+included) and for the stages after scoring alone (threshold, hysteresis and
+sinks on an already scored table), plus how many alerts hysteresis sends
+compared with alerting on every tick an opportunity is seen.
+
+Usage: python benchmarks/bench_pipeline.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+os.environ["ARBITRAGE_AGENT_DATA_DIR"] = tempfile.mkdtemp(prefix="bench_pipeline_")
+
+import agent  # noqa: E402
+from market_sim import MarketSimulator  # noqa: E402
+from pipeline import OpportunityPipeline  # noqa: E402
+from scan_engine import RouteTable  # noqa: E402
+
+SEED = 11
+PAIR_COUNTS = [10, 100, 1000]
+TICKS = 300
+MIN_PROFIT = 0.1
+
+
+class QuietEnv:
+    """Counts alert replies (trade notifications are ignored)"""
+
+    def __init__(self):
+        self.alerts = 0
+
+    def add_reply(self, message):
+        self.alerts += message.startswith("🚨")
+
+
+def simulate(pair_count):
+    symbols = [f"SYM{i:04d}" for i in range(pair_count)]
+    # Low volatility, so opportunities persist for a while
+    simulator = MarketSimulator(agent.EXCHANGES, SEED, volatility=0.0002)
+    simulator.reset({symbol: 1.0 + i for i, symbol in enumerate(symbols)})
+    _, _, quotes = simulator.walk(TICKS)
+    return [f"{symbol}-USDT" for symbol in symbols], quotes
+
+
+def end_to_end(pairs, quotes):
+    """Pushes every tick through agent.publish_prices; returns (us per tick, alert replies, pipeline stats)"""
+    agent.TRADING_PAIRS = pairs
+    agent.current_config.update(min_profit=MIN_PROFIT, auto_trading=True, alerts=True, max_daily_trades=10**9)
+    agent.history_store.clear()
+    agent.opportunity_pipeline.reset()
+    agent.pipeline_env = env = QuietEnv()
+
+    start = time.perf_counter()
+    for t in range(TICKS):
+        agent.publish_prices(pairs, quotes[t], ("bench", t), record_history=False)
+    elapsed = time.perf_counter() - start
+    return elapsed / TICKS * 1e6, env.alerts, agent.opportunity_pipeline.stats
+
+
+def stages_only(pairs, quotes):
+    """Threshold, hysteresis and counting sinks on pre-scored tables; returns us per tick"""
+    tables = []
+    for t in range(TICKS):
+        table = RouteTable(agent.EXCHANGES)
+        table.update(pairs, quotes[t], t)
+        tables.append(table)
+
+    opened = []
+    pipeline = OpportunityPipeline(
+        score=lambda tick: tables[tick["version"]],
+        select=agent.filter_opportunities,
+        entry=lambda: MIN_PROFIT,
+        exit=lambda: MIN_PROFIT - agent.ALERT_HYSTERESIS,
+        sinks=[lambda events, timestamp: opened.extend(events)]
+    )
+    start = time.perf_counter()
+    for t in range(TICKS):
+        pipeline.push({"version": t, "timestamp": "bench"})
+    return (time.perf_counter() - start) / TICKS * 1e6
+
+
+def main():
+    print(f"{TICKS} ticks, {len(agent.EXCHANGES)} exchanges, min_profit {MIN_PROFIT}%, hysteresis {agent.ALERT_HYSTERESIS} pts\n")
+    print(f"{'pairs':>6} {'end to end (us)':>16} {'stages (us)':>12} {'candidates':>11} {'opened':>7} {'suppressed':>11} {'alert replies':>14}")
+    for pair_count in PAIR_COUNTS:
+        pairs, quotes = simulate(pair_count)
+        per_tick, alerts, stats = end_to_end(pairs, quotes)
+        stage_us = stages_only(pairs, quotes)
+        print(
+            f"{pair_count:>6} {per_tick:>16.1f} {stage_us:>12.1f} {stats['candidates']:>11} "
+            f"{stats['opened']:>7} {stats['suppressed']:>11} {alerts:>14}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark: intent router accuracy, hit rate and latency.
+
+Routes a labeled corpus of free-form messages (commands phrased the way
+users type them, plus open-ended questions that must still reach the LLM)
+and reports how many were routed to the expected command, how many
+questions were wrongly taken as commands, and the routing latency with 7,
+100 and 500 trading pairs. The time saved assumes every routed message
+would otherwise have cost one LLM completion of ASSUMED_LLM_SECONDS.
+
+Usage: python benchmarks/bench_router.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from intent_router import IntentRouter  # noqa: E402
+
+PAIRS = ["BTC-USDT", "ETH-USDT", "XRP-USDT", "NEAR-USDT", "SOL-USDT", "ADA-USDT", "DOT-USDT"]
+EXCHANGES = ["binance", "kucoin", "kraken", "okx"]
+PAIR_COUNTS = [7, 100, 500]
+REPEATS = 200
+ASSUMED_LLM_SECONDS = 3.0
+
+# (message, expected command)
+COMMANDS = [
+    ("scan please", "scan"),
+    ("Scan", "scan"),
+    ("any arbitrage opportunities right now?", "scan"),
+    ("find arbitrage", "scan"),
+    ("scna", "scan"),
+    ("Dashboard btc", "dashboard BTC-USDT"),
+    ("show me the bitcoin dashboard", "dashboard BTC-USDT"),
+    ("eth price", "dashboard ETH-USDT"),
+    ("etherium prices", "dashboard ETH-USDT"),
+    ("SOL/USDT details", "dashboard SOL-USDT"),
+    ("dashbaord ada", "dashboard ADA-USDT"),
+    ("dashboard all", "dashboard_all"),
+    ("show all pairs", "dashboard_all"),
+    ("overview", "dashboard_all"),
+    ("history", "history"),
+    ("history btc 24h", "history BTC-USDT 86400s"),
+    ("past opportunities on kraken in the last 2 hours", "history kraken 7200s"),
+    ("show my trades", "trades"),
+    ("trade history for eth last 7 days", "trades ETH-USDT 604800s"),
+    ("trades on binance", "trades binance"),
+    ("what's the status?", "status"),
+    ("agent status", "status"),
+    ("any triangular loops?", "cycles"),
+    ("multi hop cycles", "cycles"),
+    ("show order books", "orderbooks"),
+    ("monitor btc and eth for 2 minutes", "monitor BTC-USDT ETH-USDT 120"),
+    ("watch solana", "monitor SOL-USDT 60"),
+    ("track dot 90", "monitor DOT-USDT 90"),
+    ("monitors", "monitor status"),
+    ("stop monitoring", "monitor stop"),
+    ("cancel monitor btc", "monitor stop BTC-USDT"),
+    ("end the eth monitor", "monitor stop ETH-USDT"),
+    ("set min profit to 0.5", "config min_profit 0.5"),
+    ("trade amount 250", "config trade_amount 250"),
+    ("max daily trades 20", "config max_daily_trades 20"),
+    ("enable auto trading", "config auto_trading on"),
+    ("turn off alerts", "config alerts off"),
+    ("disable auto trading", "config auto_trading off"),
+    ("json output", "config output json"),
+    ("what can you do", "help"),
+    ("dashboard btc?", "dashboard BTC-USDT"),
+    ("what can you do?", "help"),
+    ("any arbitrage on binance?", "scan"),
+]
+
+# Open-ended and negated messages the router must leave to the LLM
+QUESTIONS = [
+    "how does arbitrage work?",
+    "why is btc cheaper on kraken?",
+    "should I enable auto trading?",
+    "explain the withdrawal fees",
+    "what are the risks of arbitrage?",
+    "hello",
+    "tell me a joke",
+    "thanks!",
+    "what do you think about solana this week",
+    "is it a good idea to trade on weekends given the low liquidity and wider spreads we saw last month",
+    "don't scan",
+    "no scan",
+    "do not monitor btc",
+    "don't enable auto trading",
+    "what is arbitrage?",
+    "is the btc spread worth it",
+    "which exchange has the best eth price?",
+    "when do opportunities usually appear",
+    "can you explain the dashboard",
+    "does auto trading use market orders?",
+    "are the spreads on kraken real?",
+    "what is the status of the market today",
+]
+
+
+def synthetic_pairs(count):
+    return PAIRS + [f"SYM{i:04d}-USDT" for i in range(count - len(PAIRS))]
+
+
+def main():
+    messages = [message for message, _ in COMMANDS] + QUESTIONS
+    print(f"{len(COMMANDS)} command phrasings, {len(QUESTIONS)} open-ended messages\n")
+    print(f"{'pairs':>6} {'correct':>8} {'wrong':>6} {'questions routed':>17} {'build (ms)':>11} {'p50 (us)':>9} {'p99 (us)':>9}")
+    for pair_count in PAIR_COUNTS:
+        start = time.perf_counter()
+        router = IntentRouter(synthetic_pairs(pair_count), EXCHANGES)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        correct = sum(router.route(message) == expected for message, expected in COMMANDS)
+        wrong = [(message, router.route(message), expected) for message, expected in COMMANDS if router.route(message) != expected]
+        questions_routed = sum(router.route(message) is not None for message in QUESTIONS)
+
+        router.latencies.clear()
+        for _ in range(REPEATS):
+            for message in messages:
+                router.route(message)
+        p50, p99 = router.latency_percentiles()
+        print(
+            f"{pair_count:>6} {correct:>8} {len(wrong):>6} {questions_routed:>17} {build_ms:>11.2f} "
+            f"{p50 * 1e6:>9.1f} {p99 * 1e6:>9.1f}"
+        )
+        for message, got, expected in wrong:
+            print(f"{'':>6} {message!r} -> {got!r} (expected {expected!r})")
+
+    routed = correct / len(messages)
+    print(f"\nHit rate: {routed * 100:.0f}% of these messages answered without the LLM")
+    print(f"LLM time saved: ~{correct * ASSUMED_LLM_SECONDS:.0f}s for the {correct} routed messages (at {ASSUMED_LLM_SECONDS}s per completion)")
+
+
+if __name__ == "__main__":
+    main()
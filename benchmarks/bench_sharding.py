@@ -0,0 +1,85 @@
+"""
+Benchmark: sharded route scoring at 1/2/4/8 workers.
+
+Scores ticks of a (pairs x exchanges) price matrix and picks out the
+opportunities above the threshold (what every scan does), with the
+in-process RouteTable and with ShardedRouteTable on 1, 2, 4 and 8 worker
+processes, and reports pairs scored per second and the speedup over the
+in-process table. Prices move by a few basis points around a common
+reference, so only a small share of the routes pass the threshold, as in a
+real market.
+
+Speedups are bounded by the cores of the machine (printed first): on fewer
+cores than workers, the extra workers only add overhead.
+
+Usage: python benchmarks/bench_sharding.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scan_engine import RouteTable  # noqa: E402
+from sharded_scan import ShardedRouteTable  # noqa: E402
+
+PAIR_COUNTS = [2000, 10000, 50000]
+EXCHANGE_COUNTS = [4, 8]
+WORKER_COUNTS = [1, 2, 4, 8]
+TICKS = 10
+TOP_ROUTES = 3
+MIN_PROFIT = 0.2
+
+
+def make_exchanges(count):
+    return {f"exchange{i}": {"fee": 0.1, "withdrawal_fee": 0.05} for i in range(count)}
+
+
+def make_ticks(pair_count, exchange_count, seed=7):
+    """TICKS price matrices: a reference price per pair times a small per-exchange deviation"""
+    rng = np.random.default_rng(seed)
+    reference = rng.uniform(0.01, 50000, size=(pair_count, 1))
+    return [reference * (1 + rng.normal(0, 0.002, size=(pair_count, exchange_count))) for _ in range(TICKS)]
+
+
+def run(table, pairs, ticks):
+    """Returns (pairs scored per second, opportunities in the last tick)"""
+    # One untimed tick starts the pool and maps the shared memory
+    table.update(pairs, ticks[0])
+    table.top_routes(TOP_ROUTES, MIN_PROFIT)
+
+    start = time.perf_counter()
+    for prices in ticks:
+        table.update(pairs, prices)
+        opportunities = table.top_routes(TOP_ROUTES, MIN_PROFIT)
+    return len(pairs) * len(ticks) / (time.perf_counter() - start), len(opportunities)
+
+
+def main():
+    print(f"{os.cpu_count()} cores, {TICKS} ticks per run, threshold {MIN_PROFIT}% on the top {TOP_ROUTES} routes\n")
+    print(f"{'pairs':>6} {'exchanges':>10} {'workers':>8} {'pairs/s':>12} {'speedup':>8} {'opportunities':>14}")
+    for exchange_count in EXCHANGE_COUNTS:
+        exchanges = make_exchanges(exchange_count)
+        for pair_count in PAIR_COUNTS:
+            pairs = [f"SYM{i:05d}-USDT" for i in range(pair_count)]
+            ticks = make_ticks(pair_count, exchange_count)
+
+            baseline, found = run(RouteTable(exchanges), pairs, ticks)
+            print(f"{pair_count:>6} {exchange_count:>10} {'local':>8} {baseline:>12,.0f} {1:>7.2f}x {found:>14}")
+            for workers in WORKER_COUNTS:
+                table = ShardedRouteTable(
+                    exchanges, workers, min_pairs=0,
+                    candidate_filter=lambda: (TOP_ROUTES, MIN_PROFIT)
+                )
+                try:
+                    rate, sharded_found = run(table, pairs, ticks)
+                finally:
+                    table.close()
+                assert sharded_found == found
+                print(f"{pair_count:>6} {exchange_count:>10} {workers:>8} {rate:>12,.0f} {rate / baseline:>7.2f}x {sharded_found:>14}")
+
+
+if __name__ == "__main__":
+    main()
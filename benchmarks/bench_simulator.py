@@ -0,0 +1,91 @@
+"""
+Benchmark: market simulator throughput and a reproducible offline load test.
+
+First measures how many exchange quotes per second the simulator generates,
+then replays simulated ticks into the agent (reference prices into the price
+cache, exchange quotes as live tickers) running scan with auto-trading on,
+twice with the same seed to check the results are identical.
+
+Usage: python benchmarks/bench_simulator.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Keep the benchmark's synthetic prices out of the real price cache file
+os.environ["ARBITRAGE_AGENT_DATA_DIR"] = tempfile.mkdtemp(prefix="bench_simulator_")
+
+import agent  # noqa: E402
+from market_sim import MarketSimulator  # noqa: E402
+
+SEED = 7
+GENERATION_SIZES = [(10, 100000), (100, 10000), (1000, 1000)]  # (symbols, ticks)
+LOAD_TEST_SYMBOLS = 100
+LOAD_TEST_TICKS = 200
+
+
+def generation():
+    print(f"{'symbols':>8} {'ticks':>8} {'quotes':>11} {'time (ms)':>10} {'quotes/s':>12}")
+    for symbol_count, ticks in GENERATION_SIZES:
+        simulator = MarketSimulator(agent.EXCHANGES, SEED)
+        simulator.reset({f"SYM{i:04d}": 1.0 + i for i in range(symbol_count)})
+        start = time.perf_counter()
+        _, _, quotes = simulator.walk(ticks)
+        elapsed = time.perf_counter() - start
+        print(f"{symbol_count:>8} {ticks:>8} {quotes.size:>11} {elapsed * 1000:>10.1f} {quotes.size / elapsed:>12,.0f}")
+
+
+def load_test(seed):
+    """Replays LOAD_TEST_TICKS simulated ticks through scan with auto-trading; returns (summary, elapsed)"""
+    symbols = [f"SYM{i:04d}" for i in range(LOAD_TEST_SYMBOLS)]
+    agent.TRADING_PAIRS = [f"{symbol}-USDT" for symbol in symbols]
+    agent.current_config.update(min_profit=0.1, auto_trading=True, max_daily_trades=10**9)
+    agent.history_store.clear()
+    agent.price_cache.clear()
+    agent.opportunity_pipeline.reset()
+
+    class QuietEnv:
+        def add_reply(self, message):
+            pass
+
+    simulator = MarketSimulator(agent.EXCHANGES, seed)
+    simulator.reset({symbol: 1.0 + i for i, symbol in enumerate(symbols)})
+    _, reference, quotes = simulator.walk(LOAD_TEST_TICKS)
+
+    opportunities = 0
+    start = time.perf_counter()
+    for t in range(LOAD_TEST_TICKS):
+        prices = dict(zip(symbols, reference[t].tolist()))
+        prices["USDT"] = 1.0
+        agent.price_cache.update(prices, source="simulator")
+        for j, exchange in enumerate(simulator.exchange_names):
+            agent.exchange_price_cache[exchange] = dict(zip(symbols, quotes[t, :, j].tolist()))
+        opportunities += len(agent.find_arbitrage_opportunities(QuietEnv()))
+    elapsed = time.perf_counter() - start
+
+    trades = agent.history_store.trades()
+    profit = sum(trade["profit_amount"] for trade in trades)
+    agent.exchange_price_cache.clear()
+    return (opportunities, len(trades), round(profit, 6)), elapsed
+
+
+def main():
+    generation()
+
+    first, elapsed = load_test(SEED)
+    second, _ = load_test(SEED)
+    other, _ = load_test(SEED + 1)
+    assert first == second, "same seed gave different results"
+
+    opportunities, trades, profit = first
+    print(f"\nLoad test: {LOAD_TEST_SYMBOLS} pairs x {len(agent.EXCHANGES)} exchanges, {LOAD_TEST_TICKS} ticks")
+    print(f"  {LOAD_TEST_TICKS / elapsed:,.0f} ticks/s through scan + auto-trading ({elapsed * 1000:.0f} ms)")
+    print(f"  seed {SEED}: {opportunities} opportunities, {trades} trades, ${profit:.2f} simulated profit (identical on rerun)")
+    print(f"  seed {SEED + 1}: {other[0]} opportunities, {other[1]} trades, ${other[2]:.2f} simulated profit")
+
+
+if __name__ == "__main__":
+    main()
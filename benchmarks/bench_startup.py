@@ -0,0 +1,72 @@
+"""
+Benchmark: per-turn latency with a cold vs a warm (persisted) price cache.
+
+Every agent turn runs in a fresh Python process, like the NEAR AI runtime
+calling run(env) once per message. CoinMarketCap is replaced by a local
+FakeMarketServer with a realistic response delay.
+
+Usage: python benchmarks/bench_startup.py
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from fake_servers import FakeMarketServer
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+API_DELAY = 0.3
+TURNS = 5
+COMMAND = "scan"
+
+REFERENCE_PRICES = {
+    "BTC": 62000.0, "ETH": 3400.0, "XRP": 0.58, "NEAR": 1.78,
+    "SOL": 145.0, "ADA": 0.45, "DOT": 7.40, "USDT": 1.0
+}
+
+# Runs one turn: import the agent, then answer one command
+TURN_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import agent
+imported = time.perf_counter()
+agent.COINMARKETCAP_API_URL = {url!r}
+agent.handle_command({command!r}, None)
+done = time.perf_counter()
+print(json.dumps({{"import": imported - start, "command": done - imported, "total": done - start}}))
+"""
+
+
+def run_turn(url, data_dir):
+    script = TURN_SCRIPT.format(root=ROOT, url=url, command=COMMAND)
+    env = dict(os.environ, ARBITRAGE_AGENT_DATA_DIR=data_dir)
+    output = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    with FakeMarketServer(REFERENCE_PRICES, delays={"coinmarketcap": API_DELAY}) as server:
+        url = server.cmc_url()
+
+        # Cold: every turn starts with an empty data directory
+        cold = [run_turn(url, tempfile.mkdtemp(prefix="bench_cold_")) for _ in range(TURNS)]
+
+        # Warm: the first turn fills the cache file, the following turns reuse it
+        data_dir = tempfile.mkdtemp(prefix="bench_warm_")
+        run_turn(url, data_dir)
+        requests_before = server.requests.get("coinmarketcap", 0)
+        warm = [run_turn(url, data_dir) for _ in range(TURNS)]
+        warm_requests = server.requests.get("coinmarketcap", 0) - requests_before
+
+    print(f"'{COMMAND}' per turn, CoinMarketCap delay {API_DELAY * 1000:.0f} ms, {TURNS} turns each\n")
+    print(f"{'cache':>6} {'import (ms)':>12} {'command (ms)':>13} {'turn (ms)':>10}")
+    for name, turns in (("cold", cold), ("warm", warm)):
+        avg = {key: sum(turn[key] for turn in turns) / len(turns) * 1000 for key in turns[0]}
+        print(f"{name:>6} {avg['import']:>12.1f} {avg['command']:>13.1f} {avg['total']:>10.1f}")
+    print(f"\nCoinMarketCap requests during warm turns: {warm_requests}")
+
+
+if __name__ == "__main__":
+    main()
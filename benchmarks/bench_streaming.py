@@ -0,0 +1,154 @@
+"""
+Benchmark: WebSocket ticker streams from a local replay server.
+
+1. Throughput: 1, 4 and 8 exchange streams replaying UPDATES updates each as
+   fast as the client reads them. Reports the updates applied to the price
+   stores per second and the lag between an update's timestamp and its
+   arrival, and checks that every store ends with the server's prices.
+2. Recovery: the same streams with an update lost every GAP_EVERY updates
+   (each one detected and resynced from a snapshot) and the connection
+   dropped every DISCONNECT_EVERY updates. The stores must still end with
+   the server's prices.
+3. Agent: streams at STREAM_RATE updates per second into a running agent,
+   with scan and dashboard latencies while the prices move and how closely
+   the scored exchange prices follow the stream.
+
+Client and server share this machine's cores, so throughput on a single
+core is about half what a client alone would reach.
+
+Usage: python benchmarks/bench_streaming.py
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ["ARBITRAGE_AGENT_DATA_DIR"] = tempfile.mkdtemp(prefix="bench_streaming_")
+
+import agent  # noqa: E402
+from stream_feed import StreamingFeed  # noqa: E402
+
+from fake_environment import FakeEnvironment  # noqa: E402
+from fake_servers import FakeTickerStreamServer  # noqa: E402
+
+EXCHANGE_COUNTS = [1, 4, 8]
+UPDATES = 50000
+GAP_EVERY = 2000
+DISCONNECT_EVERY = 15000
+STREAM_RATE = 2000
+AGENT_SECONDS = 5
+TIMEOUT = 120
+
+REFERENCE_PRICES = {
+    "BTC": 62000.0, "ETH": 3400.0, "XRP": 0.58, "NEAR": 1.78,
+    "SOL": 145.0, "ADA": 0.45, "DOT": 7.40, "USDT": 1.0
+}
+
+
+def run_streams(exchange_count, **server_options):
+    """Streams UPDATES updates per exchange; returns (seconds, feed stats, server counts, whether every store matches)"""
+    exchanges = [f"exchange{i}" for i in range(exchange_count)]
+    with FakeTickerStreamServer(REFERENCE_PRICES, limit=UPDATES, **server_options) as server:
+        feed = StreamingFeed(
+            {exchange: server.url(exchange) for exchange in exchanges}, REFERENCE_PRICES, max_age=60,
+            reconnect_delay=0.01
+        )
+        start = time.perf_counter()
+        feed.start()
+        try:
+            # Done once the server has sent everything and every store holds its final prices
+            deadline = start + TIMEOUT
+            while time.perf_counter() < deadline:
+                streams = [server.streams.get(exchange) for exchange in exchanges]
+                if all(stream and stream["updates"] >= UPDATES for stream in streams) and all(
+                    feed.prices(exchange) == server.latest[exchange] for exchange in exchanges
+                ):
+                    break
+                time.sleep(0.002)
+            elapsed = time.perf_counter() - start
+            matched = all(feed.prices(exchange) == server.latest.get(exchange) for exchange in exchanges)
+            return elapsed, feed.stats(), dict(server.counts), matched
+        finally:
+            feed.stop()
+
+
+def total(stats, key):
+    return sum(stream[key] for stream in stats.values())
+
+
+def bench_throughput():
+    print(f"Throughput: {UPDATES:,} updates per exchange, as fast as possible")
+    print(f"{'exchanges':>10} {'seconds':>8} {'updates/s':>11} {'lag p50 (ms)':>13} {'lag p99 (ms)':>13} {'match':>6}")
+    for exchange_count in EXCHANGE_COUNTS:
+        elapsed, stats, counts, matched = run_streams(exchange_count)
+        applied = total(stats, "updates")
+        lag50 = max(stream["lag_p50"] or 0 for stream in stats.values()) * 1000
+        lag99 = max(stream["lag_p99"] or 0 for stream in stats.values()) * 1000
+        print(f"{exchange_count:>10} {elapsed:>8.2f} {applied / elapsed:>11,.0f} {lag50:>13.1f} {lag99:>13.1f} {'yes' if matched else 'NO':>6}")
+    print()
+
+
+def bench_recovery():
+    print(f"Recovery: an update lost every {GAP_EVERY:,}, a disconnect every {DISCONNECT_EVERY:,} updates")
+    print(f"{'exchanges':>10} {'seconds':>8} {'lost':>6} {'gaps':>6} {'snapshots':>10} {'reconnects':>11} {'superseded':>11} {'match':>6}")
+    for exchange_count in EXCHANGE_COUNTS:
+        elapsed, stats, counts, matched = run_streams(
+            exchange_count, gap_every=GAP_EVERY, disconnect_every=DISCONNECT_EVERY
+        )
+        print(
+            f"{exchange_count:>10} {elapsed:>8.2f} {counts['skipped']:>6} {total(stats, 'gaps'):>6} "
+            f"{total(stats, 'snapshots'):>10} {total(stats, 'reconnects'):>11} {total(stats, 'stale'):>11} "
+            f"{'yes' if matched else 'NO':>6}"
+        )
+    print()
+
+
+def timed_command(command, env):
+    start = time.perf_counter()
+    agent.handle_command(command, env)
+    return time.perf_counter() - start
+
+
+def bench_agent():
+    print(f"Agent: {len(agent.EXCHANGES)} exchange streams at {STREAM_RATE:,} updates/s each for {AGENT_SECONDS}s")
+    agent.opportunity_pipeline.sinks = []  # No history writes: only scoring and rendering are timed
+    agent.price_cache.update(REFERENCE_PRICES, "coinmarketcap")
+    with FakeTickerStreamServer(REFERENCE_PRICES, rate=STREAM_RATE) as server:
+        agent.EXCHANGE_STREAM_URLS = {exchange: server.url(exchange) for exchange in agent.EXCHANGES}
+        env = FakeEnvironment()
+        scans, dashboards, deviations = [], [], []
+        end = time.perf_counter() + AGENT_SECONDS
+        while time.perf_counter() < end:
+            scans.append(timed_command("scan", env))
+            dashboards.append(timed_command("dashboard BTC-USDT", env))
+
+            # Scored exchange prices against the stream's latest prices
+            table = agent.route_table
+            row = table.prices[table.pair_index["BTC-USDT"]]
+            for j, exchange in enumerate(table.exchange_names):
+                latest = server.latest[exchange]["BTC"]
+                deviations.append(abs(row[j] / latest - 1) * 1e4)
+            time.sleep(0.01)
+
+        stats = agent.stream_feed.stats()
+        agent.stream_feed.stop()
+
+    print(f"{'':>24} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for name, latencies in (("scan", scans), ("dashboard BTC-USDT", dashboards)):
+        latencies = sorted(latencies)
+        print(f"{name:>24} {statistics.median(latencies) * 1000:>9.3f} {latencies[int(len(latencies) * 0.99)] * 1000:>9.3f}")
+    print(f"Updates applied: {total(stats, 'updates'):,}, scans run: {len(scans)}")
+    print(f"Scored BTC prices vs. the stream's latest: median {statistics.median(deviations):.2f} bp, max {max(deviations):.2f} bp")
+
+
+def main():
+    print(f"{os.cpu_count()} cores\n")
+    bench_throughput()
+    bench_recovery()
+    bench_agent()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Benchmark suite: throughput and latency of every command path.
+
+Drives handle_command(cmd, env) with a FakeEnvironment for scan (text and
+JSON), dashboard, dashboard_all, history (all and per pair), monitor (start
+and stop) and monitor status, plus complete turns through run(env), at
+several pair and exchange counts. For each (command, pairs, exchanges) case it reports the
+commands per second and the p50 / p99 / max latency. Prices move by a few
+basis points before every run, so each command rescans fresh market data
+like a turn after a price update.
+
+Each configuration starts from an empty price cache, filled from a local
+FakeMarketServer (the 'fetch' column is that cold CoinMarketCap fetch), and
+an empty opportunity history, which the scans then fill.
+
+Results are written as JSON (commit, machine, settings and one record per
+case) so two versions can be compared:
+
+Usage: python benchmarks/bench_suite.py [RESULTS.json]
+       python benchmarks/bench_suite.py --compare BASELINE.json RESULTS.json
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ["ARBITRAGE_AGENT_DATA_DIR"] = tempfile.mkdtemp(prefix="bench_suite_")
+
+import agent  # noqa: E402
+from market_sim import MarketSimulator  # noqa: E402
+from rate_limiter import RequestScheduler  # noqa: E402
+from rolling_stats import StatsEngine  # noqa: E402
+from sharded_scan import ShardedRouteTable  # noqa: E402
+from timeseries import TimeSeriesStore  # noqa: E402
+
+from fake_environment import FakeEnvironment  # noqa: E402
+from fake_servers import FakeMarketServer  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DEFAULT_OUTPUT = "bench_suite_results.json"
+
+PAIR_COUNTS = [7, 100, 1000]
+EXCHANGE_COUNTS = [4, 8]
+RUNS = 200            # Runs per case...
+MAX_CASE_SECONDS = 3  # ...or fewer if they take longer than this (but at least MIN_RUNS)
+MIN_RUNS = 20
+MIN_PROFIT = 0.2      # Low enough that scans find (and record) opportunities
+REGRESSION_THRESHOLD = 0.10  # --compare counts p50 slowdowns beyond 10%
+
+REFERENCE_PRICES = {
+    "BTC": 62000.0, "ETH": 3400.0, "XRP": 0.58, "NEAR": 1.78,
+    "SOL": 145.0, "ADA": 0.45, "DOT": 7.40
+}
+
+# The configured exchanges, before configure() replaces them
+BASE_EXCHANGES = dict(agent.EXCHANGES)
+
+
+def make_exchanges(count):
+    """The agent's exchanges, plus synthetic ones with similar fees up to count"""
+    exchanges = dict(list(BASE_EXCHANGES.items())[:count])
+    for i in range(len(exchanges), count):
+        exchanges[f"exchange{i}"] = {
+            "fee": 0.08 + 0.02 * (i % 4),
+            "withdrawal_fee": 0.05 + 0.01 * (i % 3),
+            "price_variance": (-0.3 + 0.05 * (i % 5), 0.2 + 0.05 * (i % 3))
+        }
+    return exchanges
+
+
+def make_prices(pair_count):
+    """Reference prices of pair_count symbols (the real ones first, then synthetic ones) and USDT"""
+    prices = dict(list(REFERENCE_PRICES.items())[:pair_count])
+    for i in range(len(prices), pair_count):
+        prices[f"SYM{i:04d}"] = 0.01 + (i * 7919 % 100000) / 100
+    prices["USDT"] = 1.0
+    return prices
+
+
+def configure(pair_count, exchange_count, server):
+    """Points the agent at pair_count pairs on exchange_count exchanges, with empty caches and history"""
+    agent.stop_monitors([])
+    exchanges = make_exchanges(exchange_count)
+    agent.EXCHANGES.clear()
+    agent.EXCHANGES.update(exchanges)
+
+    # Everything sized by the exchanges is rebuilt
+    candidate_filter = agent.route_table.candidate_filter
+    agent.route_table.close()
+    agent.route_table = ShardedRouteTable(
+        agent.EXCHANGES, agent.SCAN_WORKERS, agent.SHARDED_SCAN_MIN_PAIRS, candidate_filter=candidate_filter
+    )
+    agent.EXCHANGE_NAMES = agent.route_table.exchange_names
+    agent.market_simulator = MarketSimulator(agent.EXCHANGES, agent.SIMULATION_SEED, agent.SIMULATION_TICK_RATE)
+    agent.variation_cache, agent.variation_cache_tick = {}, None
+    agent.price_stats = StatsEngine(agent.STATS_WINDOW, agent.STATS_EWMA_ALPHA)
+    agent.spread_stats = StatsEngine(agent.STATS_WINDOW, agent.STATS_EWMA_ALPHA)
+    agent.stats_keys = ([], [], [])
+    agent.price_history = TimeSeriesStore(agent.PRICE_HISTORY_POINTS, agent.PRICE_HISTORY_ROLLUPS)
+    agent.price_history_version = None
+    agent.cycle_detector = None
+
+    prices = make_prices(pair_count)
+    agent.TRADING_PAIRS = [f"{symbol}-USDT" for symbol in prices if symbol != "USDT"]
+    agent.SYMBOL_MAPPING.clear()
+    agent.SYMBOL_MAPPING.update({symbol: symbol for symbol in prices})
+    agent.history_store.clear()
+    agent.dashboard_fragments.clear()
+    agent.opportunity_pipeline.reset()
+    agent.price_cache.clear()
+    server.prices = prices
+
+    # Cold start: the first lookup waits for CoinMarketCap
+    start = time.perf_counter()
+    agent.get_route_table()
+    return prices, time.perf_counter() - start
+
+
+def measure(command, env, before=None, after=None):
+    """Latencies (seconds) of up to RUNS calls of handle_command(command, env); before/after run untimed around each"""
+    latencies = []
+    deadline = time.perf_counter() + MAX_CASE_SECONDS
+    while len(latencies) < RUNS and (len(latencies) < MIN_RUNS or time.perf_counter() < deadline):
+        if before:
+            before()
+        start = time.perf_counter()
+        reply = agent.handle_command(command, env)
+        latencies.append(time.perf_counter() - start)
+        if after:
+            after()
+    assert reply, f"No reply to {command!r}"
+    return latencies
+
+
+def measure_turns(message, before=None):
+    """Latencies of complete turns: run(env) with a new FakeEnvironment holding one message"""
+    latencies = []
+    deadline = time.perf_counter() + MAX_CASE_SECONDS
+    while len(latencies) < RUNS and (len(latencies) < MIN_RUNS or time.perf_counter() < deadline):
+        env = FakeEnvironment().say(message)
+        if before:
+            before()
+        start = time.perf_counter()
+        agent.run(env)
+        latencies.append(time.perf_counter() - start)
+        assert env.replies and env.input_requests == 1 and not env.completions
+    return latencies
+
+
+def summarize(command, pair_count, exchange_count, latencies):
+    values = np.array(latencies)
+    return {
+        "command": command,
+        "pairs": pair_count,
+        "exchanges": exchange_count,
+        "runs": len(values),
+        "throughput": len(values) / values.sum(),
+        "mean_ms": values.mean() * 1000,
+        "p50_ms": float(np.percentile(values, 50)) * 1000,
+        "p99_ms": float(np.percentile(values, 99)) * 1000,
+        "max_ms": values.max() * 1000
+    }
+
+
+def run_cases(pair_count, exchange_count, server):
+    prices, fetch = configure(pair_count, exchange_count, server)
+    env = FakeEnvironment()
+    pair = agent.TRADING_PAIRS[0]
+    step = [0]
+
+    def move_prices():
+        # A few basis points on every symbol: the next command rescans the route table
+        step[0] += 1
+        drift = 1 + 1e-4 * (step[0] % 20)
+        agent.price_cache.update({symbol: price * drift for symbol, price in prices.items()}, "coinmarketcap")
+
+    def stop_monitor():
+        monitor = agent.active_monitors.get(pair)
+        agent.handle_command(f"monitor stop {pair}", env)
+        if monitor:
+            monitor.join()
+
+    cases = [
+        ("scan", measure("scan", env, move_prices)),
+        (f"dashboard {pair}", measure(f"dashboard {pair}", env, move_prices)),
+        ("dashboard_all", measure("dashboard_all", env, move_prices)),
+        ("history", measure("history", env)),
+        (f"history {pair} 1h", measure(f"history {pair} 1h", env)),
+        ("scan --json", measure("scan --json", env, move_prices)),
+        (f"monitor {pair} 60", measure(f"monitor {pair} 60", env, after=stop_monitor))
+    ]
+
+    agent.handle_command(f"monitor {pair} 60", env)
+    cases.append(("monitor status", measure("monitor status", env)))
+    stop_monitor()
+
+    cases.append(("turn: scan", measure_turns("scan", move_prices)))
+
+    results = [summarize(command, pair_count, exchange_count, latencies) for command, latencies in cases]
+    for result in results:
+        result["cold_fetch_ms"] = fetch * 1000
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline_path, results_path):
+    """Prints the p50 / p99 change of every case present in both result files"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(results_path) as f:
+        results = json.load(f)
+
+    before = {(r["command"], r["pairs"], r["exchanges"]): r for r in baseline["results"]}
+    print(f"{baseline.get('commit') or baseline_path} -> {results.get('commit') or results_path}\n")
+    print(f"{'command':>26} {'pairs':>6} {'exch':>5} {'p50 (ms)':>18} {'p99 (ms)':>18}")
+    regressions = 0
+    for result in results["results"]:
+        old = before.get((result["command"], result["pairs"], result["exchanges"]))
+        if old is None:
+            continue
+        changes = []
+        for key in ("p50_ms", "p99_ms"):
+            change = result[key] / old[key] - 1 if old[key] else 0.0
+            changes.append(f"{result[key]:>8.3f} ({change:>+6.1%})")
+            if key == "p50_ms" and change > REGRESSION_THRESHOLD:
+                regressions += 1
+        print(f"{result['command']:>26} {result['pairs']:>6} {result['exchanges']:>5} {changes[0]:>18} {changes[1]:>18}")
+    print(f"\n{regressions} case(s) with a p50 more than {REGRESSION_THRESHOLD:.0%} slower")
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "--compare":
+        compare(sys.argv[2], sys.argv[3])
+        return
+    output = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_OUTPUT
+
+    agent.current_config["min_profit"] = MIN_PROFIT
+    agent.request_scheduler = RequestScheduler()  # The fake server has no rate limits
+    results = []
+    with FakeMarketServer({}) as server:
+        agent.COINMARKETCAP_API_URL = server.cmc_url()
+
+        print(f"{'command':>26} {'pairs':>6} {'exch':>5} {'runs':>5} {'cmd/s':>10} {'p50 (ms)':>9} {'p99 (ms)':>9} {'max (ms)':>9} {'fetch (ms)':>11}")
+        for exchange_count in EXCHANGE_COUNTS:
+            for pair_count in PAIR_COUNTS:
+                for result in run_cases(pair_count, exchange_count, server):
+                    results.append(result)
+                    print(
+                        f"{result['command']:>26} {result['pairs']:>6} {result['exchanges']:>5} {result['runs']:>5} "
+                        f"{result['throughput']:>10,.0f} {result['p50_ms']:>9.3f} {result['p99_ms']:>9.3f} "
+                        f"{result['max_ms']:>9.3f} {result['cold_fetch_ms']:>11.1f}"
+                    )
+                print()
+
+    with open(output, "w") as f:
+        json.dump({
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.platform(),
+            "cpus": os.cpu_count(),
+            "settings": {
+                "runs": RUNS, "max_case_seconds": MAX_CASE_SECONDS, "min_runs": MIN_RUNS,
+                "min_profit": MIN_PROFIT, "scan_workers": agent.SCAN_WORKERS
+            },
+            "results": results
+        }, f, indent=1)
+    print(f"Results saved to {output} (compare two runs with --compare BASELINE.json RESULTS.json)")
+
+
+if __name__ == "__main__":
+    main()
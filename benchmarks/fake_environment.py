@@ -0,0 +1,50 @@
+"""
+Offline stand-in for the NEAR AI Environment, used by the benchmarks to
+drive agent.run(env) and handle_command(cmd, env) without the runtime.
+"""
+import threading
+import time
+
+
+class FakeEnvironment:
+    """
+    Records everything the agent does with its environment.
+
+    list_messages() returns the conversation (a list of {"role", "content"}
+    dicts); add_reply() appends to replies and to the conversation, like the
+    real thread. completion() records the messages it was given and answers
+    completion_reply after completion_delay seconds. request_user_input()
+    only counts its calls. Replies can arrive from monitor threads, so they
+    are recorded under a lock.
+    """
+
+    def __init__(self, messages=None, completion_reply="(model reply)", completion_delay=0.0):
+        self.messages = list(messages or [])
+        self.completion_reply = completion_reply
+        self.completion_delay = completion_delay
+        self.replies = []
+        self.completions = []
+        self.input_requests = 0
+        self._lock = threading.Lock()
+
+    def say(self, content):
+        """Adds a user message to the conversation"""
+        self.messages.append({"role": "user", "content": content})
+        return self
+
+    def list_messages(self):
+        return list(self.messages)
+
+    def add_reply(self, message):
+        with self._lock:
+            self.replies.append(message)
+            self.messages.append({"role": "assistant", "content": message})
+
+    def completion(self, messages):
+        self.completions.append(list(messages))
+        if self.completion_delay:
+            time.sleep(self.completion_delay)
+        return self.completion_reply
+
+    def request_user_input(self):
+        self.input_requests += 1
@@ -0,0 +1,463 @@
+"""
+Local stand-in HTTP servers used by the benchmarks, so they run offline.
+
+FakeMarketServer answers the CoinMarketCap quotes endpoint and one ticker
+endpoint per exchange, each with its own artificial delay. FakeExchangeServer
+is a mock trading API for the execution adapters. FakeTickerStreamServer
+replays WebSocket ticker streams for stream_feed.py.
+"""
+import hashlib
+import hmac
+import json
+import random
+import socket
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CMC_PATH = "/v1/cryptocurrency/quotes/latest"
+HEARTBEAT_INTERVAL = 0.5  # Seconds between heartbeats of a ticker stream past its limit
+
+
+class FakeMarketServer:
+    """
+    Serves CoinMarketCap-style quotes on CMC_PATH and Binance-style tickers on /ticker/<exchange>.
+
+    delays maps "coinmarketcap" or an exchange name to a response delay in seconds.
+    """
+
+    def __init__(self, prices, exchanges=(), delays=None):
+        self.prices = dict(prices)
+        self.exchanges = list(exchanges)
+        self.delays = dict(delays or {})
+        self.requests = {}
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, path):
+        return self.base_url + path
+
+    def cmc_url(self):
+        return self.url(CMC_PATH)
+
+    def ticker_url(self, exchange):
+        return self.url(f"/ticker/{exchange}")
+
+    def _count(self, route):
+        with self._lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+
+    def _quotes(self, query):
+        symbols = parse_qs(query).get("symbol", [""])[0].split(",")
+        data = {}
+        for symbol in symbols:
+            if symbol in self.prices:
+                data[symbol] = {"symbol": symbol, "quote": {"USD": {"price": self.prices[symbol]}}}
+        return {"status": {"error_code": 0}, "data": data}
+
+    def _ticker(self, exchange):
+        # Deterministic per-exchange offset so exchanges disagree a little
+        offset = 1 + (sum(map(ord, exchange)) % 7 - 3) / 1000
+        return [
+            {"symbol": f"{symbol}USDT", "price": f"{price * offset:.8f}"}
+            for symbol, price in self.prices.items() if symbol != "USDT"
+        ]
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, so pooled sessions can reuse connections
+            wbufsize = -1  # Send headers and body in one write (avoids delayed-ACK stalls)
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path == CMC_PATH:
+                    route = "coinmarketcap"
+                    body = server._quotes(parsed.query)
+                elif parsed.path.startswith("/ticker/"):
+                    route = parsed.path[len("/ticker/"):]
+                    body = server._ticker(route)
+                else:
+                    self.send_error(404)
+                    return
+
+                server._count(route)
+                delay = server.delays.get(route, 0)
+                if delay:
+                    time.sleep(delay)
+
+                payload = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                try:
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client gave up (timeout) before the slow answer arrived
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class FakeExchangeServer:
+    """
+    Mock trading API in the format of execution.RestExchangeAdapter, one per exchange under /<exchange>.
+
+    Orders fill against prices ({exchange: {pair: price}}): a limit buy fills
+    if its price is at or above the exchange price, a limit sell if at or
+    below, market orders always, in each case at the exchange price and for
+    fill_ratios[exchange] of the quantity (default 1). The fill is decided
+    when the order arrives, then the answer waits delays[exchange] seconds, so
+    a client that times out can still cancel the order to learn its fill.
+    Signatures are checked against secrets ({api_key: api_secret}).
+    """
+
+    def __init__(self, prices, secrets, delays=None, fill_ratios=None):
+        self.prices = {exchange: dict(pairs) for exchange, pairs in prices.items()}
+        self.secrets = dict(secrets)
+        self.delays = dict(delays or {})
+        self.fill_ratios = dict(fill_ratios or {})
+        self.orders = {}  # client_order_id -> order
+        self.requests = {}
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, exchange):
+        return f"{self.base_url}/{exchange}"
+
+    def _authorized(self, headers, path, body):
+        secret = self.secrets.get(headers.get("X-API-KEY"))
+        if secret is None:
+            return False
+        message = f"{headers.get('X-API-TIMESTAMP')}POST{path}{body}".encode()
+        expected = hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, headers.get("X-API-SIGNATURE", ""))
+
+    def _order(self, exchange, request):
+        price = self.prices.get(exchange, {}).get(request["pair"])
+        if price is None:
+            return {"error": f"unknown pair {request['pair']}"}
+        limit = request.get("price")
+        crosses = limit is None or (limit >= price if request["side"] == "buy" else limit <= price)
+        filled = request["quantity"] * self.fill_ratios.get(exchange, 1.0) if crosses else 0.0
+        order = {
+            "order_id": f"{exchange}-{len(self.orders) + 1}",
+            "status": "filled" if filled >= request["quantity"] else ("partially_filled" if filled else "expired"),
+            "filled_quantity": filled,
+            "average_price": price if filled else None
+        }
+        with self._lock:
+            self.orders[request["client_order_id"]] = dict(order, exchange=exchange, side=request["side"], pair=request["pair"])
+        return order
+
+    def _cancel(self, request):
+        with self._lock:
+            order = self.orders.get(request["client_order_id"])
+        if order is None:
+            return {"error": "unknown order"}
+        return {key: order[key] for key in ("order_id", "status", "filled_quantity", "average_price")}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            wbufsize = -1
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_POST(self):
+                parts = self.path.strip("/").split("/")
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length).decode()
+                if len(parts) != 2 or parts[1] not in ("order", "cancel"):
+                    self.send_error(404)
+                    return
+                exchange, action = parts
+                with server._lock:
+                    server.requests[(exchange, action)] = server.requests.get((exchange, action), 0) + 1
+
+                if not server._authorized(self.headers, f"/{action}", body):
+                    answer = {"error": "invalid signature"}
+                elif action == "order":
+                    answer = server._order(exchange, json.loads(body))
+                else:
+                    answer = server._cancel(json.loads(body))
+
+                delay = server.delays.get(exchange, 0)
+                if delay and action == "order":
+                    time.sleep(delay)
+
+                payload = json.dumps(answer).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                try:
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class FakeTickerStreamServer:
+    """
+    WebSocket ticker feed in the format of stream_feed.TickerProtocol, one stream per exchange under /<exchange>.
+
+    Each exchange streams a seeded random walk from prices (of the symbols
+    of its first subscription): updates that each move one symbol, rate per
+    second (None: as fast as the client reads them), up to limit updates,
+    then heartbeats. The stream carries on where it was when a client reconnects. gap_every
+    skips the sequence number of every gap_every-th update, whose price
+    change is lost as if dropped upstream, and disconnect_every drops a
+    connection after it got that many updates. latest[exchange] holds the
+    current prices of an exchange (including lost updates), to check a
+    client against. Imports the frame helpers of stream_feed, so the
+    repository root must be on sys.path.
+    """
+
+    def __init__(self, prices, rate=None, limit=None, gap_every=None, disconnect_every=None, seed=0, batch=64):
+        self.prices = dict(prices)
+        self.rate = rate
+        self.limit = limit
+        self.gap_every = gap_every
+        self.disconnect_every = disconnect_every
+        self.seed = seed
+        self.batch = batch
+        self.streams = {}
+        self.latest = {}
+        self.counts = {"connections": 0, "updates": 0, "skipped": 0, "snapshots": 0, "disconnects": 0}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def url(self, exchange):
+        host, port = self._server.server_address[:2]
+        return f"ws://{host}:{port}/{exchange}"
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.counts[name] += n
+
+    def _stream(self, exchange, symbols):
+        """The stream of an exchange: it continues across connections, like a real exchange feed"""
+        with self._lock:
+            stream = self.streams.get(exchange)
+            if stream is None:
+                rng = random.Random(f"{self.seed}-{exchange}")
+                stream = self.streams[exchange] = {
+                    "prices": {symbol: self.prices[symbol] for symbol in symbols},
+                    "seq": rng.randrange(1000, 1000000),
+                    "updates": 0,
+                    "rng": rng
+                }
+                self.latest[exchange] = stream["prices"]
+            return stream
+
+    def _make_handler(self):
+        from stream_feed import OPCODE_CLOSE, OPCODE_TEXT, accept_key, encode_frame, read_frame
+
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                request = self.rfile.readline().decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = self.rfile.readline().decode("latin-1").strip()
+                    if not line:
+                        break
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if len(request) < 2 or "sec-websocket-key" not in headers:
+                    self.wfile.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+                    return
+                self.wfile.write((
+                    "HTTP/1.1 101 Switching Protocols\r\n"
+                    "Upgrade: websocket\r\n"
+                    "Connection: Upgrade\r\n"
+                    f"Sec-WebSocket-Accept: {accept_key(headers['sec-websocket-key'])}\r\n\r\n"
+                ).encode())
+
+                exchange = request[1].strip("/")
+                server._count("connections")
+                self.subscribed = threading.Event()
+                self.closed = threading.Event()
+                self.symbols = []
+                self.snapshot_requests = 0
+                threading.Thread(target=self.read_requests, daemon=True).start()
+                if self.subscribed.wait(5):
+                    self.replay(exchange)
+                self.closed.set()
+                try:
+                    # Also wakes up read_requests, which holds rfile until its read returns
+                    self.request.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+            def read_requests(self):
+                try:
+                    while not self.closed.is_set():
+                        _, opcode, payload = read_frame(self.rfile)
+                        if opcode == OPCODE_CLOSE:
+                            break
+                        if opcode == OPCODE_TEXT:
+                            request = json.loads(payload)
+                            if request.get("op") == "subscribe":
+                                self.symbols = [symbol for symbol in request["symbols"] if symbol in server.prices]
+                                self.subscribed.set()
+                            elif request.get("op") == "snapshot":
+                                self.snapshot_requests += 1
+                except Exception:
+                    pass
+                self.closed.set()
+
+            def send(self, frames):
+                self.request.sendall(b"".join(frames))
+
+            def replay(self, exchange):
+                stream = server._stream(exchange, self.symbols)
+                prices, symbols, rng = stream["prices"], list(stream["prices"]), stream["rng"]
+                sent = 0  # On this connection
+                start = heartbeat = time.perf_counter()
+                try:
+                    while not self.closed.is_set():
+                        frames = []
+                        while self.snapshot_requests:
+                            self.snapshot_requests -= 1
+                            frames.append(encode_frame(json.dumps(
+                                {"type": "snapshot", "seq": stream["seq"], "ts": time.time(), "prices": prices}
+                            ), mask=False))
+                            server._count("snapshots")
+
+                        remaining = server.batch if server.limit is None else min(server.batch, server.limit - stream["updates"])
+                        if remaining <= 0 or not symbols:
+                            # Done: stay connected (answering snapshots, with heartbeats) until the client leaves
+                            if time.perf_counter() >= heartbeat:
+                                frames.append(encode_frame(json.dumps(
+                                    {"type": "heartbeat", "seq": stream["seq"], "ts": time.time()}
+                                ), mask=False))
+                                heartbeat = time.perf_counter() + HEARTBEAT_INTERVAL
+                            if frames:
+                                self.send(frames)
+                            self.closed.wait(0.01)
+                            continue
+
+                        skipped = 0
+                        now = time.time()
+                        for _ in range(remaining):
+                            symbol = symbols[rng.randrange(len(symbols))]
+                            prices[symbol] *= 1 + rng.gauss(0, 0.0005)
+                            stream["seq"] += 1
+                            stream["updates"] += 1
+                            if server.gap_every and stream["updates"] % server.gap_every == 0:
+                                skipped += 1
+                                continue
+                            frames.append(encode_frame(json.dumps(
+                                {"type": "ticker", "seq": stream["seq"], "ts": now, "prices": {symbol: prices[symbol]}}
+                            ), mask=False))
+                        self.send(frames)
+                        sent += remaining
+                        server._count("updates", remaining - skipped)
+                        server._count("skipped", skipped)
+
+                        if server.disconnect_every and sent >= server.disconnect_every:
+                            server._count("disconnects")
+                            return
+                        if server.rate:
+                            delay = start + sent / server.rate - time.perf_counter()
+                            if delay > 0:
+                                time.sleep(delay)
+                except OSError:
+                    pass
+
+        return Handler
+
+    def start(self):
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,34 @@
+"""
+Precomputed configuration lookups.
+
+Many agent functions derived the same tables from TRADING_PAIRS again on
+every call (the base and quote of every pair with pair.split('-'), the
+symbols to fetch, the pair of a bare symbol). ConfigSnapshot builds them
+once, when the agent is loaded, and the agent only builds a new one when
+TRADING_PAIRS changes.
+
+The snapshot isn't persisted between turns: even at thousands of pairs,
+loading the tables from a JSON (or marshal) file took as long as building
+them.
+"""
+
+
+class ConfigSnapshot:
+    """
+    Lookup tables of a list of trading pairs.
+
+    pair_parts maps a pair to its (base, quote) and pair_bases lists the base
+    of every pair; bases lists the distinct bases in pair order, pairs_by_base
+    the pairs of each base and symbols every base and quote.
+    """
+
+    def __init__(self, pairs):
+        self.pairs = list(pairs)
+        self.pair_set = set(self.pairs)
+        self.pair_parts = {pair: tuple(pair.split('-')) for pair in self.pairs}
+        self.pair_bases = [base for base, quote in self.pair_parts.values()]
+        self.pairs_by_base = {}
+        for pair, (base, quote) in self.pair_parts.items():
+            self.pairs_by_base.setdefault(base, []).append(pair)
+        self.bases = list(self.pairs_by_base)
+        self.symbols = frozenset(symbol for parts in self.pair_parts.values() for symbol in parts)
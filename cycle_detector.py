@@ -0,0 +1,280 @@
+"""
+Multi-hop arbitrage detector over a currency graph.
+
+Every (exchange, asset) is a node. Trading a pair on an exchange adds one edge
+in each direction (buy and sell) and moving an asset from one exchange to
+another adds a transfer edge. Edge weights are -log(rate after fees), so a loop
+whose weights add up to less than zero ends with more of the starting asset
+than it began with.
+
+Price updates only rewrite the weights of the two edges of the updated
+(exchange, pair); the graph itself is built once. The best loop through
+every edge is kept between updates, so after a few price changes only the
+updated edges, and the edges whose best loop ran through one of them, are
+searched again: every kept loop has its current profit, and every loop an
+update made profitable is found through the updated edge. A loop that only
+became the best of some other edge (while another loop through the updated
+edge is better still) is picked up by the next full search, which cycles()
+runs at least every full_search_updates price changes and every
+full_search_seconds seconds: that bounds how long such a loop can go
+unreported while prices keep streaming in.
+"""
+import math
+import time
+
+
+class CycleDetector:
+    """Finds profitable loops of up to max_hops trades/transfers, within one exchange or across exchanges"""
+
+    def __init__(self, exchanges, pairs, max_hops=4, full_search_updates=1000, full_search_seconds=60):
+        self.max_hops = max_hops
+        self.full_search_updates = full_search_updates
+        self.full_search_seconds = full_search_seconds
+        self._updates = 0  # Incremental price changes since the last full search
+        self._searched_at = 0.0
+        self.pairs = list(pairs)
+        self.nodes = []
+        self.node_index = {}
+        self.out_edges = []
+        self.in_edges = []
+        self.edge_src = []
+        self.edge_dst = []
+        self.edge_weight = []
+        self.edge_between = {}
+        self.price_edges = {}
+        self.best = None  # {edge: best loop through it, or None}, filled by the first full search
+        self._users = {}  # {edge: edges whose best loop uses it}
+        self.trade_fee = {name: config["fee"] / 100 for name, config in exchanges.items()}
+
+        for exchange in exchanges:
+            for pair in pairs:
+                base, quote = pair.split('-')
+                quote_node = self._node(exchange, quote)
+                base_node = self._node(exchange, base)
+
+                # Weights are unknown until the first price arrives
+                buy_edge = self._add_edge(quote_node, base_node, math.inf)
+                sell_edge = self._add_edge(base_node, quote_node, math.inf)
+                self.price_edges[(exchange, pair)] = (buy_edge, sell_edge)
+
+        # Moving an asset between exchanges pays the withdrawal fee of the source exchange
+        assets = {asset for _, asset in self.nodes}
+        for asset in assets:
+            for source, config in exchanges.items():
+                weight = -math.log(1 - config["withdrawal_fee"] / 100)
+                for target in exchanges:
+                    if target != source:
+                        self._add_edge(self._node(source, asset), self._node(target, asset), weight)
+
+    def _node(self, exchange, asset):
+        """Gets (or creates) the node index of an asset held on an exchange"""
+        key = (exchange, asset)
+        index = self.node_index.get(key)
+        if index is None:
+            index = len(self.nodes)
+            self.nodes.append(key)
+            self.node_index[key] = index
+            self.out_edges.append([])
+            self.in_edges.append([])
+        return index
+
+    def _add_edge(self, src, dst, weight):
+        """Adds a directed edge and returns its id"""
+        edge = len(self.edge_src)
+        self.edge_src.append(src)
+        self.edge_dst.append(dst)
+        self.edge_weight.append(weight)
+        self.edge_between[(src, dst)] = edge
+        self.out_edges[src].append(edge)
+        self.in_edges[dst].append(edge)
+        return edge
+
+    def set_price(self, exchange, pair, price):
+        """Rewrites the weights of the buy/sell edges of a pair on an exchange; returns their ids"""
+        edges = self.price_edges.get((exchange, pair))
+        if edges is None:
+            return ()
+
+        buy_edge, sell_edge = edges
+        if price > 0:
+            keep = 1 - self.trade_fee[exchange]
+            self.edge_weight[buy_edge] = -math.log(keep / price)
+            self.edge_weight[sell_edge] = -math.log(keep * price)
+        else:
+            self.edge_weight[buy_edge] = math.inf
+            self.edge_weight[sell_edge] = math.inf
+        return edges
+
+    def load_prices(self, pairs, prices, exchange_names):
+        """Sets every price of a (pairs x exchanges) matrix without rebuilding the graph (the next cycles() is a full search)"""
+        self.best = None
+        for i, pair in enumerate(pairs):
+            row = prices[i]
+            for j, exchange in enumerate(exchange_names):
+                price = float(row[j])
+                self.set_price(exchange, pair, price if price == price else 0)
+
+    def update_price(self, exchange, pair, price, min_profit=0.0):
+        """Applies one price update and returns the profitable loops running through the updated edges"""
+        edges = self.set_price(exchange, pair, price)
+        if self.best is not None:
+            self._updates += 1
+            self._research(edges)
+            found = [self.best[edge] for edge in edges]
+        else:
+            found = [self.best_cycle_through(edge) for edge in edges]
+        return [cycle for cycle in found if cycle and cycle["profit_percent"] > min_profit]
+
+    def update_prices(self, changes):
+        """Applies (exchange, pair, price) updates; the loops of the affected edges are searched again by cycles()"""
+        updated = []
+        for exchange, pair, price in changes:
+            updated.extend(self.set_price(exchange, pair, price))
+        if self.best is not None:
+            self._updates += len(updated) // 2
+            self._research(updated)
+
+    def _research(self, updated):
+        """Searches again through the updated edges and the edges whose best loop used one of them"""
+        stale = set(updated)
+        for edge in updated:
+            stale.update(self._users.get(edge, ()))
+        for edge in stale:
+            self._track(edge)
+
+    def _track(self, edge):
+        """Finds the best loop through an edge and records which edges it uses"""
+        previous = self.best.get(edge)
+        if previous:
+            for used in previous["edges"]:
+                self._users[used].discard(edge)
+        cycle = self.best_cycle_through(edge)
+        self.best[edge] = cycle
+        if cycle:
+            for used in cycle["edges"]:
+                self._users.setdefault(used, set()).add(edge)
+
+    def find_cycles(self, min_profit=0.0):
+        """Returns the best profitable loop through every priced edge, without duplicates, best first (full search)"""
+        self.best, self._users = {}, {}
+        self._updates, self._searched_at = 0, time.time()
+        for edges in self.price_edges.values():
+            for edge in edges:
+                self._track(edge)
+        return self.cycles(min_profit)
+
+    def cycles(self, min_profit=0.0):
+        """Like find_cycles, from the loops kept up to date by update_price(s) (a full search the first time and when one is due)"""
+        if (
+            self.best is None or self._updates >= self.full_search_updates
+            or time.time() - self._searched_at >= self.full_search_seconds
+        ):
+            return self.find_cycles(min_profit)
+        found = {}
+        for cycle in self.best.values():
+            if cycle and cycle["profit_percent"] > min_profit:
+                found.setdefault(_canonical(cycle["nodes"]), cycle)
+
+        return sorted(found.values(), key=lambda c: c["profit_percent"], reverse=True)
+
+    def best_cycle_through(self, edge):
+        """
+        Finds the cheapest loop of at most max_hops edges that uses the given edge.
+
+        Runs a hop-limited Bellman-Ford relaxation from the lower-degree end of
+        the edge (only nodes changed in the previous round are relaxed again,
+        SPFA-style) and closes the loop by scanning the adjacency of the other end.
+        """
+        weight = self.edge_weight[edge]
+        if weight == math.inf:
+            return None
+
+        src = self.edge_src[edge]
+        dst = self.edge_dst[edge]
+        hops = self.max_hops - 1
+
+        # Search forward from dst or backward from src, whichever fans out less
+        forward = len(self.out_edges[dst]) <= len(self.in_edges[src])
+        start, goal = (dst, src) if forward else (src, dst)
+        expand = self.out_edges if forward else self.in_edges
+        close = self.in_edges[goal] if forward else self.out_edges[goal]
+        other_end = self.edge_src if forward else self.edge_dst
+        next_node = self.edge_dst if forward else self.edge_src
+
+        # rounds[d][node] = (cost, parent node) of the cheapest d-hop path from start
+        rounds = [{start: (0.0, None)}]
+        for _ in range(hops - 1):
+            frontier = {}
+            for node, (cost, _) in rounds[-1].items():
+                for e in expand[node]:
+                    w = self.edge_weight[e]
+                    target = next_node[e]
+                    if w == math.inf or target == goal or target == start:
+                        continue
+                    new_cost = cost + w
+                    current = frontier.get(target)
+                    if current is None or new_cost < current[0]:
+                        frontier[target] = (new_cost, node)
+            if not frontier:
+                break
+            rounds.append(frontier)
+
+        # Close the loop with an edge touching the other end of the updated edge
+        best = None
+        for e in close:
+            w = self.edge_weight[e]
+            if w == math.inf:
+                continue
+            node = other_end[e]
+            for depth, frontier in enumerate(rounds):
+                entry = frontier.get(node)
+                if entry is None:
+                    continue
+                total = weight + entry[0] + w
+                if best is None or total < best[0]:
+                    best = (total, depth, node)
+
+        if best is None:
+            return None
+
+        total, depth, node = best
+        chain = [node]
+        for d in range(depth, 0, -1):
+            node = rounds[d][node][1]
+            chain.append(node)
+
+        # chain runs from the closing node back to start; orient the loop as src -> dst -> ... -> src
+        if forward:
+            nodes = [src] + chain[::-1]
+        else:
+            nodes = [src, dst] + chain[:-1]
+        if len(set(nodes)) != len(nodes):
+            # Not a simple loop: a shorter loop is reported through one of its own edges
+            return None
+
+        return self._describe(nodes, total)
+
+    def _describe(self, nodes, total):
+        """Builds the report of a loop given its nodes in order and its total weight"""
+        named = [self.nodes[n] for n in nodes]
+        exchanges = sorted({exchange for exchange, _ in named})
+        return {
+            "nodes": tuple(nodes),
+            "edges": [self.edge_between[(a, b)] for a, b in zip(nodes, nodes[1:] + nodes[:1])],
+            "path": named + [named[0]],
+            "hops": len(nodes),
+            "exchanges": exchanges,
+            "cross_exchange": len(exchanges) > 1,
+            "profit_percent": (math.exp(-total) - 1) * 100
+        }
+
+
+def _canonical(nodes):
+    """Rotates a loop so that it starts at its smallest node (same loop, same key)"""
+    i = nodes.index(min(nodes))
+    return nodes[i:] + nodes[:i]
+
+
+def format_cycle(cycle):
+    """Formats a loop as 'EXCHANGE:ASSET → ... → EXCHANGE:ASSET'"""
+    return " → ".join(f"{exchange.upper()}:{asset}" for exchange, asset in cycle["path"])
@@ -0,0 +1,377 @@
+"""
+Concurrent multi-leg trade execution.
+
+An arbitrage only captures the spread if both legs trade at (nearly) the same
+time, so the buy and sell legs are sent in parallel on worker threads, each
+bounded by its own timeout. Every exchange has an adapter, picked
+by exchange name from the configured credentials, and each adapter keeps one
+pooled keep-alive session with the credentials attached, so orders don't pay
+for a new TCP/TLS handshake.
+
+Legs are immediate-or-cancel limit orders at the quoted prices. When the legs
+fill different quantities (one side partially filled, rejected or timed out),
+the difference is unwound with a market order on the exchange that filled
+more, so no open position is left behind. A leg that timed out is cancelled
+first, which also tells how much of it filled.
+
+Exchanges without credentials or an API URL get a SimulatedAdapter that fills
+every order at its limit price without any I/O, which is how the agent runs
+by default (and what the backtester relies on). execute() needs no event
+loop, so it can be called from any thread; coroutines can await
+execute_async() instead, which is the only code that imports asyncio.
+"""
+import hashlib
+import hmac
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from price_feed import create_session
+from rate_limiter import PRIORITY_TRADE
+
+# Worker threads for blocking order requests (both legs of a few trades at once)
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="execution")
+
+_order_ids = itertools.count(1)
+
+
+def new_client_order_id(exchange):
+    """Unique client order id, so an order can be cancelled before its response arrives"""
+    return f"arb-{exchange}-{int(time.time() * 1000)}-{next(_order_ids)}"
+
+
+class ExchangeAdapter:
+    """
+    Places orders on one exchange.
+
+    place_order() returns {"order_id", "status", "filled", "average_price"}
+    ("filled" is the filled base quantity) or raises on error; price None
+    means a market order. cancel() returns the same for an order already sent.
+    """
+
+    simulated = False
+
+    def __init__(self, name, credentials=None):
+        self.name = name
+        self.credentials = credentials or {}
+
+    def place_order(self, pair, side, quantity, price, client_order_id):
+        raise NotImplementedError
+
+    def cancel(self, pair, client_order_id):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SimulatedAdapter(ExchangeAdapter):
+    """Paper trading: every order fills in full at its limit price"""
+
+    simulated = True
+
+    def place_order(self, pair, side, quantity, price, client_order_id):
+        return {"order_id": client_order_id, "status": "filled", "filled": quantity, "average_price": price}
+
+    def cancel(self, pair, client_order_id):
+        return None
+
+
+class RestExchangeAdapter(ExchangeAdapter):
+    """
+    Generic signed JSON REST adapter.
+
+    POST {url}/order with {"client_order_id", "pair", "side", "quantity",
+    "price", "type", "time_in_force"} and POST {url}/cancel with
+    {"client_order_id", "pair"}; both answer {"order_id", "status",
+    "filled_quantity", "average_price"}. Requests carry the API key and an
+    HMAC-SHA256 signature of timestamp + method + path + body. Exchanges with
+    a different API subclass this and override sign(), order_body() or
+    parse_order().
+    """
+
+    def __init__(self, name, credentials, url, timeout=5, pool_size=8, scheduler=None):
+        super().__init__(name, credentials)
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.scheduler = scheduler  # Orders share the exchange's rate limit, in the trade lane
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """Pooled keep-alive session carrying the API key, created on first use"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = create_session(self.pool_size)
+                    session.headers.update({
+                        "Content-Type": "application/json",
+                        "X-API-KEY": self.credentials.get("api_key", "")
+                    })
+                    self._session = session
+        return self._session
+
+    def sign(self, method, path, body, timestamp):
+        message = f"{timestamp}{method}{path}{body}".encode()
+        secret = self.credentials.get("api_secret", "").encode()
+        return hmac.new(secret, message, hashlib.sha256).hexdigest()
+
+    def order_body(self, pair, side, quantity, price, client_order_id):
+        return {
+            "client_order_id": client_order_id,
+            "pair": pair,
+            "side": side,
+            "quantity": quantity,
+            "price": price,
+            "type": "market" if price is None else "limit",
+            "time_in_force": "IOC"
+        }
+
+    def parse_order(self, data):
+        if "error" in data:
+            raise ValueError(data["error"])
+        return {
+            "order_id": data.get("order_id"),
+            "status": data.get("status"),
+            "filled": float(data.get("filled_quantity") or 0),
+            "average_price": float(data["average_price"]) if data.get("average_price") else None
+        }
+
+    def _post(self, path, payload):
+        if self.scheduler:
+            self.scheduler.acquire(self.name, path.strip("/"), priority=PRIORITY_TRADE, timeout=self.timeout)
+        body = json.dumps(payload)
+        timestamp = str(int(time.time() * 1000))
+        headers = {
+            "X-API-TIMESTAMP": timestamp,
+            "X-API-SIGNATURE": self.sign("POST", path, body, timestamp)
+        }
+        response = self.session.post(self.url + path, data=body, headers=headers, timeout=self.timeout)
+        return self.parse_order(response.json())
+
+    def place_order(self, pair, side, quantity, price, client_order_id):
+        return self._post("/order", self.order_body(pair, side, quantity, price, client_order_id))
+
+    def cancel(self, pair, client_order_id):
+        return self._post("/cancel", {"client_order_id": client_order_id, "pair": pair})
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+# Adapter class per exchange name; exchanges not listed use RestExchangeAdapter
+ADAPTER_TYPES = {}
+
+
+def build_adapters(credentials, urls, timeout=5, scheduler=None):
+    """
+    Creates one adapter per exchange of credentials ({exchange: {"api_key", "api_secret"}}).
+
+    Exchanges with an API key and a URL in urls trade through their REST
+    adapter (rate limited by scheduler if given), the others are simulated.
+    """
+    adapters = {}
+    for exchange, keys in credentials.items():
+        url = urls.get(exchange)
+        if keys.get("api_key") and url:
+            adapter_type = ADAPTER_TYPES.get(exchange, RestExchangeAdapter)
+            adapters[exchange] = adapter_type(exchange, keys, url, timeout, scheduler=scheduler)
+        else:
+            adapters[exchange] = SimulatedAdapter(exchange, keys)
+    return adapters
+
+
+def _leg_result(leg, order=None, error=None, latency=0.0):
+    result = dict(leg)
+    result.update({
+        "status": order["status"] if order else "failed",
+        "filled": order["filled"] if order else 0.0,
+        "average_price": order["average_price"] if order else None,
+        "order_id": order["order_id"] if order else None,
+        "latency": latency,
+        "error": error
+    })
+    return result
+
+
+def _cancelled(leg, order, error, latency):
+    """Result of a timed-out leg once cancelled (order None: nothing was left to cancel or fill)"""
+    if order is None:
+        return _leg_result(leg, error=error, latency=latency)
+    result = _leg_result(leg, order, error, latency)
+    result["status"] = "cancelled"
+    return result
+
+
+def _cancel_failed(leg, error, latency):
+    """Result of a timed-out leg whose cancel failed too: its fill is unknown"""
+    result = _leg_result(leg, error=error, latency=latency)
+    result["status"] = "unknown"
+    return result
+
+
+class TradeExecutor:
+    """
+    Sends the legs of an arbitrage in parallel and unwinds mismatched fills.
+
+    execute() takes legs as {"exchange", "pair", "side", "quantity", "price"}
+    and returns {"status", "legs", "unwinds", "matched", "elapsed"}: status is
+    "completed" (every leg filled in full), "partial" (the matched quantity
+    traded and the rest was unwound), "failed" (nothing kept) or "unresolved"
+    (a leg's fill is unknown, so nothing was unwound automatically).
+    """
+
+    def __init__(self, adapters, leg_timeout=5.0):
+        self.adapters = adapters
+        self.leg_timeout = leg_timeout
+        self.stats = {"trades": 0, "completed": 0, "partial": 0, "failed": 0, "unresolved": 0, "unwinds": 0}
+
+    def execute(self, legs):
+        """Blocking entry point (no event loop, so callable from one): live legs go to the worker threads, simulated ones fill inline"""
+        start = time.perf_counter()
+        if all(self.adapters[leg["exchange"]].simulated for leg in legs):
+            results = []
+            for leg in legs:
+                order = self.adapters[leg["exchange"]].place_order(
+                    leg["pair"], leg["side"], leg["quantity"], leg["price"], None
+                )
+                results.append(_leg_result(leg, order))
+            execution = self._settle(results, [], start)
+        else:
+            results = self._send_legs(legs)
+            unwinds = self._send_legs(self._unwind_legs(results))
+            execution = self._settle(results, unwinds, start)
+        return execution
+
+    def _place(self, leg, client_order_id):
+        """Places one leg (in a worker thread); returns its result"""
+        start = time.perf_counter()
+        try:
+            order = self.adapters[leg["exchange"]].place_order(
+                leg["pair"], leg["side"], leg["quantity"], leg["price"], client_order_id
+            )
+            return _leg_result(leg, order, latency=time.perf_counter() - start)
+        except Exception as e:
+            return _leg_result(leg, error=str(e), latency=time.perf_counter() - start)
+
+    def _send_legs(self, legs):
+        """Places legs in parallel on the worker threads; the ones that time out are cancelled to learn how much filled"""
+        start = time.perf_counter()
+        client_order_ids = [new_client_order_id(leg["exchange"]) for leg in legs]
+        placed = [_executor.submit(self._place, leg, order_id) for leg, order_id in zip(legs, client_order_ids)]
+        wait(placed, self.leg_timeout)  # Sent together, so one wait bounds every leg
+
+        results = [future.result() if future.done() else None for future in placed]
+        timed_out = [i for i, result in enumerate(results) if result is None]
+        cancels = {
+            i: _executor.submit(self.adapters[legs[i]["exchange"]].cancel, legs[i]["pair"], client_order_ids[i])
+            for i in timed_out
+        }
+        wait(cancels.values(), self.leg_timeout)
+        error = f"timed out after {self.leg_timeout}s"
+        for i, future in cancels.items():
+            latency = time.perf_counter() - start
+            if not future.done():
+                results[i] = _cancel_failed(legs[i], f"{error}; cancel failed: timed out", latency)
+            elif future.exception() is not None:
+                results[i] = _cancel_failed(legs[i], f"{error}; cancel failed: {future.exception()}", latency)
+            else:
+                results[i] = _cancelled(legs[i], future.result(), error, latency)
+        return results
+
+    async def execute_async(self, legs, start=None):
+        import asyncio
+
+        start = time.perf_counter() if start is None else start
+        results = list(await asyncio.gather(*(self._send_leg(leg) for leg in legs)))
+        unwinds = await self._unwind(results)
+        return self._settle(results, unwinds, start)
+
+    async def _call(self, function, *args):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(loop.run_in_executor(_executor, function, *args), self.leg_timeout)
+
+    async def _send_leg(self, leg):
+        """Places one leg; on timeout cancels it to learn how much filled"""
+        import asyncio
+
+        adapter = self.adapters[leg["exchange"]]
+        client_order_id = new_client_order_id(leg["exchange"])
+        start = time.perf_counter()
+        try:
+            order = await self._call(
+                adapter.place_order, leg["pair"], leg["side"], leg["quantity"], leg["price"], client_order_id
+            )
+            return _leg_result(leg, order, latency=time.perf_counter() - start)
+        except asyncio.TimeoutError:
+            error = f"timed out after {self.leg_timeout}s"
+        except Exception as e:
+            return _leg_result(leg, error=str(e), latency=time.perf_counter() - start)
+
+        try:
+            order = await self._call(adapter.cancel, leg["pair"], client_order_id)
+        except Exception as e:
+            return _cancel_failed(leg, f"{error}; cancel failed: {e}", time.perf_counter() - start)
+        return _cancelled(leg, order, error, time.perf_counter() - start)
+
+    @staticmethod
+    def _unwind_legs(results):
+        """Market orders trading back the quantity some legs filled beyond the others (none if a fill is unknown)"""
+        if not results or any(result["status"] == "unknown" for result in results):
+            return []
+        matched = min(result["filled"] for result in results)
+        unwinds = []
+        for result in results:
+            excess = result["filled"] - matched
+            if excess <= result["quantity"] * 1e-9:
+                continue
+            unwinds.append({
+                "exchange": result["exchange"],
+                "pair": result["pair"],
+                "side": "sell" if result["side"] == "buy" else "buy",
+                "quantity": excess,
+                "price": None
+            })
+        return unwinds
+
+    async def _unwind(self, results):
+        """Trades the quantity some legs filled beyond the others back with market orders"""
+        import asyncio
+
+        return list(await asyncio.gather(*(self._send_leg(unwind) for unwind in self._unwind_legs(results))))
+
+    def _settle(self, results, unwinds, start):
+        matched = min(result["filled"] for result in results)
+        if any(result["status"] == "unknown" for result in results):
+            status = "unresolved"
+        elif all(result["filled"] >= result["quantity"] * (1 - 1e-9) for result in results):
+            status = "completed"
+        elif matched > 0:
+            status = "partial"
+        else:
+            status = "failed"
+        if any(unwind["filled"] < unwind["quantity"] * (1 - 1e-9) for unwind in unwinds):
+            status = "unresolved"  # Part of the exposure is still open
+
+        self.stats["trades"] += 1
+        self.stats[status] += 1
+        self.stats["unwinds"] += len(unwinds)
+        return {
+            "status": status,
+            "legs": results,
+            "unwinds": unwinds,
+            "matched": matched,
+            "elapsed": time.perf_counter() - start
+        }
+
+    def close(self):
+        for adapter in self.adapters.values():
+            adapter.close()
@@ -0,0 +1,272 @@
+"""
+Persistent opportunity and trade history.
+
+Both are append-only tables in a SQLite file in WAL mode, so a turn can write
+while another reads, and history survives between turns. Only prune() deletes
+rows, for retention, and the agent calls it once a day's worth is due. Each row keeps the
+full record as JSON plus the columns queries filter on (epoch timestamp, pair,
+buy and sell exchange), which are indexed: the latest opportunities of a
+pair, the trades of the last 24 hours or the trade count of a day are index
+range scans instead of passes over the whole history.
+
+The routes the opportunity pipeline has open are kept in a small table too,
+so an opportunity still open in the next turn isn't reported again. Their
+changes are buffered in memory and written by flush_open_routes(), once per
+turn, instead of in every scan.
+
+Without a path the tables live in memory (backtests, benchmarks).
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS opportunities ("
+    "id INTEGER PRIMARY KEY, timestamp REAL NOT NULL, pair TEXT NOT NULL, "
+    "buy_exchange TEXT NOT NULL, sell_exchange TEXT NOT NULL, data TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS opportunities_time ON opportunities (timestamp)",
+    "CREATE INDEX IF NOT EXISTS opportunities_pair ON opportunities (pair, timestamp)",
+    "CREATE INDEX IF NOT EXISTS opportunities_buy ON opportunities (buy_exchange, timestamp)",
+    "CREATE INDEX IF NOT EXISTS opportunities_sell ON opportunities (sell_exchange, timestamp)",
+    "CREATE TABLE IF NOT EXISTS trades ("
+    "id INTEGER PRIMARY KEY, timestamp REAL NOT NULL, pair TEXT NOT NULL, "
+    "buy_exchange TEXT NOT NULL, sell_exchange TEXT NOT NULL, data TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS trades_time ON trades (timestamp)",
+    "CREATE INDEX IF NOT EXISTS trades_pair ON trades (pair, timestamp)",
+    "CREATE INDEX IF NOT EXISTS trades_buy ON trades (buy_exchange, timestamp)",
+    "CREATE INDEX IF NOT EXISTS trades_sell ON trades (sell_exchange, timestamp)",
+    "CREATE TABLE IF NOT EXISTS open_routes ("
+    "pair TEXT NOT NULL, buy_exchange TEXT NOT NULL, sell_exchange TEXT NOT NULL, "
+    "settings TEXT NOT NULL, data TEXT NOT NULL, PRIMARY KEY (pair, buy_exchange, sell_exchange))"
+]
+
+
+def to_epoch(timestamp):
+    """Epoch seconds of an ISO timestamp (or of an epoch, returned as is)"""
+    if isinstance(timestamp, str):
+        return datetime.fromisoformat(timestamp).timestamp()
+    return float(timestamp)
+
+
+def day_bounds(timestamp=None):
+    """(start, end) epoch seconds of the local calendar day of timestamp (default now)"""
+    moment = datetime.fromtimestamp(time.time() if timestamp is None else to_epoch(timestamp))
+    start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return start.timestamp(), (start + timedelta(days=1)).timestamp()
+
+
+class HistoryStore:
+    """Append-only, indexed opportunity and trade records"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+        self._day_counts = {}  # Trades per calendar day start, counted once and then kept up to date
+        self._open_changes = None  # Open route changes not written yet: (settings, reset, {key: route or None})
+        if path:
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._db = self._connect(path)
+            except sqlite3.Error as e:
+                print(f"History file unavailable, keeping history in memory only: {str(e)}")
+        if self._db is None:
+            self._db = self._connect(":memory:")
+
+    @staticmethod
+    def _connect(path):
+        db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            db.execute(statement)
+        return db
+
+    def _insert(self, table, records):
+        """Appends records in one transaction; returns the id of the last one"""
+        rows = [
+            (
+                to_epoch(record["timestamp"]), record["pair"], record["buy_exchange"], record["sell_exchange"],
+                json.dumps(record, default=float)
+            )
+            for record in records
+        ]
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                cursor = self._db.executemany(
+                    f"INSERT INTO {table} (timestamp, pair, buy_exchange, sell_exchange, data) VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._db.execute("COMMIT")
+                if table == "trades":
+                    for timestamp, *_ in rows:
+                        day = day_bounds(timestamp)[0]
+                        if day in self._day_counts:
+                            self._day_counts[day] += 1
+                return cursor.lastrowid
+            except sqlite3.Error as e:
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+                print(f"Couldn't save {table}: {str(e)}")
+                return None
+
+    @staticmethod
+    def _where(pair, exchange, since, until, after_id):
+        clauses, parameters = [], []
+        if pair:
+            clauses.append("pair = ?")
+            parameters.append(pair)
+        if exchange:
+            clauses.append("(buy_exchange = ? OR sell_exchange = ?)")
+            parameters += [exchange, exchange]
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            parameters.append(to_epoch(since))
+        if until is not None:
+            clauses.append("timestamp < ?")
+            parameters.append(to_epoch(until))
+        if after_id is not None:
+            clauses.append("id > ?")
+            parameters.append(after_id)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), parameters
+
+    def _select(self, table, pair=None, exchange=None, since=None, until=None, limit=None, after_id=None):
+        """Matching records, oldest first (the latest limit ones if limit is given)"""
+        where, parameters = self._where(pair, exchange, since, until, after_id)
+        # Records newer than an id are read in id order, which the primary key gives without a sort
+        order = "id DESC" if after_id is not None else "timestamp DESC, id DESC"
+        query = f"SELECT id, data FROM {table}{where} ORDER BY {order}"
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters.append(limit)
+        with self._lock:
+            rows = self._db.execute(query, parameters).fetchall()
+        records = []
+        for row_id, data in reversed(rows):
+            record = json.loads(data)
+            record["id"] = row_id
+            records.append(record)
+        return records
+
+    def _count(self, table, pair=None, exchange=None, since=None, until=None):
+        where, parameters = self._where(pair, exchange, since, until, None)
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM {table}{where}", parameters).fetchone()[0]
+
+    def add_opportunities(self, opportunities):
+        if opportunities:
+            return self._insert("opportunities", opportunities)
+
+    def add_trade(self, trade):
+        """Appends a trade; returns its id"""
+        return self._insert("trades", [trade])
+
+    def opportunities(self, pair=None, exchange=None, since=None, until=None, limit=None):
+        """Opportunities of a pair and/or exchange (either side) in [since, until), oldest first"""
+        return self._select("opportunities", pair, exchange, since, until, limit)
+
+    def count_opportunities(self, pair=None, exchange=None, since=None, until=None):
+        return self._count("opportunities", pair, exchange, since, until)
+
+    def trades(self, pair=None, exchange=None, since=None, until=None, limit=None, after_id=None):
+        """Trades of a pair and/or exchange in [since, until) (or with an id above after_id), oldest first"""
+        return self._select("trades", pair, exchange, since, until, limit, after_id)
+
+    def count_trades(self, pair=None, exchange=None, since=None, until=None):
+        return self._count("trades", pair, exchange, since, until)
+
+    def trades_on_day(self, timestamp=None):
+        """Number of trades on the calendar day of timestamp (default today)"""
+        start, end = day_bounds(timestamp)
+        with self._lock:
+            # Counted under the lock, so a trade recorded meanwhile by a monitor thread isn't missed
+            if start not in self._day_counts:
+                self._day_counts[start] = self._db.execute(
+                    "SELECT COUNT(*) FROM trades WHERE timestamp >= ? AND timestamp < ?", (start, end)
+                ).fetchone()[0]
+            return self._day_counts[start]
+
+    def open_routes(self):
+        """(settings, {(pair, buy exchange, sell exchange): opportunity}) saved by save_open_routes"""
+        self.flush_open_routes()
+        with self._lock:
+            rows = self._db.execute("SELECT pair, buy_exchange, sell_exchange, settings, data FROM open_routes").fetchall()
+        if not rows:
+            return None, {}
+        return json.loads(rows[0][3]), {(pair, buy, sell): json.loads(data) for pair, buy, sell, _, data in rows}
+
+    def save_open_routes(self, settings, opened, closed, reset=False):
+        """Buffers the opened routes and the closed ones (all of them first with reset) until flush_open_routes()"""
+        with self._lock:
+            _, pending_reset, routes = self._open_changes or (None, False, {})
+            if reset:
+                pending_reset, routes = True, {}
+            for route in closed:
+                routes[(route["pair"], route["buy_exchange"], route["sell_exchange"])] = None
+            for route in opened:
+                routes[(route["pair"], route["buy_exchange"], route["sell_exchange"])] = route
+            self._open_changes = (settings, pending_reset, routes)
+
+    def flush_open_routes(self):
+        """Writes the buffered open route changes in one transaction"""
+        with self._lock:
+            if self._open_changes is None:
+                return
+            settings, reset, routes = self._open_changes
+            self._open_changes = None
+            encoded = json.dumps(settings, sort_keys=True)
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                if reset:
+                    self._db.execute("DELETE FROM open_routes")
+                self._db.executemany(
+                    "DELETE FROM open_routes WHERE pair = ? AND buy_exchange = ? AND sell_exchange = ?",
+                    [key for key, route in routes.items() if route is None]
+                )
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO open_routes (pair, buy_exchange, sell_exchange, settings, data) VALUES (?, ?, ?, ?, ?)",
+                    [(*key, encoded, json.dumps(route, default=float)) for key, route in routes.items() if route is not None]
+                )
+                # Routes kept open under new settings are saved under them too
+                self._db.execute("UPDATE open_routes SET settings = ?", (encoded,))
+                self._db.execute("COMMIT")
+            except sqlite3.Error as e:
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+                print(f"Couldn't save open routes: {str(e)}")
+
+    def last_trade_id(self):
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(MAX(id), 0) FROM trades").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM opportunities")
+            self._db.execute("DELETE FROM trades")
+            self._db.execute("DELETE FROM open_routes")
+            self._open_changes = None
+            self._day_counts.clear()
+
+    def oldest(self):
+        """Epoch timestamp of the oldest opportunity or trade (None when both are empty)"""
+        with self._lock:
+            oldest = [
+                self._db.execute(f"SELECT MIN(timestamp) FROM {table}").fetchone()[0] for table in ("opportunities", "trades")
+            ]
+        oldest = [timestamp for timestamp in oldest if timestamp is not None]
+        return min(oldest) if oldest else None
+
+    def prune(self, before):
+        """Deletes records older than before (epoch or ISO timestamp); returns the count deleted"""
+        cutoff = to_epoch(before)
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM opportunities WHERE timestamp < ?", (cutoff,)).rowcount
+            deleted += self._db.execute("DELETE FROM trades WHERE timestamp < ?", (cutoff,)).rowcount
+            self._day_counts.clear()
+        return deleted
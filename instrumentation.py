@@ -0,0 +1,236 @@
+"""
+Hot-path instrumentation: counters and latency histograms per stage.
+
+Stages (price fetches, cache lookups, spread scoring, trade execution,
+rendering, LLM completions...) record their latency into HDR-style
+histograms: log-linear buckets with 16 linear sub-buckets per power of two
+of microseconds, so every percentile is within about 3% of the true value
+while a histogram stays a small sparse {bucket: count} dict. Recording is a
+bucket computation and a dict update under a lock, about a microsecond.
+
+Each turn runs in a fresh process, so recordings are kept in memory and
+flush() adds them to a SQLite file (with upserts, so concurrent turns don't
+lose each other's counts). Queries return the persisted totals plus what
+hasn't been flushed yet.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+# Linear sub-buckets per power of two (relative error of a percentile <= 1 / (2 * SUB_BUCKETS))
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS stages ("
+    "stage TEXT PRIMARY KEY, count INTEGER NOT NULL, total REAL NOT NULL, min REAL NOT NULL, max REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS buckets ("
+    "stage TEXT NOT NULL, bucket INTEGER NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (stage, bucket))"
+]
+
+
+def bucket_index(micros):
+    """Bucket of a latency in whole microseconds: exact below 32 µs, then 16 buckets per power of two"""
+    if micros < 2 * SUB_BUCKETS:
+        return micros
+    shift = micros.bit_length() - SUB_BUCKET_BITS - 1
+    return SUB_BUCKETS * shift + (micros >> shift)
+
+
+def bucket_value(index):
+    """Midpoint of a bucket, in microseconds"""
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    return ((index - SUB_BUCKETS * shift) << shift) + (1 << shift) / 2
+
+
+class Histogram:
+    """Latency histogram of one stage (seconds in, seconds out)"""
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, seconds):
+        index = bucket_index(int(seconds * 1e6))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """Latency below which a fraction q of the recordings fall, in seconds"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                # The bucket midpoint, but never outside what was actually recorded
+                return min(max(bucket_value(index) / 1e6, self.min), self.max)
+        return self.max
+
+
+class _Timer:
+    __slots__ = ("recorder", "stage", "start")
+
+    def __init__(self, recorder, stage):
+        self.recorder = recorder
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.record(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class PerfRecorder:
+    """
+    Counters and stage histograms, persisted to a SQLite file at path.
+
+    count(name) increments a counter, record(stage, seconds) adds a latency,
+    timer(stage) times a with block and timed(stage) every call of a
+    function. With enabled False nothing is recorded, without a path nothing
+    is persisted.
+    """
+
+    def __init__(self, path=None, enabled=True):
+        self.path = path
+        self.enabled = enabled
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+                for statement in _SCHEMA:
+                    self._db.execute(statement)
+            except sqlite3.Error as e:
+                print(f"Performance file unavailable, keeping measurements in memory only: {str(e)}")
+                self._db = None
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def record(self, stage, seconds):
+        if self.enabled:
+            with self._lock:
+                histogram = self.histograms.get(stage)
+                if histogram is None:
+                    histogram = self.histograms[stage] = Histogram()
+                histogram.record(seconds)
+
+    def timer(self, stage):
+        """Context manager recording the duration of its block as stage"""
+        return _Timer(self, stage)
+
+    def timed(self, stage):
+        """Decorator recording the duration of every call of a function as stage"""
+        def decorate(function):
+            @wraps(function)
+            def timed_function(*args, **kwargs):
+                with _Timer(self, stage):
+                    return function(*args, **kwargs)
+            return timed_function
+        return decorate
+
+    def flush(self):
+        """Adds the measurements since the last flush to the file"""
+        with self._lock:
+            counters, histograms = self.counters, self.histograms
+            if self._db is None or not (counters or histograms):
+                return
+            self.counters, self.histograms = {}, {}
+        try:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.executemany(
+                "INSERT INTO counters VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                counters.items()
+            )
+            self._db.executemany(
+                "INSERT INTO stages VALUES (?, ?, ?, ?, ?) ON CONFLICT (stage) DO UPDATE SET "
+                "count = count + excluded.count, total = total + excluded.total, "
+                "min = MIN(min, excluded.min), max = MAX(max, excluded.max)",
+                [(stage, h.count, h.total, h.min, h.max) for stage, h in histograms.items()]
+            )
+            self._db.executemany(
+                "INSERT INTO buckets VALUES (?, ?, ?) ON CONFLICT (stage, bucket) DO UPDATE SET count = count + excluded.count",
+                [(stage, index, count) for stage, h in histograms.items() for index, count in h.counts.items()]
+            )
+            self._db.execute("COMMIT")
+        except sqlite3.Error as e:
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+            print(f"Couldn't save performance measurements: {str(e)}")
+
+    def snapshot(self):
+        """(counters, {stage: Histogram}) of every turn so far: the file plus what isn't flushed yet"""
+        counters = {}
+        histograms = {}
+        if self._db is not None:
+            try:
+                counters.update(self._db.execute("SELECT name, value FROM counters"))
+                for stage, count, total, low, high in self._db.execute("SELECT stage, count, total, min, max FROM stages"):
+                    histogram = histograms[stage] = Histogram()
+                    histogram.count, histogram.total, histogram.min, histogram.max = count, total, low, high
+                for stage, index, count in self._db.execute("SELECT stage, bucket, count FROM buckets"):
+                    if stage in histograms:
+                        histograms[stage].counts[index] = count
+            except sqlite3.Error as e:
+                print(f"Couldn't read performance measurements: {str(e)}")
+        with self._lock:
+            for name, value in self.counters.items():
+                counters[name] = counters.get(name, 0) + value
+            for stage, pending in self.histograms.items():
+                histograms.setdefault(stage, Histogram()).merge(pending)
+        return counters, histograms
+
+    def reset(self):
+        """Forgets every measurement, persisted or not"""
+        with self._lock:
+            self.counters, self.histograms = {}, {}
+            if self._db is not None:
+                try:
+                    self._db.execute("BEGIN IMMEDIATE")
+                    for table in ("counters", "stages", "buckets"):
+                        self._db.execute(f"DELETE FROM {table}")
+                    self._db.execute("COMMIT")
+                except sqlite3.Error as e:
+                    if self._db.in_transaction:
+                        self._db.execute("ROLLBACK")
+                    print(f"Couldn't reset performance measurements: {str(e)}")
@@ -0,0 +1,330 @@
+"""
+Fast intent routing of free-form messages to agent commands.
+
+Messages that aren't an exact command ("scan please", "Dashboard btc",
+"show trades on binance last 24h") used to go to the LLM. The router
+resolves the common phrasings locally instead: the message is tokenized,
+keyword phrases are matched against a token trie built once (the longest
+phrase wins, so "trade history" beats "trades" and "dashboard all" beats
+"dashboard"), and the arguments are picked from the remaining tokens: pairs
+(by symbol, full pair, concatenated pair or coin name, with fuzzy matching
+for typos), exchanges, time windows, durations and on/off values.
+
+Messages with open-ended words ("why", "how", "should", "explain"...) or no
+recognizable intent return None and still go to the LLM. So do questions (a
+message ending in "?" or starting with "what", "is", "which"...) unless the
+whole message is a keyword phrase plus arguments ("dashboard btc?",
+"what can you do"): "what is arbitrage?" is left to the LLM. So are negated
+ones ("don't scan", "no scan"): only on/off settings take an "off" word as
+their value, and "not"/"don't" leaves even those to the LLM. Stop words
+("cancel monitor btc") turn a monitor intent into stopping the monitor.
+"""
+import difflib
+import re
+import time
+from collections import deque
+
+# Latency samples kept for the percentiles
+LATENCY_SAMPLES = 1000
+
+# Keyword phrases of every intent
+INTENT_PHRASES = {
+    "scan": [
+        "scan", "opportunities", "opportunity", "arbitrage", "arb", "arbs", "spreads", "spread",
+        "find arbitrage", "any opportunities", "any arbitrage opportunities", "best trades"
+    ],
+    "dashboard_all": [
+        "dashboard_all", "dashboard all", "all dashboard", "all pairs", "overview", "full dashboard",
+        "complete dashboard", "all prices"
+    ],
+    "dashboard": ["dashboard", "price", "prices", "quote", "quotes", "details", "chart"],
+    "history": ["history", "past opportunities", "opportunity history", "previous opportunities"],
+    "trades": ["trades", "trade history", "my trades", "executed trades", "fills", "executions"],
+    "status": ["status", "state", "settings", "configuration", "agent status", "what's the status"],
+    "cycles": ["cycles", "cycle", "triangular", "loops", "loop", "multi hop", "multihop", "multi-hop"],
+    "orderbooks": ["orderbooks", "orderbook", "order books", "order book", "depth"],
+    "monitor": ["monitor", "watch", "track", "monitoring"],
+    "monitor status": ["monitor status", "monitors", "monitoring status", "active monitors"],
+    "monitor stop": [
+        "stop monitor", "stop monitoring", "stop monitors", "stop watching", "stop tracking",
+        "cancel monitor", "cancel monitoring", "cancel monitors", "end monitor", "end monitoring",
+        "end monitors", "kill monitor", "kill monitors"
+    ],
+    "help": ["help", "commands", "what can you do"],
+    "config min_profit": ["min profit", "minimum profit", "min_profit", "profit threshold"],
+    "config trade_amount": ["trade amount", "trade_amount", "amount per trade", "trade size"],
+    "config max_daily_trades": ["max daily trades", "maximum daily trades", "max_daily_trades", "daily trades", "daily trade limit"],
+    "config auto_trading": ["auto trading", "auto_trading", "autotrading", "auto trade", "auto-trading"],
+    "config alerts": ["alerts", "alert", "notifications"],
+    "config output": ["output", "output format", "json output"]
+}
+
+# Words that make a message a question for the LLM rather than a command
+OPEN_ENDED_WORDS = {
+    "why", "how", "should", "explain", "recommend", "advice", "advise", "difference", "meaning",
+    "think", "predict", "risk", "risks"
+}
+
+# First words that make a message a question; a question (these or a trailing "?") is
+# only routed when all its other words are arguments, keywords of the same intent or QUESTION_FILLER_WORDS
+QUESTION_WORDS = {"what", "is", "which", "when", "can", "does"}
+QUESTION_FILLER_WORDS = {"please", "the", "a", "any", "for", "on", "in", "of", "to", "last", "my", "me", "and", "right", "now"}
+
+# Messages longer than this are treated as open-ended
+MAX_COMMAND_TOKENS = 12
+
+# Common coin names, for "bitcoin dashboard" and the like
+COIN_NAMES = {
+    "bitcoin": "BTC", "ethereum": "ETH", "ether": "ETH", "ripple": "XRP", "solana": "SOL",
+    "cardano": "ADA", "polkadot": "DOT", "near": "NEAR", "tether": "USDT"
+}
+
+DURATION_UNITS = {
+    "s": 1, "sec": 1, "secs": 1, "second": 1, "seconds": 1,
+    "m": 60, "min": 60, "mins": 60, "minute": 60, "minutes": 60,
+    "h": 3600, "hr": 3600, "hrs": 3600, "hour": 3600, "hours": 3600,
+    "d": 86400, "day": 86400, "days": 86400
+}
+
+ON_WORDS = {"on", "enable", "enabled", "start", "true", "yes", "activate"}
+OFF_WORDS = {"off", "disable", "disabled", "false", "no", "deactivate"}
+
+# "don't", "doesn't" and "didn't" are tokenized as "don", "doesn" and "didn" (plus "t")
+NEGATION_WORDS = {"not", "don", "dont", "doesn", "didn", "never", "without", "cannot"}
+
+# Words that make a monitor intent a request to stop monitoring
+STOP_WORDS = {"stop", "cancel", "end", "kill", "halt"}
+
+# Intents whose value can be "off"
+ON_OFF_INTENTS = {"config auto_trading", "config alerts"}
+
+_TOKEN = re.compile(r"[a-z0-9_./-]+")
+_NUMBER = re.compile(r"^\d+(\.\d+)?$")
+_DURATION = re.compile(r"^(\d+(?:\.\d+)?)([a-z]+)$")
+_END = "$"
+
+
+def tokenize(message):
+    """Lowercase words, numbers and pair spellings of a message ('BTC/USDT?' -> 'btc/usdt')"""
+    tokens = (token.strip("./-") for token in _TOKEN.findall(message.lower()))
+    return [token for token in tokens if token]
+
+
+def changes_state(command):
+    """Whether a command changes settings or starts/stops monitors (a routed one is echoed back in the reply)"""
+    words = command.split()
+    return words[0] == "config" or (words[0] == "monitor" and words[1:2] != ["status"])
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+class IntentRouter:
+    """
+    Maps free-form messages to commands for a set of trading pairs and exchanges.
+
+    route(message) returns a command string for handle_command, or None if
+    the message should go to the LLM. Counters and routing latencies are kept
+    in stats and latencies.
+    """
+
+    def __init__(self, pairs, exchanges, monitor_duration=60):
+        self.pairs = list(pairs)
+        self.exchanges = [exchange.lower() for exchange in exchanges]
+        self.monitor_duration = monitor_duration
+        self.trie = {}
+        for intent, phrases in INTENT_PHRASES.items():
+            for phrase in phrases:
+                self._add(tokenize(phrase), intent)
+        self.vocabulary = {token for phrases in INTENT_PHRASES.values() for phrase in phrases for token in tokenize(phrase)}
+        self.intent_vocabulary = {
+            intent: {token for phrase in phrases for token in tokenize(phrase)} for intent, phrases in INTENT_PHRASES.items()
+        }
+        self.pair_aliases = self._build_pair_aliases()
+        # Fuzzy matching only compares words with the same first letter (typos rarely change it)
+        self.keywords_by_letter = {}
+        for keyword in sorted(self.vocabulary):
+            self.keywords_by_letter.setdefault(keyword[0], []).append(keyword)
+        self.aliases_by_letter = {}
+        for alias in self.pair_aliases:
+            if alias.isalpha():
+                self.aliases_by_letter.setdefault(alias[0], []).append(alias)
+        self.stats = {"routed": 0, "unmatched": 0, "open_ended": 0, "negated": 0, "fuzzy": 0}
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def _add(self, tokens, intent):
+        node = self.trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node[_END] = intent
+
+    def _build_pair_aliases(self):
+        """Every spelling of a pair: 'btc', 'btc-usdt', 'btc/usdt', 'btcusdt', 'bitcoin'"""
+        aliases = {}
+        for pair in self.pairs:
+            base, quote = pair.split("-")
+            spellings = [base, pair, f"{base}/{quote}", f"{base}{quote}", f"{base}_{quote}"]
+            spellings += [name for name, symbol in COIN_NAMES.items() if symbol == base]
+            for spelling in spellings:
+                # A base symbol quoted in several pairs stays with the first one (e.g. the USDT pair)
+                aliases.setdefault(spelling.lower(), pair)
+        return aliases
+
+    def _match_intents(self, tokens):
+        """Longest keyword phrase found anywhere in tokens: (intent, start, end) or None"""
+        best = None
+        for start in range(len(tokens)):
+            node = self.trie
+            for end in range(start, len(tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                if _END in node and (best is None or end + 1 - start > best[2] - best[1]):
+                    best = (node[_END], start, end + 1)
+        return best
+
+    def _fuzzy_tokens(self, tokens):
+        """Tokens with typos of keywords corrected ('scna' -> 'scan'); only words of 4+ letters"""
+        corrected = []
+        for token in tokens:
+            if len(token) >= 4 and token not in self.pair_aliases and not token[0].isdigit():
+                match = difflib.get_close_matches(token, self.keywords_by_letter.get(token[0], ()), n=1, cutoff=0.75)
+                if match:
+                    token = match[0]
+            corrected.append(token)
+        return corrected
+
+    def _pairs(self, tokens):
+        pairs = []
+        for token in tokens:
+            pair = self.pair_aliases.get(token)
+            if pair is None and len(token) >= 5 and token.isalpha() and token not in self.vocabulary:
+                # Misspelled coin names ('etherium') and pairs ('btcusd')
+                match = difflib.get_close_matches(token, self.aliases_by_letter.get(token[0], ()), n=1, cutoff=0.8)
+                pair = self.pair_aliases[match[0]] if match else None
+            if pair and pair not in pairs:
+                pairs.append(pair)
+        return pairs
+
+    @staticmethod
+    def _duration(tokens):
+        """First duration in tokens, in seconds: '24h', '24 hours', '2 min' (None if there's none)"""
+        for i, token in enumerate(tokens):
+            match = _DURATION.match(token)
+            if match and match.group(2) in DURATION_UNITS:
+                return float(match.group(1)) * DURATION_UNITS[match.group(2)]
+            if _NUMBER.match(token) and i + 1 < len(tokens) and tokens[i + 1] in DURATION_UNITS:
+                return float(token) * DURATION_UNITS[tokens[i + 1]]
+        return None
+
+    @staticmethod
+    def _number(tokens):
+        for token in tokens:
+            if _NUMBER.match(token):
+                return token
+        return None
+
+    def _command(self, intent, tokens):
+        """Builds the command of an intent from the arguments found in tokens (None if they don't fit)"""
+        pairs = self._pairs(tokens)
+        exchanges = [token for token in tokens if token in self.exchanges]
+
+        if intent in ("dashboard", "dashboard_all"):
+            # 'btc price' is a pair dashboard, 'prices' alone the complete one
+            return f"dashboard {pairs[0]}" if intent == "dashboard" and pairs else "dashboard_all"
+
+        if intent in ("history", "trades"):
+            arguments = [intent] + pairs[:1] + exchanges[:1]
+            window = self._duration(tokens)
+            if window:
+                arguments.append(f"{int(window)}s")
+            return " ".join(arguments)
+
+        if intent == "monitor" and STOP_WORDS.intersection(tokens):
+            intent = "monitor stop"
+
+        if intent == "monitor":
+            if not pairs:
+                return "monitor status"
+            duration = self._duration(tokens)
+            if duration is None:
+                number = self._number(tokens)
+                duration = float(number) if number else self.monitor_duration
+            return f"monitor {' '.join(pairs)} {int(duration)}"
+
+        if intent == "monitor stop":
+            return " ".join(["monitor stop"] + pairs)
+
+        if intent.startswith("config "):
+            param = intent.split()[1]
+            if param in ("auto_trading", "alerts"):
+                if ON_WORDS.intersection(tokens):
+                    return f"config {param} on"
+                if OFF_WORDS.intersection(tokens):
+                    return f"config {param} off"
+                return None
+            if param == "output":
+                value = "json" if "json" in tokens else "text" if "text" in tokens else None
+                return f"config output {value}" if value else None
+            value = self._number(tokens)
+            return f"config {param} {value}" if value else None
+
+        return intent
+
+    def _only_arguments(self, tokens, match):
+        """Whether every token outside the matched phrase is an argument (pair, exchange, number, duration...), a filler or another keyword of the intent"""
+        intent, start, end = match
+        for token in tokens[:start] + tokens[end:]:
+            if (
+                token in self.intent_vocabulary[intent] or token in QUESTION_FILLER_WORDS or token in self.exchanges or token in DURATION_UNITS
+                or token in ON_WORDS or token in OFF_WORDS or token in STOP_WORDS or token in ("json", "text")
+                or _NUMBER.match(token) or _DURATION.match(token) or self._pairs([token])
+            ):
+                continue
+            return False
+        return True
+
+    @staticmethod
+    def _negated(intent, tokens):
+        """Whether a message negates its intent ('don't scan', 'no scan'), which only on/off settings may do with an off word"""
+        if NEGATION_WORDS.intersection(tokens):
+            return True
+        return intent not in ON_OFF_INTENTS and bool(OFF_WORDS.intersection(tokens))
+
+    def route(self, message):
+        """Returns the command a message asks for, or None to hand it to the LLM"""
+        start = time.perf_counter()
+        command = None
+        tokens = tokenize(message)
+        if not tokens or len(tokens) > MAX_COMMAND_TOKENS:
+            self.stats["unmatched"] += 1
+        elif OPEN_ENDED_WORDS.intersection(tokens):
+            self.stats["open_ended"] += 1
+        else:
+            matched_tokens = tokens
+            match = self._match_intents(tokens)
+            if match is None:
+                corrected = self._fuzzy_tokens(tokens)
+                match = self._match_intents(corrected)
+                if match is not None:
+                    matched_tokens = corrected
+                    self.stats["fuzzy"] += 1
+            question = message.rstrip().endswith("?") or tokens[0] in QUESTION_WORDS
+            if match is not None and question and not self._only_arguments(matched_tokens, match):
+                self.stats["open_ended"] += 1
+            elif match is not None and self._negated(match[0], tokens):
+                self.stats["negated"] += 1
+            else:
+                if match is not None:
+                    command = self._command(match[0], tokens)
+                self.stats["routed" if command else "unmatched"] += 1
+
+        self.latencies.append(time.perf_counter() - start)
+        return command
+
+    def latency_percentiles(self):
+        """(p50, p99) routing latency in seconds"""
+        samples = list(self.latencies)
+        return _percentile(samples, 0.5), _percentile(samples, 0.99)
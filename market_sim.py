@@ -0,0 +1,129 @@
+"""
+Deterministic, vectorized market simulator.
+
+Each exchange quotes the reference price of a symbol shifted by a variation
+drawn from its EXCHANGES[...]["price_variance"] range. Variations are a pure
+function of (seed, symbol, exchange, tick), computed with a vectorized
+splitmix64 hash, so every process and every agent turn sees the same prices
+for the same tick, and a tick lasts 1 / tick_rate seconds.
+
+For offline load tests, walk() also moves the reference prices themselves
+(seeded geometric random walk) and lets each exchange lag behind them: by
+default one tick of lag per 0.1% of its price_variance range, or the
+exchange's "lag_ticks" entry when it has one. Whole blocks of ticks are
+generated as arrays, millions of quotes per second.
+"""
+import zlib
+
+import numpy as np
+
+# splitmix64 constants
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+
+def _mix64(x):
+    """splitmix64 finalizer over a uint64 array"""
+    x = (x ^ (x >> np.uint64(30))) * _MIX1
+    x = (x ^ (x >> np.uint64(27))) * _MIX2
+    return x ^ (x >> np.uint64(31))
+
+
+def symbol_key(symbol):
+    """Stable 32-bit key of a symbol (unlike hash(), it doesn't change between processes)"""
+    return zlib.crc32(symbol.encode())
+
+
+class MarketSimulator:
+    """Seeded exchange price simulator driven by EXCHANGES"""
+
+    def __init__(self, exchanges, seed=0, tick_rate=1.0, volatility=0.0005, lag_ticks_per_percent=10):
+        self.exchange_names = list(exchanges)
+        self.seed = seed
+        self.tick_rate = tick_rate
+        self.volatility = volatility  # Standard deviation of the reference log return per tick
+        self.low = np.array([exchanges[name]["price_variance"][0] for name in self.exchange_names], dtype=np.float64)
+        self.high = np.array([exchanges[name]["price_variance"][1] for name in self.exchange_names], dtype=np.float64)
+        self.lags = np.array([
+            exchanges[name].get("lag_ticks", round((high - low) * lag_ticks_per_percent))
+            for name, low, high in zip(self.exchange_names, self.low, self.high)
+        ], dtype=np.intp)
+        self._exchange_keys = np.arange(1, len(self.exchange_names) + 1, dtype=np.uint64) * _GOLDEN
+        self._symbol_keys = {}
+
+        # Random walk state (set by reset())
+        self.symbols = []
+        self.tick = 0
+        self._rng = None
+        self._log_prices = None
+        self._recent = None
+
+    def tick_at(self, timestamp):
+        """Index of the tick a wall-clock timestamp falls in"""
+        return int(timestamp * self.tick_rate)
+
+    def _keys(self, symbols):
+        keys = []
+        for symbol in symbols:
+            key = self._symbol_keys.get(symbol)
+            if key is None:
+                key = self._symbol_keys[symbol] = symbol_key(symbol)
+            keys.append(key)
+        return np.array(keys, dtype=np.uint64)
+
+    def _uniform(self, symbol_keys, ticks):
+        """Uniform [0, 1) draws of shape (ticks, symbols, exchanges) hashed from (seed, symbol, exchange, tick)"""
+        seed = np.uint64(self.seed & 0xFFFFFFFFFFFFFFFF)
+        with np.errstate(over="ignore"):
+            x = (
+                _mix64(np.asarray(ticks, dtype=np.uint64) ^ seed)[:, None, None]
+                + _mix64(symbol_keys)[None, :, None]
+                + self._exchange_keys[None, None, :]
+            )
+            x = _mix64(x)
+        return (x >> np.uint64(11)) * (1.0 / 9007199254740992.0)
+
+    def variations(self, symbols, tick):
+        """Price variation (%) of each symbol on each exchange at a tick, as a (symbols x exchanges) matrix"""
+        u = self._uniform(self._keys(symbols), [tick])[0]
+        return self.low + (self.high - self.low) * u
+
+    def reset(self, base_prices, tick=0):
+        """Starts a random walk of the reference prices ({symbol: price}) at a tick"""
+        self.symbols = list(base_prices)
+        self.tick = tick
+        self._rng = np.random.Generator(np.random.Philox(key=self.seed))
+        self._log_prices = np.log(np.array([base_prices[s] for s in self.symbols], dtype=np.float64))
+        # Reference prices of the last max(lag) ticks, oldest first
+        history = int(self.lags.max()) if len(self.lags) else 0
+        self._recent = np.repeat(self._log_prices[None, :], history, axis=0)
+
+    def walk(self, ticks):
+        """
+        Advances the random walk by ticks.
+
+        Returns (tick_indexes, reference, quotes): reference is (ticks x symbols)
+        and quotes is (ticks x symbols x exchanges), each exchange quoting the
+        reference price from its lag ticks ago shifted by its variation.
+        """
+        if self._rng is None:
+            raise RuntimeError("call reset() before walk()")
+        returns = self._rng.normal(0.0, self.volatility, (ticks, len(self.symbols)))
+        log_prices = self._log_prices + np.cumsum(returns, axis=0)
+
+        # Reference prices seen by each exchange, lag ticks behind
+        extended = np.concatenate((self._recent, log_prices))
+        history = len(self._recent)
+        rows = np.arange(ticks)[:, None] + history - self.lags[None, :]  # (ticks x exchanges)
+        lagged = extended[rows].transpose(0, 2, 1)  # (ticks x symbols x exchanges)
+
+        tick_indexes = np.arange(self.tick, self.tick + ticks)
+        variation = self.low + (self.high - self.low) * self._uniform(self._keys(self.symbols), tick_indexes)
+        quotes = np.exp(lagged) * (1 + variation / 100)
+
+        self._log_prices = log_prices[-1]
+        if history:
+            self._recent = extended[-history:]
+        self.tick += ticks
+        return tick_indexes, np.exp(log_prices), quotes
@@ -0,0 +1,100 @@
+"""
+Background price monitoring.
+
+A monitor samples one pair on a timer in its own thread. Samples are written
+to the shared (pair, exchange) time-series store and min/max/average/standard
+deviation are tracked by streaming accumulators, so progress reports never
+rescan samples.
+"""
+import threading
+import time
+
+from rolling_stats import RunningStats
+
+
+class PriceMonitor:
+    """
+    Samples the exchange prices of a pair every interval seconds for duration seconds.
+
+    sample(pair) must return {exchange: price}; samples are appended to store
+    under (pair, exchange). on_progress(monitor) is called every
+    progress_interval seconds and on_finish(monitor) once at the end (or after
+    stop()).
+    """
+
+    def __init__(self, pair, duration, interval, sample, store, on_progress=None, on_finish=None, progress_interval=None):
+        self.pair = pair
+        self.store = store
+        self.duration = duration
+        self.interval = interval
+        self.sample = sample
+        self.on_progress = on_progress
+        self.on_finish = on_finish
+        self.progress_interval = progress_interval
+        self.stats = {}
+        self.sample_count = 0
+        self.started_at = None
+        self.ends_at = None
+        self.finished = False
+        self.stopped = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.time()
+        self.ends_at = self.started_at + self.duration
+        self._thread = threading.Thread(target=self._run, name=f"monitor-{self.pair}")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.stopped = True
+        self._stop.set()
+
+    def join(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    @property
+    def elapsed(self):
+        return min(time.time(), self.ends_at) - self.started_at if self.started_at else 0
+
+    def _record(self):
+        try:
+            prices = self.sample(self.pair)
+        except Exception as e:
+            print(f"Error sampling {self.pair}: {str(e)}")
+            return
+
+        timestamp = time.time()
+        for exchange, price in prices.items():
+            if exchange not in self.stats:
+                self.stats[exchange] = RunningStats()
+            self.store.append((self.pair, exchange), price, timestamp)
+            self.stats[exchange].add(price)
+        self.sample_count += 1
+
+    def _run(self):
+        next_check = self.started_at
+        next_progress = self.started_at + self.progress_interval if self.progress_interval else None
+
+        # Sleep until the next deadline instead of polling
+        while not self._stop.is_set() and time.time() < self.ends_at:
+            now = time.time()
+            if now >= next_check:
+                self._record()
+                next_check += self.interval
+
+            if next_progress is not None and now >= next_progress and time.time() < self.ends_at:
+                if self.on_progress:
+                    self.on_progress(self)
+                next_progress += self.progress_interval
+
+            deadlines = [next_check, self.ends_at]
+            if next_progress is not None:
+                deadlines.append(next_progress)
+            self._stop.wait(max(0, min(deadlines) - time.time()))
+
+        self.finished = True
+        if self.on_finish:
+            self.on_finish(self)
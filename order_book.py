@@ -0,0 +1,241 @@
+"""
+L2 order books and depth-aware route sizing.
+
+Each side of a book is stored as sorted NumPy arrays (prices, sizes) plus
+their cumulative size and notional, so the VWAP of any quantity is one binary
+search. A route's marginal profit (best remaining bid after fees minus best
+remaining ask after fees) only falls as the size grows, so the
+profit-maximizing size is where it crosses zero; it's found by walking only
+the levels that can still be profitable.
+
+Books are loaded from recorded snapshots, one JSON object per line:
+{"exchange": "binance", "pair": "BTC-USDT", "timestamp": 1700000000.0,
+ "bids": [[price, size], ...], "asks": [[price, size], ...]}
+"""
+import json
+import threading
+from bisect import bisect_left
+
+import numpy as np
+
+
+class BookSide:
+    """
+    One side of a book: levels sorted best first with cumulative size and notional.
+
+    The columns are kept both as arrays (for vectorized walks) and as lists,
+    since bisect on a list is much cheaper than a NumPy call for one lookup.
+    """
+
+    def __init__(self, levels, descending):
+        levels = np.asarray(levels, dtype=np.float64).reshape(-1, 2)
+        levels = levels[(levels[:, 0] > 0) & (levels[:, 1] > 0)]
+        order = np.argsort(-levels[:, 0] if descending else levels[:, 0], kind="stable")
+        self.prices = np.ascontiguousarray(levels[order, 0])
+        self.sizes = np.ascontiguousarray(levels[order, 1])
+        self.cum_sizes = np.cumsum(self.sizes)
+        self.cum_notional = np.cumsum(self.prices * self.sizes)
+        self.best = float(self.prices[0]) if len(self.prices) else None
+        self.depth = float(self.cum_sizes[-1]) if len(self.prices) else 0.0  # Total size available
+
+        self.price_list = self.prices.tolist()
+        self.size_list = self.sizes.tolist()
+        self.cum_size_list = self.cum_sizes.tolist()
+        self.cum_notional_list = self.cum_notional.tolist()
+        # Ascending sort keys for bisect (bid prices are negated)
+        self.descending = descending
+        self.keys = (-self.prices).tolist() if descending else self.price_list
+
+    def __len__(self):
+        return len(self.prices)
+
+    def levels_better_than(self, price):
+        """Number of levels priced strictly better than price"""
+        return bisect_left(self.keys, -price if self.descending else price)
+
+    def level_of(self, quantity):
+        """Index of the level where a fill of quantity ends"""
+        return min(bisect_left(self.cum_size_list, quantity), len(self.price_list) - 1)
+
+    def notional(self, quantity):
+        """Quote amount needed to fill quantity by walking the levels (quantity must not exceed depth)"""
+        if quantity <= 0:
+            return 0.0
+        level = self.level_of(quantity)
+        before_size = self.cum_size_list[level - 1] if level else 0.0
+        before_notional = self.cum_notional_list[level - 1] if level else 0.0
+        return before_notional + (quantity - before_size) * self.price_list[level]
+
+    def vwap(self, quantity):
+        """Average fill price of quantity, or None if the side can't fill it"""
+        if quantity <= 0 or quantity > self.depth * (1 + 1e-12):
+            return None
+        return self.notional(quantity) / quantity
+
+    def quantity_for(self, notional):
+        """Quantity whose fill costs notional in the quote currency (capped at the side's depth)"""
+        if not len(self.prices) or notional <= 0:
+            return 0.0
+        level = bisect_left(self.cum_notional_list, notional)
+        if level >= len(self.price_list):
+            return self.depth
+        before_size = self.cum_size_list[level - 1] if level else 0.0
+        before_notional = self.cum_notional_list[level - 1] if level else 0.0
+        return before_size + (notional - before_notional) / self.price_list[level]
+
+
+class OrderBook:
+    """L2 book of one pair on one exchange"""
+
+    def __init__(self, bids, asks, timestamp=None):
+        self.bids = BookSide(bids, descending=True)
+        self.asks = BookSide(asks, descending=False)
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(snapshot.get("bids", []), snapshot.get("asks", []), snapshot.get("timestamp"))
+
+    @property
+    def mid(self):
+        if self.bids.best is None or self.asks.best is None:
+            return self.bids.best or self.asks.best
+        return (self.bids.best + self.asks.best) / 2
+
+
+# Crossings of up to this many levels (both sides) are walked in plain Python,
+# which beats the array setup cost when only a few levels are involved
+SMALL_CROSSING_LEVELS = 64
+
+
+def _walk_levels(asks, bids, ask_levels, bid_levels, buy_cost_factor, sell_value_factor):
+    """Profit-maximizing size found by consuming both sides level by level"""
+    ask_prices, ask_sizes = asks.price_list, asks.size_list
+    bid_prices, bid_sizes = bids.price_list, bids.size_list
+    i = j = 0
+    ask_left, bid_left = ask_sizes[0], bid_sizes[0]
+    quantity = 0.0
+    while bid_prices[j] * sell_value_factor > ask_prices[i] * buy_cost_factor:
+        step = min(ask_left, bid_left)
+        quantity += step
+        ask_left -= step
+        bid_left -= step
+        if ask_left <= 0:
+            i += 1
+            if i == ask_levels:
+                break
+            ask_left = ask_sizes[i]
+        if bid_left <= 0:
+            j += 1
+            if j == bid_levels:
+                break
+            bid_left = bid_sizes[j]
+    return quantity
+
+
+def _merge_levels(asks, bids, ask_levels, bid_levels, buy_cost_factor, sell_value_factor):
+    """Profit-maximizing size found from the merged level boundaries of both sides at once"""
+    # Segments between consecutive level boundaries of either side have constant marginal profit
+    # (boundaries both sides share give empty segments, which don't change the result)
+    limit = min(asks.cum_sizes[ask_levels - 1], bids.cum_sizes[bid_levels - 1])
+    ends = np.sort(np.concatenate((asks.cum_sizes[:ask_levels], bids.cum_sizes[:bid_levels], [limit])))
+    ends = ends[:int(np.searchsorted(ends, limit, side="left")) + 1]
+    starts = np.concatenate(([0.0], ends[:-1]))
+    ask_index = np.searchsorted(asks.cum_sizes, starts, side="right")
+    bid_index = np.searchsorted(bids.cum_sizes, starts, side="right")
+    marginal = bids.prices[bid_index] * sell_value_factor - asks.prices[ask_index] * buy_cost_factor
+
+    # Marginal profit never increases with size: keep the profitable prefix
+    profitable = int(np.argmin(marginal > 0)) if not marginal[-1] > 0 else len(marginal)
+    return float(ends[profitable - 1])
+
+
+def best_fill(asks, bids, buy_cost_factor, sell_value_factor, max_cost=None):
+    """
+    Finds the size that maximizes profit buying on asks and selling on bids.
+
+    buy_cost_factor and sell_value_factor apply the fee model of the route
+    table (cost per unit bought = price * buy_cost_factor, value per unit sold
+    = price * sell_value_factor). max_cost caps the quote amount spent buying,
+    fees included. Returns None when not even the first unit is profitable,
+    otherwise {"quantity", "buy_vwap", "sell_vwap", "cost", "proceeds",
+    "profit", "profit_percent", "buy_levels", "sell_levels"}.
+    """
+    if asks.best is None or bids.best is None:
+        return None
+    if bids.best * sell_value_factor <= asks.best * buy_cost_factor:
+        return None
+
+    # Only levels better than the other side's best price can ever be profitable
+    ask_levels = asks.levels_better_than(bids.best * sell_value_factor / buy_cost_factor)
+    bid_levels = bids.levels_better_than(asks.best * buy_cost_factor / sell_value_factor)
+
+    if ask_levels + bid_levels <= SMALL_CROSSING_LEVELS:
+        quantity = _walk_levels(asks, bids, ask_levels, bid_levels, buy_cost_factor, sell_value_factor)
+    else:
+        quantity = _merge_levels(asks, bids, ask_levels, bid_levels, buy_cost_factor, sell_value_factor)
+
+    if max_cost is not None:
+        quantity = min(quantity, asks.quantity_for(max_cost / buy_cost_factor))
+    if quantity <= 0:
+        return None
+
+    buy_notional = asks.notional(quantity)
+    sell_notional = bids.notional(quantity)
+    cost = buy_notional * buy_cost_factor
+    proceeds = sell_notional * sell_value_factor
+    return {
+        "quantity": quantity,
+        "buy_vwap": buy_notional / quantity,
+        "sell_vwap": sell_notional / quantity,
+        "cost": cost,
+        "proceeds": proceeds,
+        "profit": proceeds - cost,
+        "profit_percent": (proceeds - cost) / cost * 100,
+        "buy_levels": asks.level_of(quantity) + 1,
+        "sell_levels": bids.level_of(quantity) + 1
+    }
+
+
+class OrderBookStore:
+    """Latest order book per (exchange, pair)"""
+
+    def __init__(self):
+        self.books = {}
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.books)
+
+    def get(self, exchange, pair):
+        return self.books.get((exchange, pair))
+
+    def set(self, exchange, pair, book):
+        with self._lock:
+            self.books[(exchange, pair)] = book
+            self.version += 1
+
+    def load(self, path):
+        """Loads recorded snapshots (JSON lines); later snapshots of a book replace earlier ones. Returns the count"""
+        books = {}
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                snapshot = json.loads(line)
+                books[(snapshot["exchange"], snapshot["pair"].upper())] = OrderBook.from_snapshot(snapshot)
+        with self._lock:
+            self.books.update(books)
+            self.version += 1
+        return len(books)
+
+    def mid_prices(self, exchange, quote="USDT"):
+        """Returns {base: mid price} of the books of an exchange quoted in quote"""
+        suffix = f"-{quote}"
+        return {
+            pair[:-len(suffix)]: book.mid
+            for (name, pair), book in self.books.items()
+            if name == exchange and pair.endswith(suffix) and book.mid
+        }
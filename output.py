@@ -0,0 +1,88 @@
+"""
+Structured command output.
+
+With `--json` after a command (or `config output json` for every command),
+the agent replies with compact JSON built from the underlying data instead
+of the formatted text, so downstream systems don't have to parse emoji
+tables. Lists of records (routes, opportunities, trades, exchange prices)
+are laid out by column, {"pair": [...], "buy_price": [...], ...}: the
+columns of the route table are taken from its NumPy arrays as they are,
+and in-process consumers can hand the same columns to Arrow without
+copying the numeric ones (to_arrow).
+"""
+import json
+import math
+
+import numpy as np
+
+JSON_FLAG = "--json"
+
+
+def split_output_flag(cmd):
+    """Removes a trailing --json from a command; returns (command, whether it was there)"""
+    parts = cmd.split()
+    if parts and parts[-1].lower() == JSON_FLAG:
+        return " ".join(parts[:-1]), True
+    return cmd, False
+
+
+def columns_from_records(records, fields=None):
+    """
+    Lays out a list of dicts by column (fields default to every key, in
+    first-seen order); NaN and infinite values become None
+    """
+    if fields is None:
+        fields = list(dict.fromkeys(key for record in records for key in record))
+    columns = {}
+    for field in fields:
+        column = [record.get(field) for record in records]
+        if any(isinstance(value, float) and not math.isfinite(value) for value in column):
+            column = [_clean(value) for value in column]
+        columns[field] = column
+    return columns
+
+
+def _clean(value):
+    """JSON has no NaN or infinity: they become null"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {key: _clean(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_clean(item) for item in value]
+    return value
+
+
+def _default(value):
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind == "f" and not np.isfinite(value).all():
+            return _clean(value.tolist())
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return _clean(value.item())
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def to_json(data):
+    """Compact JSON of command data (NumPy columns and scalars included, NaN as null)"""
+    try:
+        return json.dumps(data, separators=(",", ":"), default=_default, allow_nan=False)
+    except ValueError:
+        # A NaN/infinite float outside the NumPy columns: clean the whole structure
+        return json.dumps(_clean(data), separators=(",", ":"), default=_default)
+
+
+def to_arrow(columns):
+    """
+    Converts a dict of columns (NumPy arrays or lists) to a pyarrow.RecordBatch.
+
+    Numeric NumPy columns are wrapped without a copy. pyarrow is optional and
+    only imported here.
+    """
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("pyarrow is required for Arrow output (pip install pyarrow)")
+    return pyarrow.RecordBatch.from_pydict({name: pyarrow.array(column) for name, column in columns.items()})
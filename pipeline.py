@@ -0,0 +1,173 @@
+"""
+Event-driven opportunity pipeline.
+
+Price ticks are pushed through a chain of generator stages. Each stage is a
+primed generator that receives items with send() and forwards what it
+produces to the next stage, so a tick flows end to end without any polling:
+
+    price tick -> spreads -> threshold -> hysteresis -> sinks
+
+spreads scores the tick into a route table (ticks already scored are
+dropped), threshold keeps the routes still above the exit threshold, and
+hysteresis turns them into "open" and "close" events: a route opens when its
+profit reaches the entry threshold and stays open, without further events,
+until it drops out of the candidates. Sinks (history, auto-trader, alerts)
+therefore see each persisting opportunity once instead of on every tick.
+
+Each tick also carries the detection settings (thresholds). A tick already
+scored is passed on again when they changed, and the open routes are checked
+against the new entry threshold: the ones below it close, the others stay
+open without new events (so sinks never see an open route twice), and new
+routes above it open. The open routes can be loaded from and saved to a
+store, so they carry over between processes.
+"""
+import threading
+from functools import wraps
+
+
+def stage(function):
+    """Makes a generator function return a primed generator, ready for send()"""
+    @wraps(function)
+    def start(*args, **kwargs):
+        generator = function(*args, **kwargs)
+        next(generator)
+        return generator
+    return start
+
+
+@stage
+def spread_stage(score, stats, target):
+    """Scores each tick ({"version", "timestamp", "settings" (optional), ...}) with score(tick) and sends on (table, timestamp, settings)"""
+    version = settings = object()
+    table = None
+    while True:
+        tick = yield
+        if tick["version"] == version:
+            if tick.get("settings") == settings:
+                stats["duplicates"] += 1
+                continue
+            # Same prices, new settings: the scored table is still valid
+            settings = tick.get("settings")
+            target.send((table, tick["timestamp"], settings))
+            continue
+        version, settings = tick["version"], tick.get("settings")
+        stats["ticks"] += 1
+        table = score(tick)
+        target.send((table, tick["timestamp"], settings))
+
+
+@stage
+def threshold_stage(select, threshold, stats, target):
+    """Sends on (select(table, timestamp, threshold()), timestamp, settings): the routes above the exit threshold"""
+    while True:
+        table, timestamp, settings = yield
+        candidates = select(table, timestamp, threshold())
+        stats["candidates"] += len(candidates)
+        target.send((candidates, timestamp, settings))
+
+
+@stage
+def hysteresis_stage(entry, stats, target, load=None, save=None):
+    """
+    Turns candidate routes into ("open" | "close", opportunity) events.
+
+    A route opens when its net_gain_percent reaches entry() and closes once
+    it's no longer a candidate. Repeats of an open route are suppressed.
+    With new settings, open routes below entry() close too. load() returns
+    the (settings, {route key: opportunity}) saved by a previous process, and
+    save(settings, opened, closed, reset) is called with every change.
+    """
+    settings, active = load() if load else (None, {})
+    while True:
+        candidates, timestamp, tick_settings = yield
+        retuned = tick_settings != settings
+        settings = tick_settings
+        events = []
+        seen = set()
+        entry_threshold = entry()
+        for opportunity in candidates:
+            key = (opportunity["pair"], opportunity["buy_exchange"], opportunity["sell_exchange"])
+            if key in active and retuned and opportunity["net_gain_percent"] < entry_threshold:
+                continue  # Open under the old settings only: closed below
+            if key in active:
+                active[key] = opportunity
+                seen.add(key)
+                stats["suppressed"] += 1
+            elif opportunity["net_gain_percent"] >= entry_threshold:
+                active[key] = opportunity
+                seen.add(key)
+                events.append(("open", opportunity))
+        for key in [key for key in active if key not in seen]:
+            events.append(("close", active.pop(key)))
+
+        stats["opened"] += sum(1 for kind, _ in events if kind == "open")
+        stats["closed"] += sum(1 for kind, _ in events if kind == "close")
+        if save and (events or retuned):
+            save(settings, [opportunity for kind, opportunity in events if kind == "open"],
+                 [opportunity for kind, opportunity in events if kind == "close"], False)
+        if events:
+            target.send((events, timestamp))
+
+
+@stage
+def sink_stage(sinks):
+    """Hands every batch of events to each sink(events, timestamp)"""
+    while True:
+        events, timestamp = yield
+        for sink in sinks:
+            try:
+                sink(events, timestamp)
+            except Exception as e:
+                # One failing sink mustn't stop the others (or the pipeline)
+                print(f"Error in pipeline sink {getattr(sink, '__name__', sink)}: {str(e)}")
+
+
+class OpportunityPipeline:
+    """
+    The stage chain plus its counters.
+
+    score(tick) returns the route table of a tick; select(table, timestamp,
+    min_profit) returns its opportunities above min_profit; entry() and
+    exit() return the entry and exit thresholds (net profit %). load and
+    save, if given, keep the open routes in a store (see hysteresis_stage).
+    push() is safe to call from several threads (monitors and the main turn).
+    """
+
+    def __init__(self, score, select, entry, exit, sinks, load=None, save=None):
+        self.score = score
+        self.select = select
+        self.entry = entry
+        self.exit = exit
+        self.sinks = list(sinks)
+        self.load = load
+        self.save = save
+        self._lock = threading.Lock()
+        self.stats = {"ticks": 0, "duplicates": 0, "candidates": 0, "opened": 0, "closed": 0, "suppressed": 0}
+        self._head = None  # Built on the first tick, so the open routes are loaded when the store is ready
+
+    def _build(self):
+        self._head = spread_stage(self.score, self.stats, threshold_stage(
+            self.select, self.exit, self.stats, hysteresis_stage(
+                self.entry, self.stats, sink_stage(self.sinks), self.load, self.save
+            )
+        ))
+
+    def reset(self):
+        """Rebuilds the stages, forgetting the open opportunities (saved ones too) and counters"""
+        with self._lock:
+            self.stats = {"ticks": 0, "duplicates": 0, "candidates": 0, "opened": 0, "closed": 0, "suppressed": 0}
+            if self.save:
+                self.save(None, [], [], True)
+            self._head = None
+
+    def push(self, tick):
+        """Processes one tick ({"version", "timestamp", ...} plus whatever score() needs) end to end"""
+        with self._lock:
+            if self._head is None:
+                self._build()
+            try:
+                self._head.send(tick)
+            except Exception:
+                # An exception ends the generators: start over with fresh stages
+                self._build()
+                raise
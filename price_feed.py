@@ -0,0 +1,318 @@
+"""
+Concurrent price ingestion.
+
+Quote sources (CoinMarketCap plus optional per-exchange tickers) are fetched
+concurrently on a thread pool: every source's blocking requests call runs in
+its own worker thread with its own timeout, and its prices are handed to a
+callback as soon as they arrive, so one slow source no longer stalls the
+others. All sources share one pooled keep-alive HTTP session.
+
+fetch_prices() is the blocking entry point and needs no event loop, so it can
+be called from any thread, including one running an event loop (which it
+blocks like any other blocking call).
+
+CoinMarketCap symbols are split into chunks that respect the per-request
+symbol and URL length limits, and concurrent refreshes of the same symbols
+share one request (single-flight). When a RequestScheduler is set on a
+source, each request first waits for its rate limit tokens (a CoinMarketCap
+chunk takes one token per call credit).
+
+requests is only imported once a price is actually fetched: a turn answered
+from the price cache never pays for importing it.
+"""
+import heapq
+import math
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from rate_limiter import PRIORITY_MARKET_DATA
+
+# Long-lived worker threads for blocking HTTP calls. A source that overruns its
+# timeout keeps its thread until the HTTP timeout fires, without holding up the caller.
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="price-feed")
+
+# Separate pool for CoinMarketCap chunk requests, which are started from _executor threads
+_chunk_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="price-feed-chunk")
+
+# CoinMarketCap charges one call credit per 100 symbols (rounded up) per request
+CMC_SYMBOLS_PER_CREDIT = 100
+
+
+def cmc_credits(symbol_count):
+    """Call credits charged by CoinMarketCap for one quotes request"""
+    return math.ceil(symbol_count / CMC_SYMBOLS_PER_CREDIT)
+
+
+def chunk_symbols(symbols, max_symbols, max_length, length=len):
+    """
+    Splits symbols into the fewest chunks that respect both the symbol count and
+    the comma-joined query length limits. Longest symbols are placed first into
+    the shortest chunk, so parallel requests end up about the same size.
+    """
+    symbols = sorted(symbols, key=length, reverse=True)
+    if not symbols:
+        return []
+    if length(symbols[0]) > max_length:
+        raise ValueError(f"Symbol {symbols[0]} is longer than the query length limit")
+
+    total_length = sum(length(symbol) + 1 for symbol in symbols)
+    count = max(math.ceil(len(symbols) / max_symbols), math.ceil(total_length / max_length))
+
+    while True:
+        chunks = [[] for _ in range(count)]
+        heap = [(0, i) for i in range(count)]
+        fits = True
+        for symbol in symbols:
+            if not heap:
+                fits = False
+                break
+            size, i = heapq.heappop(heap)
+            chunks[i].append(symbol)
+            size += length(symbol) + 1
+            if size - 1 > max_length:
+                fits = False
+                break
+            if len(chunks[i]) < max_symbols:
+                heapq.heappush(heap, (size, i))
+        if fits:
+            return chunks
+        count += 1
+
+
+def create_session(pool_size=16):
+    """Creates a pooled keep-alive HTTP session shared by all sources"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class PriceSource:
+    """
+    A quote source; fetch() returns {symbol: price} or raises on error.
+
+    priority is the scheduler lane its requests wait in when the source has a scheduler.
+    """
+
+    name = "source"
+    timeout = 10
+    scheduler = None
+
+    def fetch(self, session, symbols, priority=PRIORITY_MARKET_DATA):
+        raise NotImplementedError
+
+
+class CoinMarketCapSource(PriceSource):
+    """
+    USD reference prices from the CoinMarketCap quotes endpoint.
+
+    Symbols are fetched in parallel chunks of at most max_symbols symbols and
+    max_query_length characters. A caller asking for symbols that are already
+    being fetched waits for that request instead of sending its own; stats
+    counts requests and the call credits this saves.
+    """
+
+    name = "coinmarketcap"
+
+    def __init__(self, api_key, url, symbol_mapping=None, timeout=10, max_symbols=100, max_query_length=2000):
+        self.api_key = api_key
+        self.url = url
+        self.symbol_mapping = symbol_mapping or {}
+        self.timeout = timeout
+        self.max_symbols = max_symbols
+        self.max_query_length = max_query_length
+        self.stats = {
+            "requests": 0,
+            "symbols_requested": 0,
+            "symbols_shared": 0,
+            "credits_used": 0,
+            "credits_saved": 0
+        }
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def _chunks(self, symbols):
+        def mapped_length(symbol):
+            return len(self.symbol_mapping.get(symbol, symbol))
+        return chunk_symbols(symbols, self.max_symbols, self.max_query_length, mapped_length)
+
+    def fetch(self, session, symbols, priority=PRIORITY_MARKET_DATA):
+        symbols = set(symbols)
+
+        # Claim the symbols nobody is fetching yet; share the requests in flight for the rest
+        with self._lock:
+            waiting = {}
+            missing = []
+            for symbol in symbols:
+                future = self._in_flight.get(symbol)
+                if future is None:
+                    missing.append(symbol)
+                else:
+                    waiting[id(future)] = future
+
+            own = []
+            for chunk in self._chunks(missing):
+                future = Future()
+                for symbol in chunk:
+                    self._in_flight[symbol] = future
+                own.append((chunk, future))
+
+            credits_used = sum(cmc_credits(len(chunk)) for chunk, _ in own)
+            credits_alone = sum(cmc_credits(len(chunk)) for chunk in self._chunks(symbols))
+            self.stats["requests"] += len(own)
+            self.stats["symbols_requested"] += len(symbols)
+            self.stats["symbols_shared"] += len(symbols) - len(missing)
+            self.stats["credits_used"] += credits_used
+            self.stats["credits_saved"] += credits_alone - credits_used
+
+        # Chunks run in parallel; the last one runs in this thread
+        for chunk, future in own[:-1]:
+            _chunk_executor.submit(self._fetch_chunk, session, chunk, future, priority)
+        if own:
+            self._fetch_chunk(session, *own[-1], priority)
+
+        prices = {}
+        errors = []
+        for future in [future for _, future in own] + list(waiting.values()):
+            try:
+                result = future.result()
+            except Exception as e:
+                errors.append(e)
+                continue
+            for symbol, price in result.items():
+                if symbol in symbols:
+                    prices[symbol] = price
+
+        if errors and not prices:
+            raise errors[0]
+        return prices
+
+    def _fetch_chunk(self, session, chunk, future, priority=PRIORITY_MARKET_DATA):
+        """Fetches one chunk and publishes the result to every caller waiting on it"""
+        try:
+            if self.scheduler:
+                self.scheduler.acquire(self.name, "quotes", cmc_credits(len(chunk)), priority, self.timeout)
+            future.set_result(self._request(session, chunk))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                for symbol in chunk:
+                    if self._in_flight.get(symbol) is future:
+                        del self._in_flight[symbol]
+
+    def _request(self, session, symbols):
+        """Sends one quotes request and returns {symbol: price}"""
+        mapped = {symbol: self.symbol_mapping.get(symbol, symbol) for symbol in symbols}
+        parameters = {
+            "symbol": ",".join(mapped.values()),
+            "convert": "USD"  # Use USD as base currency
+        }
+        headers = {
+            "Accepts": "application/json",
+            "X-CMC_PRO_API_KEY": self.api_key
+        }
+
+        response = session.get(self.url, headers=headers, params=parameters, timeout=self.timeout)
+        data = response.json()
+
+        if "data" not in data:
+            raise ValueError(data.get("status", {}).get("error_message", "Unknown error"))
+
+        prices = {}
+        for symbol, mapped_symbol in mapped.items():
+            if mapped_symbol in data["data"]:
+                prices[symbol] = float(data["data"][mapped_symbol]["quote"]["USD"]["price"])
+        return prices
+
+
+class ExchangeTickerSource(PriceSource):
+    """
+    Last-trade prices from an exchange ticker endpoint.
+
+    Understands the common public ticker shapes: a list of
+    {"symbol": "BTCUSDT", "price": "..."} objects or a {"BTC-USDT": price}
+    mapping. Symbols are matched to TRADING_PAIRS ignoring separators.
+    Returns {base_symbol: price}.
+    """
+
+    def __init__(self, exchange, url, pairs, timeout=5):
+        self.name = exchange
+        self.exchange = exchange
+        self.url = url
+        self.timeout = timeout
+        self.pair_bases = {}
+        for pair in pairs:
+            base, quote = pair.split('-')
+            self.pair_bases[base + quote] = base
+
+    def fetch(self, session, symbols, priority=PRIORITY_MARKET_DATA):
+        if self.scheduler:
+            self.scheduler.acquire(self.name, "ticker", priority=priority, timeout=self.timeout)
+        response = session.get(self.url, timeout=self.timeout)
+        return self.parse(response.json(), symbols)
+
+    def parse(self, data, symbols):
+        """Extracts {base_symbol: price} for the requested symbols from a ticker response"""
+        if isinstance(data, dict):
+            items = data.items()
+        else:
+            items = ((item.get("symbol", ""), item.get("price")) for item in data)
+
+        prices = {}
+        for ticker, price in items:
+            key = ticker.replace("-", "").replace("/", "").replace("_", "").upper()
+            base = self.pair_bases.get(key)
+            if base in symbols and price is not None:
+                prices[base] = float(price)
+        return prices
+
+
+def fetch_prices(sources, session, symbols, on_prices, priority=PRIORITY_MARKET_DATA):
+    """
+    Fetches all sources concurrently on the worker threads and calls on_prices(source, prices) as each one completes.
+
+    Blocks until every source has answered or timed out; returns {source
+    name: {"ok", "latency", "count", "error"}}.
+    """
+    start = time.perf_counter()
+    pending = {
+        _executor.submit(source.fetch, session, symbols, priority): source
+        for source in sources
+    }
+    report = {}
+    while pending:
+        deadline = min(start + source.timeout for source in pending.values())
+        done, _ = wait(pending, max(0, deadline - time.perf_counter()), FIRST_COMPLETED)
+        now = time.perf_counter()
+        for future in done:
+            source = pending.pop(future)
+            try:
+                prices, error = future.result(), None
+            except Exception as e:
+                prices, error = None, str(e)
+            if error is None:
+                on_prices(source, prices)
+            report[source.name] = {
+                "ok": error is None,
+                "latency": now - start,
+                "count": len(prices) if prices else 0,
+                "error": error
+            }
+
+        # A source past its timeout keeps its thread until the HTTP timeout fires, but isn't waited for
+        for future, source in list(pending.items()):
+            if now - start >= source.timeout:
+                del pending[future]
+                report[source.name] = {
+                    "ok": False,
+                    "latency": now - start,
+                    "count": 0,
+                    "error": f"timed out after {source.timeout}s"
+                }
+    return report
@@ -0,0 +1,214 @@
+"""
+Per-symbol price cache with stale-while-revalidate.
+
+Every symbol has its own timestamp and TTL. Expired prices keep being served
+while one background refresh fetches new ones, so a user command never waits
+for the API once the cache is warm. A partial API response only updates the
+symbols it contains. A process that exits after a turn should wait() for its
+refreshes first (before interpreter shutdown, when executors stop taking work),
+or they die with it and the next turn starts just as stale.
+
+With a path, entries are also kept in a small SQLite file: the store starts
+warm from it and every update is written in a single transaction, so a crash
+never leaves a half-written cache behind.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+
+class PriceStore:
+    """Thread-safe {symbol: price} cache with per-symbol timestamps, TTLs and sources"""
+
+    def __init__(self, default_ttl, ttls=None, path=None):
+        self.default_ttl = default_ttl
+        self.ttls = dict(ttls or {})
+        self.entries = {}
+        self.version = 0
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._threads = set()
+        self._misses = {}
+        self._db = None
+        if path:
+            self._open(path)
+
+    def _open(self, path):
+        """Opens (or creates) the cache file and loads its entries"""
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS prices ("
+                "symbol TEXT PRIMARY KEY, price REAL NOT NULL, timestamp REAL NOT NULL, source TEXT NOT NULL)"
+            )
+            for symbol, price, timestamp, source in self._db.execute("SELECT symbol, price, timestamp, source FROM prices"):
+                self.entries[symbol] = {"price": price, "timestamp": timestamp, "source": source}
+        except sqlite3.Error as e:
+            print(f"Price cache file unavailable, using memory only: {str(e)}")
+            self._db = None
+
+    def _persist(self, symbols):
+        """Writes the given entries to the cache file in one transaction (call with the lock held)"""
+        if self._db is None:
+            return
+        rows = [
+            (symbol, self.entries[symbol]["price"], self.entries[symbol]["timestamp"], self.entries[symbol]["source"])
+            for symbol in symbols
+        ]
+        try:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.executemany("INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?)", rows)
+            self._db.execute("COMMIT")
+        except sqlite3.Error as e:
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+            print(f"Couldn't save price cache: {str(e)}")
+
+    def ttl(self, symbol):
+        return self.ttls.get(symbol, self.default_ttl)
+
+    def __contains__(self, symbol):
+        return symbol in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, symbol):
+        entry = self.entries.get(symbol)
+        return entry["price"] if entry else None
+
+    def prices(self):
+        """Returns a {symbol: price} snapshot of every cached symbol"""
+        # A background refresh may add symbols meanwhile: iterate over a copy
+        return {symbol: entry["price"] for symbol, entry in list(self.entries.items())}
+
+    def fresh(self, symbol, now=None):
+        """Returns the price of a symbol if its TTL hasn't run out, else None"""
+        entry = self.entries.get(symbol)
+        if entry is None or (now or time.time()) - entry["timestamp"] >= self.ttl(symbol):
+            return None
+        return entry["price"]
+
+    def fresh_prices(self, now=None):
+        """Returns a {symbol: price} snapshot of the symbols whose TTL hasn't run out"""
+        now = now or time.time()
+        return {
+            symbol: entry["price"] for symbol, entry in list(self.entries.items())
+            if now - entry["timestamp"] < self.ttl(symbol)
+        }
+
+    def update(self, prices, source="api", timestamp=None):
+        """Merges new prices; symbols missing from prices keep their previous entry"""
+        if not prices:
+            return
+        timestamp = timestamp or time.time()
+        with self._lock:
+            for symbol, price in prices.items():
+                self.entries[symbol] = {"price": price, "timestamp": timestamp, "source": source}
+            self._persist(prices)
+            self.version += 1
+
+    def invalidate(self):
+        """Marks every entry as expired (they are still served until refreshed)"""
+        with self._lock:
+            for entry in self.entries.values():
+                entry["timestamp"] = 0
+            self._persist(self.entries)
+            self.version += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries = {}
+            if self._db is not None:
+                try:
+                    self._db.execute("DELETE FROM prices")
+                except sqlite3.Error as e:
+                    print(f"Couldn't clear price cache: {str(e)}")
+            self.version += 1
+
+    def mark_missing(self, symbols, timestamp=None):
+        """Records symbols the API didn't return, so they aren't requested again before their TTL"""
+        timestamp = timestamp or time.time()
+        with self._lock:
+            for symbol in symbols:
+                self._misses[symbol] = timestamp
+
+    def missing(self, symbols, now=None):
+        """Returns the symbols without a cached price that weren't recently reported as unavailable"""
+        now = now or time.time()
+        return [
+            symbol for symbol in symbols
+            if symbol not in self.entries and now - self._misses.get(symbol, 0) >= self.ttl(symbol)
+        ]
+
+    def expired(self, symbols, now=None, max_age=None):
+        """Returns the cached symbols whose TTL has run out (or, with max_age, that are older than max_age seconds)"""
+        now = now or time.time()
+        return [
+            symbol for symbol in symbols
+            if symbol in self.entries
+            and now - self.entries[symbol]["timestamp"] >= (self.ttl(symbol) if max_age is None else max_age)
+        ]
+
+    def staleness(self, symbol, now=None):
+        """Returns {"age", "ttl", "stale", "refreshing", "source", "timestamp"} for a symbol, or None"""
+        entry = self.entries.get(symbol)
+        if entry is None:
+            return None
+        now = now or time.time()
+        age = now - entry["timestamp"]
+        ttl = self.ttl(symbol)
+        return {
+            "age": age,
+            "ttl": ttl,
+            "stale": age >= ttl,
+            "refreshing": symbol in self._refreshing,
+            "source": entry["source"],
+            "timestamp": entry["timestamp"]
+        }
+
+    @property
+    def last_updated(self):
+        """Timestamp of the most recent update of any symbol (0 if empty)"""
+        return max((entry["timestamp"] for entry in list(self.entries.values())), default=0)
+
+    def refresh_in_background(self, refresh, symbols):
+        """
+        Runs refresh(symbols) in a background thread for the symbols not already being refreshed.
+
+        Returns the thread, or None if every symbol already has a refresh running.
+        """
+        with self._lock:
+            symbols = [symbol for symbol in symbols if symbol not in self._refreshing]
+            if not symbols:
+                return None
+            self._refreshing.update(symbols)
+
+        def run():
+            try:
+                refresh(symbols)
+            finally:
+                with self._lock:
+                    self._refreshing.difference_update(symbols)
+                    self._threads.discard(thread)
+
+        thread = threading.Thread(target=run, name="price-refresh", daemon=True)
+        with self._lock:
+            self._threads.add(thread)
+        thread.start()
+        return thread
+
+    def wait(self, timeout=None):
+        """Waits up to timeout seconds for the running background refreshes; returns True if they all finished"""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._lock:
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join(None if deadline is None else max(0, deadline - time.time()))
+        return not any(thread.is_alive() for thread in threads)
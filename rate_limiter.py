@@ -0,0 +1,190 @@
+"""
+Central request scheduler with token-bucket rate limits.
+
+Every API the agent talks to (CoinMarketCap, each exchange) has a token bucket
+refilled at its allowed rate, with its burst allowance as capacity. A request
+takes as many tokens as its endpoint weight (a CoinMarketCap quotes request
+costs one token per call credit, an exchange endpoint what the exchange
+charges for it), so the agent can use the full allowance without going over.
+
+Requests waiting for tokens queue by priority lane, then arrival: a trade
+order waiting on an exchange goes ahead of any ticker poll queued for a
+dashboard refresh. Queue depth and wait times are tracked per source and lane.
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+# Priority lanes, most urgent first
+PRIORITY_TRADE = 0
+PRIORITY_MARKET_DATA = 1  # Scans, monitors and auto-trading price refreshes
+PRIORITY_DASHBOARD = 2
+
+LANE_NAMES = {PRIORITY_TRADE: "trade", PRIORITY_MARKET_DATA: "market data", PRIORITY_DASHBOARD: "dashboard"}
+
+# Wait times kept per lane for the percentiles
+WAIT_SAMPLES = 1000
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a request couldn't get its tokens within its timeout"""
+
+
+class TokenBucket:
+    """Holds up to capacity tokens, refilled continuously at rate tokens per second"""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, weight, now=None):
+        """Seconds until weight tokens are available (a weight above capacity needs a full bucket)"""
+        self._refill(time.monotonic() if now is None else now)
+        missing = min(weight, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, weight):
+        self.tokens -= min(weight, self.capacity)
+
+
+class _Limiter:
+    """Bucket, wait queue and metrics of one source"""
+
+    def __init__(self, rate, burst):
+        self.bucket = TokenBucket(rate, burst)
+        self.condition = threading.Condition()
+        self.queue = []  # Heap of (priority, arrival) tickets
+        self.max_queue_depth = 0
+        self.requests = 0
+        self.weight = 0.0
+        self.timeouts = 0
+        self.lane_requests = {}  # lane -> requests
+        self.waits = {}  # lane -> recent wait times in seconds
+
+    def remove(self, ticket):
+        if self.queue[0] == ticket:
+            heapq.heappop(self.queue)
+        else:
+            self.queue.remove(ticket)
+            heapq.heapify(self.queue)
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+class RequestScheduler:
+    """
+    Token-bucket limits per source with priority lanes.
+
+    limits maps a source name to {"rate": requests per second, "burst": bucket
+    capacity}; weights maps (source, endpoint) to the tokens one request takes
+    (default 1). Sources without a limit are never throttled.
+    """
+
+    def __init__(self, limits=None, weights=None):
+        self.weights = dict(weights or {})
+        self._limiters = {}
+        self._arrivals = itertools.count()
+        for source, limit in (limits or {}).items():
+            self.set_limit(source, limit["rate"], limit.get("burst", limit["rate"]))
+
+    def set_limit(self, source, rate, burst):
+        self._limiters[source] = _Limiter(rate, burst)
+
+    def weight(self, source, endpoint):
+        return self.weights.get((source, endpoint), 1)
+
+    def acquire(self, source, endpoint=None, weight=None, priority=PRIORITY_MARKET_DATA, timeout=None):
+        """
+        Blocks until the source has tokens for one request and no more urgent request is waiting.
+
+        weight defaults to the endpoint's weight. Returns the seconds waited,
+        or raises RateLimitTimeout after timeout seconds.
+        """
+        limiter = self._limiters.get(source)
+        if limiter is None:
+            return 0.0
+        weight = self.weight(source, endpoint) if weight is None else weight
+        ticket = (priority, next(self._arrivals))
+        start = time.monotonic()
+
+        with limiter.condition:
+            heapq.heappush(limiter.queue, ticket)
+            limiter.max_queue_depth = max(limiter.max_queue_depth, len(limiter.queue))
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    # Only the head of the queue may take tokens; the others wait their turn
+                    if limiter.queue[0] == ticket:
+                        wait = limiter.bucket.wait_time(weight, now)
+                        if wait <= 0:
+                            limiter.bucket.take(weight)
+                            break
+                    if timeout is not None:
+                        left = start + timeout - now
+                        if left <= 0:
+                            limiter.timeouts += 1
+                            raise RateLimitTimeout(f"{source}: no rate limit tokens within {timeout}s")
+                        wait = left if wait is None else min(wait, left)
+                    limiter.condition.wait(wait)
+            finally:
+                limiter.remove(ticket)
+                limiter.condition.notify_all()
+
+            waited = time.monotonic() - start
+            limiter.requests += 1
+            limiter.weight += weight
+            limiter.lane_requests[priority] = limiter.lane_requests.get(priority, 0) + 1
+            limiter.waits.setdefault(priority, deque(maxlen=WAIT_SAMPLES)).append(waited)
+        return waited
+
+    def call(self, source, function, *args, endpoint=None, weight=None, priority=PRIORITY_MARKET_DATA, timeout=None):
+        """Calls function(*args) once the source's rate limit allows it"""
+        self.acquire(source, endpoint, weight, priority, timeout)
+        return function(*args)
+
+    def queue_depth(self, source):
+        limiter = self._limiters.get(source)
+        return len(limiter.queue) if limiter else 0
+
+    def stats(self):
+        """
+        Returns {source: {"requests", "weight", "queue_depth", "max_queue_depth",
+        "timeouts", "tokens", "lanes": {lane: {"requests", "wait_p50", "wait_p99", "wait_max"}}}}
+        (wait times in seconds, over the last WAIT_SAMPLES requests of each lane).
+        """
+        result = {}
+        for source, limiter in self._limiters.items():
+            with limiter.condition:
+                limiter.bucket.wait_time(0)  # Refill, so tokens is current
+                lanes = {
+                    LANE_NAMES.get(priority, str(priority)): {
+                        "requests": limiter.lane_requests[priority],
+                        "wait_p50": _percentile(waits, 0.5),
+                        "wait_p99": _percentile(waits, 0.99),
+                        "wait_max": max(waits)
+                    }
+                    for priority, waits in sorted(limiter.waits.items())
+                }
+                result[source] = {
+                    "requests": limiter.requests,
+                    "weight": limiter.weight,
+                    "queue_depth": len(limiter.queue),
+                    "max_queue_depth": limiter.max_queue_depth,
+                    "timeouts": limiter.timeouts,
+                    "tokens": limiter.bucket.tokens,
+                    "lanes": lanes
+                }
+        return result
@@ -0,0 +1,47 @@
+"""
+Memoized text fragments for the dashboards.
+
+A dashboard is a join of fragments (table rows, sections), each rendered
+from a few inputs: the prices and profit of a route, the age of a price, the
+version of the route table. FragmentCache keeps every fragment with the
+inputs it was rendered from and only calls the renderer again when they
+change, so refreshing a 500-pair dashboard where a handful of prices moved
+formats a handful of rows and joins the rest as they were.
+"""
+import threading
+
+
+class FragmentCache:
+    """Rendered fragments by key, each re-rendered only when its inputs change"""
+
+    def __init__(self, max_size=20000):
+        self.max_size = max_size
+        self.fragments = {}
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    def get(self, key, inputs, render, *args):
+        """
+        Returns the fragment of key, calling render(*args) if it's missing or
+        was rendered from other inputs (any value comparable with ==)
+        """
+        entry = self.fragments.get(key)
+        if entry is not None and entry[0] == inputs:
+            self.stats["hits"] += 1
+            return entry[1]
+
+        fragment = render(*args)
+        with self._lock:
+            self.stats["misses"] += 1
+            if key not in self.fragments and len(self.fragments) >= self.max_size:
+                # Drop the oldest fragment (pairs that left the dashboard stop being refreshed)
+                del self.fragments[next(iter(self.fragments))]
+            self.fragments[key] = (inputs, fragment)
+        return fragment
+
+    def clear(self):
+        with self._lock:
+            self.fragments.clear()
+
+    def __len__(self):
+        return len(self.fragments)
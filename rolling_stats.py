@@ -0,0 +1,272 @@
+"""
+Incremental statistics for price and spread streams.
+
+RunningStats tracks one stream (Welford mean/variance, EWMA, min/max) and is
+what monitors use. RollingWindow tracks many streams at once as NumPy columns:
+mean and variance over the last `window` ticks (sliding Welford), an EWMA with
+its variance, and the window min/max (two-stack monotonic queue), all in O(1)
+amortized work per value. StatsEngine maps keys such as (pair, exchange) or
+(pair, buy_exchange, sell_exchange) to RollingWindow columns.
+"""
+import math
+
+import numpy as np
+
+# Standard deviations below this fraction of the mean's magnitude are rounding noise
+RELATIVE_EPSILON = 1e-9
+
+
+class RunningStats:
+    """Running count, min, max, mean, variance and EWMA of a stream of values"""
+
+    __slots__ = ("alpha", "count", "mean", "m2", "min", "max", "ewma", "ewm_var", "last")
+
+    def __init__(self, alpha=0.1):
+        self.alpha = alpha
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.ewma = None
+        self.ewm_var = 0.0
+        self.last = None
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if self.ewma is None:
+            self.ewma = value
+        else:
+            diff = value - self.ewma
+            increment = self.alpha * diff
+            self.ewma += increment
+            self.ewm_var = (1 - self.alpha) * (self.ewm_var + diff * increment)
+        self.last = value
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(max(self.variance, 0.0))
+
+    @property
+    def volatility(self):
+        """Price range as a percentage of the average price"""
+        return ((self.max - self.min) / self.mean) * 100 if self.mean > 0 else 0.0
+
+    def zscore(self, value):
+        std = self.std
+        if std <= RELATIVE_EPSILON * (abs(self.mean) + 1):
+            return float("nan")
+        return (value - self.mean) / std
+
+
+class RollingWindow:
+    """
+    Sliding-window statistics of `width` streams updated together, one row of values per tick.
+
+    NaN values (missing prices) are replaced by the stream's previous value so
+    every column keeps the same tick count.
+    """
+
+    def __init__(self, width, window=60, alpha=0.1):
+        self.width = width
+        self.window = window
+        self.alpha = alpha
+        self.count = 0
+
+        # Ring of the values in the window, for the sliding mean/variance
+        self.values = np.zeros((window, width))
+        self.position = 0
+        self.mean = np.zeros(width)
+        self.m2 = np.zeros(width)
+        self.last = np.full(width, np.nan)
+
+        # z-score of the latest value against the window before it
+        self.zscores = np.full(width, np.nan)
+
+        self.ewma = np.zeros(width)
+        self.ewm_var = np.zeros(width)
+
+        # Two-stack queue: the back stack keeps its running min/max, the front
+        # stack its suffix min/max, so the window min/max is one comparison
+        self.back = np.zeros((window, width))
+        self.back_size = 0
+        self.back_min = np.full(width, np.inf)
+        self.back_max = np.full(width, -np.inf)
+        self.front_min = np.zeros((window, width))
+        self.front_max = np.zeros((window, width))
+        self.front_position = 0
+        self.front_size = 0
+
+    def push(self, values):
+        values = np.array(values, dtype=np.float64).reshape(self.width)
+        missing = np.isnan(values)
+        if missing.any():
+            values[missing] = self.last[missing]
+            values[np.isnan(values)] = 0.0
+
+        if self.count >= 2:
+            std = np.sqrt(np.maximum(self.m2, 0.0) / (min(self.count, self.window) - 1))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                self.zscores = np.where(
+                    std > RELATIVE_EPSILON * (np.abs(self.mean) + 1), (values - self.mean) / std, np.nan
+                )
+
+        self._push_moments(values)
+        self._push_extremes(values)
+
+        if self.count == 0:
+            self.ewma[:] = values
+        else:
+            diff = values - self.ewma
+            increment = self.alpha * diff
+            self.ewma += increment
+            self.ewm_var = (1 - self.alpha) * (self.ewm_var + diff * increment)
+
+        self.last = values
+        self.count += 1
+
+    def _push_moments(self, values):
+        """Sliding Welford update: add the new values and, once full, drop the oldest"""
+        if self.count < self.window:
+            size = self.count + 1
+            delta = values - self.mean
+            self.mean += delta / size
+            self.m2 += delta * (values - self.mean)
+        else:
+            old = self.values[self.position]
+            previous_mean = self.mean.copy()
+            self.mean += (values - old) / self.window
+            self.m2 += (values - old) * (values - self.mean + old - previous_mean)
+        self.values[self.position] = values
+        self.position = (self.position + 1) % self.window
+
+    def _push_extremes(self, values):
+        if self.count >= self.window:
+            if self.front_position == self.front_size:
+                self._flip()
+            self.front_position += 1
+
+        self.back[self.back_size] = values
+        self.back_size += 1
+        np.minimum(self.back_min, values, out=self.back_min)
+        np.maximum(self.back_max, values, out=self.back_max)
+
+    def _flip(self):
+        """Moves the back stack to the front, precomputing its suffix min/max"""
+        size = self.back_size
+        reversed_values = self.back[size - 1::-1] if size else self.back[:0]
+        self.front_min[:size] = np.minimum.accumulate(reversed_values, axis=0)[::-1]
+        self.front_max[:size] = np.maximum.accumulate(reversed_values, axis=0)[::-1]
+        self.front_size = size
+        self.front_position = 0
+        self.back_size = 0
+        self.back_min.fill(np.inf)
+        self.back_max.fill(-np.inf)
+
+    @property
+    def size(self):
+        """Number of ticks currently in the window"""
+        return min(self.count, self.window)
+
+    @property
+    def variance(self):
+        if self.size < 2:
+            return np.zeros(self.width)
+        return np.maximum(self.m2, 0.0) / (self.size - 1)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    @property
+    def ewm_std(self):
+        return np.sqrt(np.maximum(self.ewm_var, 0.0))
+
+    def column_min(self, i):
+        value = self.back_min[i]
+        if self.front_position < self.front_size:
+            value = min(value, self.front_min[self.front_position, i])
+        return float(value)
+
+    def column_max(self, i):
+        value = self.back_max[i]
+        if self.front_position < self.front_size:
+            value = max(value, self.front_max[self.front_position, i])
+        return float(value)
+
+    @property
+    def min(self):
+        if self.front_position < self.front_size:
+            return np.minimum(self.front_min[self.front_position], self.back_min)
+        return self.back_min.copy()
+
+    @property
+    def max(self):
+        if self.front_position < self.front_size:
+            return np.maximum(self.front_max[self.front_position], self.back_max)
+        return self.back_max.copy()
+
+
+class StatsEngine:
+    """
+    Rolling statistics per key, updated with one value per key per tick.
+
+    The keys are fixed by the first update; updating with a different key list
+    starts over, so changing the trading pairs doesn't mix streams.
+    """
+
+    def __init__(self, window=60, alpha=0.1):
+        self.window = window
+        self.alpha = alpha
+        self.keys = []
+        self.index = {}
+        self.stats = None
+
+    def update(self, keys, values):
+        """Adds one tick: values[i] is the new value of keys[i]"""
+        if self.stats is None or (keys is not self.keys and keys != self.keys):
+            self.keys = keys
+            self.index = {key: i for i, key in enumerate(self.keys)}
+            self.stats = RollingWindow(len(self.keys), self.window, self.alpha)
+        self.stats.push(values)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def get(self, key):
+        """Returns {"count", "last", "mean", "std", "ewma", "ewm_std", "min", "max", "zscore"} for a key, or None"""
+        i = self.index.get(key)
+        if i is None or self.stats is None or not self.stats.count:
+            return None
+        stats = self.stats
+        size = stats.size
+        std = math.sqrt(max(stats.m2[i], 0.0) / (size - 1)) if size > 1 else 0.0
+        return {
+            "count": size,
+            "last": float(stats.last[i]),
+            "mean": float(stats.mean[i]),
+            "std": std,
+            "ewma": float(stats.ewma[i]),
+            "ewm_std": math.sqrt(max(stats.ewm_var[i], 0.0)),
+            "min": stats.column_min(i),
+            "max": stats.column_max(i),
+            "zscore": float(stats.zscores[i])
+        }
+
+    def zscore(self, key):
+        """How many standard deviations the latest value of key is above its rolling mean (NaN if unknown)"""
+        i = self.index.get(key)
+        if i is None or self.stats is None:
+            return float("nan")
+        return float(self.stats.zscores[i])
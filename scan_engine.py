@@ -0,0 +1,171 @@
+"""
+Vectorized arbitrage scan engine.
+
+Instead of walking every trading pair and every exchange with Python dicts,
+prices are laid out as a (pairs x exchanges) matrix and every ordered
+(buy_exchange, sell_exchange) route of every pair is scored at once.
+"""
+import numpy as np
+
+
+def build_fee_vectors(exchanges):
+    """Builds the exchange name list and the fee/withdrawal fee vectors (as fractions) from EXCHANGES"""
+    names = list(exchanges)
+    fees = np.array([exchanges[name]["fee"] for name in names], dtype=np.float64) / 100
+    withdrawal_fees = np.array([exchanges[name]["withdrawal_fee"] for name in names], dtype=np.float64) / 100
+    return names, fees, withdrawal_fees
+
+
+def score_routes(prices, buy_cost_factor, sell_value_factor, same_exchange):
+    """
+    Scores every route of a (pairs x exchanges) price matrix; returns the
+    (pairs x routes) diff and net gain percentages and the routes of each
+    pair ranked best first
+    """
+    buy = prices[:, :, None]
+    sell = prices[:, None, :]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        diff = (sell - buy) / buy * 100
+        net = (sell * sell_value_factor - buy * buy_cost_factor[:, None]) / buy * 100
+
+    diff = diff.reshape(len(prices), -1)
+    net = net.reshape(len(prices), -1)
+
+    # Routes within one exchange or with missing prices are never candidates
+    net[:, same_exchange] = -np.inf
+    net[np.isnan(net)] = -np.inf
+
+    return diff, net, np.argsort(-net, axis=1, kind="stable")
+
+
+class RouteTable:
+    """
+    Precomputed scores of every ordered (buy_exchange, sell_exchange) route for every pair.
+
+    Fee constants are derived once from EXCHANGES when the table is created.
+    update() scores and ranks all routes of a new price matrix in one vectorized
+    pass, so queries only slice the stored result.
+
+    Fee model: buying one unit costs price * (1 + fee + withdrawal_fee) on the
+    buy exchange and selling it returns price * (1 - fee) on the sell exchange.
+    Percentages are relative to the buy price. A trade that stays on one
+    exchange (an unwind) pays no withdrawal: buying costs price * (1 + fee).
+    """
+
+    def __init__(self, exchanges):
+        self.exchange_names, fees, withdrawal_fees = build_fee_vectors(exchanges)
+        self.buy_cost_factor = 1 + fees + withdrawal_fees
+        self.sell_value_factor = 1 - fees
+        self.trade_cost_factor = 1 + fees
+
+        count = len(self.exchange_names)
+        self.same_exchange = np.eye(count, dtype=bool).ravel()
+
+        self.version = None
+        self.pairs = []
+        self.pair_index = {}
+        self.prices = np.empty((0, count))
+        self.diff_percent = np.empty((0, count * count))
+        self.net_gain_percent = np.empty((0, count * count))
+        self.ranked = np.empty((0, count * count), dtype=np.intp)
+
+    def update(self, pairs, prices, version=None):
+        """Scores and ranks every route of a (pairs x exchanges) price matrix"""
+        prices = np.asarray(prices, dtype=np.float64)
+        diff, net, ranked = score_routes(prices, self.buy_cost_factor, self.sell_value_factor, self.same_exchange)
+
+        self.pairs = list(pairs)
+        self.pair_index = {pair: i for i, pair in enumerate(self.pairs)}
+        self.prices = prices
+        self.diff_percent = diff
+        self.net_gain_percent = net
+        self.ranked = ranked
+        self.version = version
+
+    def _route_columns(self, rows, top, min_profit):
+        """Gathers the given rows and ranked route columns as (pair rows, ranks, buy index, sell index, flat route index)"""
+        count = len(self.exchange_names)
+        net = np.take_along_axis(self.net_gain_percent[rows], top, axis=1)
+
+        mask = np.isfinite(net)
+        if min_profit is not None:
+            mask &= (net > 0) & (net >= min_profit)
+
+        route_rows, ranks = np.nonzero(mask)
+        flat = top[route_rows, ranks]
+        return rows[route_rows], ranks, flat // count, flat % count, flat
+
+    def _routes(self, rows, top, min_profit):
+        """Builds route dicts for the given rows and ranked route columns"""
+        pair_rows, ranks, buy_index, sell_index, flat = self._route_columns(rows, top, min_profit)
+
+        buy_price = self.prices[pair_rows, buy_index].tolist()
+        sell_price = self.prices[pair_rows, sell_index].tolist()
+        diff_percent = self.diff_percent[pair_rows, flat].tolist()
+        net_gain_percent = self.net_gain_percent[pair_rows, flat].tolist()
+        buy_index = buy_index.tolist()
+        sell_index = sell_index.tolist()
+        ranks = ranks.tolist()
+
+        routes = []
+        for j, row in enumerate(pair_rows.tolist()):
+            routes.append({
+                "pair": self.pairs[row],
+                "rank": ranks[j] + 1,
+                "buy_exchange": self.exchange_names[buy_index[j]],
+                "buy_price": buy_price[j],
+                "sell_exchange": self.exchange_names[sell_index[j]],
+                "sell_price": sell_price[j],
+                "diff_percent": diff_percent[j],
+                "net_gain_percent": net_gain_percent[j]
+            })
+        return routes
+
+    def top_routes(self, k, min_profit=None):
+        """
+        Returns the k best routes of every pair, grouped by pair and best first.
+
+        With min_profit set, only routes with a positive net gain of at least
+        min_profit percent are returned.
+        """
+        count = len(self.exchange_names)
+        k = min(k, count * (count - 1))
+        if not self.pairs or k <= 0:
+            return []
+        return self._routes(np.arange(len(self.pairs)), self.ranked[:, :k], min_profit)
+
+    def top_route_columns(self, k, min_profit=None):
+        """
+        Same routes as top_routes(), as a dict of NumPy columns sorted by net
+        gain (best first), without building a dict per route
+        """
+        count = len(self.exchange_names)
+        k = max(0, min(k, count * (count - 1)))
+        pair_rows, ranks, buy_index, sell_index, flat = self._route_columns(
+            np.arange(len(self.pairs)), self.ranked[:, :k], min_profit
+        )
+        net_gain_percent = self.net_gain_percent[pair_rows, flat]
+        order = np.argsort(-net_gain_percent, kind="stable")
+        pair_rows, ranks, buy_index, sell_index, flat = (
+            pair_rows[order], ranks[order], buy_index[order], sell_index[order], flat[order]
+        )
+        names = np.array(self.exchange_names)
+        return {
+            "pair": np.array(self.pairs, dtype=str)[pair_rows],
+            "rank": ranks + 1,
+            "buy_exchange": names[buy_index],
+            "buy_price": self.prices[pair_rows, buy_index],
+            "sell_exchange": names[sell_index],
+            "sell_price": self.prices[pair_rows, sell_index],
+            "diff_percent": self.diff_percent[pair_rows, flat],
+            "net_gain_percent": net_gain_percent[order]
+        }
+
+    def best_route(self, pair):
+        """Returns the best route of a single pair, or None if it has no valid route"""
+        row = self.pair_index.get(pair)
+        if row is None or len(self.exchange_names) < 2:
+            return None
+        routes = self._routes(np.array([row]), self.ranked[row:row + 1, :1], None)
+        return routes[0] if routes else None
@@ -0,0 +1,218 @@
+"""
+Sharded multi-core route scoring.
+
+RouteTable.update scores every pair on one core. ShardedRouteTable splits
+the pairs into contiguous shards scored by a pool of worker processes. The
+price matrix and the score matrices (diff, net gain, ranking) live in
+multiprocessing.shared_memory blocks: a tick only copies the prices into
+the shared block, each worker scores its rows and writes them in place, and
+sends back nothing but the routes of its shard that pass the candidate
+threshold (row and rank indices). top_routes() queries at that threshold or
+stricter then build their result from those candidates instead of masking
+the whole table, and every other query reads the shared matrices like a
+normal RouteTable.
+
+Blocks are double-buffered, so arrays taken from the previous tick (by a
+dashboard rendering in another thread, say) aren't overwritten while the
+next tick is scored. Small tables are scored in-process: below min_pairs
+the round trip to the workers costs more than it saves. The process pool
+and shared memory modules are only imported then, too.
+"""
+import os
+
+import numpy as np
+
+from scan_engine import RouteTable, score_routes
+
+# Shared blocks a worker has attached to, by name
+_attached = {}
+
+# Fee factors of the exchanges, set once per worker
+_factors = None
+
+
+def _init_worker(buy_cost_factor, sell_value_factor, same_exchange):
+    global _factors
+    _factors = (buy_cost_factor, sell_value_factor, same_exchange)
+
+
+def _layout(capacity, exchanges):
+    """Byte offsets of the prices, diff, net and ranked matrices in a block of capacity rows"""
+    routes = exchanges * exchanges
+    sizes = [capacity * exchanges * 8, capacity * routes * 8, capacity * routes * 8, capacity * routes * np.dtype(np.intp).itemsize]
+    offsets = np.cumsum([0] + sizes)
+    return offsets[:-1].tolist(), int(offsets[-1])
+
+
+def _views(buffer, capacity, exchanges, count):
+    """The (count x ...) prices, diff, net and ranked arrays of a block"""
+    routes = exchanges * exchanges
+    offsets, _ = _layout(capacity, exchanges)
+    shapes = [(count, exchanges), (count, routes), (count, routes), (count, routes)]
+    dtypes = [np.float64, np.float64, np.float64, np.intp]
+    return [np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset) for shape, dtype, offset in zip(shapes, dtypes, offsets)]
+
+
+def _score_shard(job):
+    """Scores rows [start, stop) of a shared block in place; returns the (rows, ranks) passing the threshold"""
+    from multiprocessing import shared_memory
+
+    name, live, capacity, exchanges, count, start, stop, k, min_profit = job
+
+    # Let go of blocks the table has replaced
+    for stale in [block for block in _attached if block not in live]:
+        _attached.pop(stale).close()
+    block = _attached.get(name)
+    if block is None:
+        block = _attached[name] = shared_memory.SharedMemory(name=name)
+
+    prices, diff, net, ranked = _views(block.buf, capacity, exchanges, count)
+    diff[start:stop], net[start:stop], ranked[start:stop] = score_routes(prices[start:stop], *_factors)
+
+    # Only the candidate routes go back to the parent
+    top = ranked[start:stop, :k]
+    candidates = np.take_along_axis(net[start:stop], top, axis=1)
+    mask = np.isfinite(candidates)
+    if min_profit is not None:
+        mask &= (candidates > 0) & (candidates >= min_profit)
+    rows, ranks = np.nonzero(mask)
+    return (rows + start).astype(np.int32), ranks.astype(np.int16)
+
+
+class ShardedRouteTable(RouteTable):
+    """
+    A RouteTable scored by a pool of worker processes over shared memory.
+
+    workers defaults to every core (0 scores in-process); each update is split
+    into workers * shards_per_worker shards. candidate_filter() returns the loosest (k,
+    min_profit) top_routes() query expected after an update (the opportunity
+    threshold), whose routes the workers pick out while scoring. stats counts
+    the sharded and in-process updates. close() stops the pool and frees the
+    shared memory.
+    """
+
+    def __init__(self, exchanges, workers=None, min_pairs=2000, shards_per_worker=2, candidate_filter=None):
+        super().__init__(exchanges)
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.min_pairs = min_pairs
+        self.shards_per_worker = shards_per_worker
+        self.candidate_filter = candidate_filter
+        self.stats = {"sharded": 0, "local": 0, "candidates": 0}
+        self._pool = None
+        self._pool_workers = None
+        self._blocks = [None, None]  # [shared block, capacity] of both buffers
+        self._buffer = 0
+        self._retired = []  # Unlinked blocks still mapped by arrays someone holds
+        self._candidates = None  # ((k, min_profit), (rows, ranks)) of the current prices
+
+    def _release(self, block):
+        """Unlinks a block and unmaps it, or retires it while arrays still point into it"""
+        block.unlink()
+        self._retired.append(block)
+        for retired in list(self._retired):
+            try:
+                retired.close()
+                self._retired.remove(retired)
+            except BufferError:
+                pass
+
+    def _block(self, count):
+        """The shared block of the next buffer, grown to hold count rows if needed"""
+        from multiprocessing import shared_memory
+
+        self._buffer = 1 - self._buffer
+        current = self._blocks[self._buffer]
+        if current is None or current[1] < count:
+            capacity = max(count, current[1] * 2 if current else 0)
+            _, size = _layout(capacity, len(self.exchange_names))
+            if current is not None:
+                self._release(current[0])
+            current = self._blocks[self._buffer] = [shared_memory.SharedMemory(create=True, size=size), capacity]
+        return current
+
+    def _get_pool(self):
+        from concurrent.futures import ProcessPoolExecutor
+
+        # A changed worker count takes effect on the next sharded update
+        if self._pool is not None and self._pool_workers != self.workers:
+            self._pool.shutdown()
+            self._pool = None
+        if self._pool is None:
+            self._pool_workers = self.workers
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.buy_cost_factor, self.sell_value_factor, self.same_exchange)
+            )
+        return self._pool
+
+    def update(self, pairs, prices, version=None):
+        """Scores and ranks every route of a (pairs x exchanges) price matrix, in shards on the worker pool"""
+        self._candidates = None
+        if self.workers < 1 or len(pairs) < self.min_pairs:
+            self.stats["local"] += 1
+            return super().update(pairs, prices, version)
+
+        count = len(pairs)
+        exchanges = len(self.exchange_names)
+        block, capacity = self._block(count)
+        shared_prices, diff, net, ranked = _views(block.buf, capacity, exchanges, count)
+        shared_prices[:] = prices
+
+        k, min_profit = self.candidate_filter() if self.candidate_filter else (0, None)
+        k = max(0, min(k, exchanges * (exchanges - 1)))
+        live = [entry[0].name for entry in self._blocks if entry is not None]
+        bounds = np.linspace(0, count, self.workers * self.shards_per_worker + 1).astype(int)
+        jobs = [
+            (block.name, live, capacity, exchanges, count, start, stop, k, min_profit)
+            for start, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist()) if stop > start
+        ]
+        results = list(self._get_pool().map(_score_shard, jobs))
+
+        if self.pairs != pairs:
+            self.pairs = list(pairs)
+            self.pair_index = {pair: i for i, pair in enumerate(self.pairs)}
+        self.prices = shared_prices
+        self.diff_percent = diff
+        self.net_gain_percent = net
+        self.ranked = ranked
+        self.version = version
+
+        # Shards are in row order, so the candidates are grouped by pair like top_routes()
+        rows = np.concatenate([result[0] for result in results]).astype(np.intp)
+        ranks = np.concatenate([result[1] for result in results]).astype(np.intp)
+        self._candidates = ((k, min_profit), (rows, ranks))
+        self.stats["sharded"] += 1
+        self.stats["candidates"] += len(rows)
+
+    def _route_columns(self, rows, top, min_profit):
+        # A query over every pair at least as strict as the candidate threshold
+        # only needs the routes the workers picked out
+        if self._candidates is not None and len(rows) == len(self.pairs):
+            (k, threshold), (route_rows, ranks) = self._candidates
+            if top.shape[1] <= k and (threshold is None or (min_profit is not None and min_profit >= threshold)):
+                count = len(self.exchange_names)
+                flat = self.ranked[route_rows, ranks]
+                mask = ranks < top.shape[1]
+                if min_profit is not None:
+                    net = self.net_gain_percent[route_rows, flat]
+                    mask &= (net > 0) & (net >= min_profit)
+                route_rows, ranks, flat = route_rows[mask], ranks[mask], flat[mask]
+                return route_rows, ranks, flat // count, flat % count, flat
+        return super()._route_columns(rows, top, min_profit)
+
+    def close(self):
+        """Stops the worker pool and frees the shared memory (the table is empty afterwards)"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        count = len(self.exchange_names)
+        self.pairs, self.pair_index, self.version, self._candidates = [], {}, None, None
+        self.prices = np.empty((0, count))
+        self.diff_percent = np.empty((0, count * count))
+        self.net_gain_percent = np.empty((0, count * count))
+        self.ranked = np.empty((0, count * count), dtype=np.intp)
+        for entry in self._blocks:
+            if entry is not None:
+                self._release(entry[0])
+        self._blocks = [None, None]
@@ -0,0 +1,436 @@
+"""
+Streaming exchange tickers over WebSocket.
+
+CoinMarketCap quotes are aggregated and refreshed once a minute at best;
+arbitrage needs each exchange's own prices as they change. StreamingTicker
+keeps one WebSocket subscription per exchange in a background thread and
+writes every update into an in-memory PriceStore with the update's own
+timestamp, so the agent can tell a fresh streamed price from one left over
+by a dropped connection.
+
+Updates carry a sequence number. A missing number means an update was lost,
+and the price it carried would stay wrong until that symbol moves again, so
+the ticker asks for a snapshot and resyncs: updates arriving meanwhile are
+buffered and the ones newer than the snapshot applied on top of it. Broken
+or silent connections are reopened with exponential backoff.
+
+The WebSocket client is a minimal RFC 6455 implementation on the standard
+library (text frames, fragmentation, ping/pong, close, ws:// and wss://), so
+streaming needs no extra dependency. TickerProtocol is the message format of
+the local replay server (benchmarks/fake_servers.py); an exchange with a
+different format needs a subclass that builds its subscribe and snapshot
+requests and parses its messages.
+"""
+import base64
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+from instrumentation import Histogram
+from price_store import PriceStore
+
+_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT = 0x1
+OPCODE_BINARY = 0x2
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+
+class ConnectionClosed(Exception):
+    pass
+
+
+def accept_key(key):
+    """Sec-WebSocket-Accept value for a Sec-WebSocket-Key"""
+    return base64.b64encode(hashlib.sha1((key + _GUID).encode()).digest()).decode()
+
+
+def _apply_mask(payload, mask):
+    # XOR as one big integer: much faster than a per-byte loop
+    n = len(payload)
+    if not n:
+        return payload
+    key = (mask * (n // 4 + 1))[:n]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(key, "big")).to_bytes(n, "big")
+
+
+def encode_frame(payload, opcode=OPCODE_TEXT, mask=True):
+    """One final frame; clients must mask what they send, servers must not"""
+    if isinstance(payload, str):
+        payload = payload.encode()
+    n = len(payload)
+    header = bytearray([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    if n < 126:
+        header.append(mask_bit | n)
+    elif n < 1 << 16:
+        header.append(mask_bit | 126)
+        header += n.to_bytes(2, "big")
+    else:
+        header.append(mask_bit | 127)
+        header += n.to_bytes(8, "big")
+    if mask:
+        key = os.urandom(4)
+        return bytes(header) + key + _apply_mask(payload, key)
+    return bytes(header) + payload
+
+
+def _read_exactly(reader, n):
+    data = reader.read(n)
+    if len(data) < n:
+        raise ConnectionClosed("connection closed by peer")
+    return data
+
+
+def read_frame(reader):
+    """Reads one frame from a buffered reader; returns (fin, opcode, payload)"""
+    first, second = _read_exactly(reader, 2)
+    n = second & 0x7F
+    if n == 126:
+        n = int.from_bytes(_read_exactly(reader, 2), "big")
+    elif n == 127:
+        n = int.from_bytes(_read_exactly(reader, 8), "big")
+    mask = _read_exactly(reader, 4) if second & 0x80 else None
+    payload = _read_exactly(reader, n) if n else b""
+    if mask:
+        payload = _apply_mask(payload, mask)
+    return bool(first & 0x80), first & 0x0F, payload
+
+
+class WebSocketConnection:
+    """A client WebSocket: connect() does the handshake, recv() returns the next text (or binary) message"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.reader = sock.makefile("rb")
+        self._send_lock = threading.Lock()
+
+    @classmethod
+    def connect(cls, url, timeout=10):
+        parsed = urlparse(url)
+        secure = parsed.scheme == "wss"
+        port = parsed.port or (443 if secure else 80)
+        sock = socket.create_connection((parsed.hostname, port), timeout=timeout)
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if secure:
+                import ssl
+                sock = ssl.create_default_context().wrap_socket(sock, server_hostname=parsed.hostname)
+
+            key = base64.b64encode(os.urandom(16)).decode()
+            path = (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+            sock.sendall((
+                f"GET {path} HTTP/1.1\r\n"
+                f"Host: {parsed.netloc}\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Key: {key}\r\n"
+                "Sec-WebSocket-Version: 13\r\n\r\n"
+            ).encode())
+
+            connection = cls(sock)
+            status = connection.reader.readline().decode("latin-1")
+            headers = {}
+            while True:
+                line = connection.reader.readline().decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            if " 101 " not in status + " " or headers.get("sec-websocket-accept") != accept_key(key):
+                raise ConnectionClosed(f"handshake refused: {status.strip() or 'no response'}")
+            return connection
+        except BaseException:
+            sock.close()
+            raise
+
+    def send(self, message, opcode=OPCODE_TEXT):
+        with self._send_lock:
+            self.sock.sendall(encode_frame(message, opcode))
+
+    def recv(self):
+        """The next data message (str for text, bytes for binary); answers pings on the way"""
+        parts = []
+        message_opcode = None
+        while True:
+            fin, opcode, payload = read_frame(self.reader)
+            if opcode == OPCODE_PING:
+                self.send(payload, OPCODE_PONG)
+                continue
+            if opcode == OPCODE_PONG:
+                continue
+            if opcode == OPCODE_CLOSE:
+                try:
+                    self.send(payload[:2], OPCODE_CLOSE)
+                except OSError:
+                    pass
+                raise ConnectionClosed("connection closed by server")
+
+            if opcode != OPCODE_CONTINUATION:
+                message_opcode = opcode
+            parts.append(payload)
+            if fin:
+                data = parts[0] if len(parts) == 1 else b"".join(parts)
+                return data.decode() if message_opcode == OPCODE_TEXT else data
+
+    def close(self):
+        try:
+            self.send(b"\x03\xe8", OPCODE_CLOSE)  # 1000: normal closure
+        except OSError:
+            pass
+        try:
+            # Shutting down first wakes up a thread blocked in recv()
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class TickerProtocol:
+    """
+    Message format of the replay server, and the default.
+
+    The client sends {"op": "subscribe", "symbols": [...]} and, to resync,
+    {"op": "snapshot"}. The server sends {"type": "snapshot" or "ticker",
+    "seq": n, "ts": seconds, "prices": {symbol: price}}: a snapshot has the
+    price of every subscribed symbol as of seq, a ticker the symbols that
+    changed in update seq. While nothing changes it sends {"type":
+    "heartbeat", "seq": n} with the last update's seq, so an update lost just
+    before a quiet spell is noticed too.
+    """
+
+    def subscribe(self, symbols):
+        return json.dumps({"op": "subscribe", "symbols": sorted(symbols)})
+
+    def resync(self):
+        return json.dumps({"op": "snapshot"})
+
+    def parse(self, message):
+        """(kind, seq, timestamp, {symbol: price}) of a message, kind None for anything else"""
+        data = json.loads(message)
+        kind = data.get("type")
+        if kind == "heartbeat":
+            return kind, data["seq"], data.get("ts"), None
+        if kind not in ("snapshot", "ticker"):
+            return None, None, None, None
+        return kind, data["seq"], data.get("ts"), data["prices"]
+
+
+class StreamingTicker:
+    """
+    Streams the prices of symbols on one exchange into store (a PriceStore) from a background thread.
+
+    stats counts messages, updates applied, sequence gaps, snapshots,
+    reconnects and errors; lag is a Histogram of the seconds between an
+    update's timestamp and its arrival. ready is set once the first snapshot
+    is applied.
+    """
+
+    def __init__(self, exchange, url, symbols, store, protocol=None, timeout=10,
+                 reconnect_delay=0.5, max_reconnect_delay=30, max_buffered=10000):
+        self.exchange = exchange
+        self.url = url
+        self.symbols = set(symbols)
+        self.store = store
+        self.protocol = protocol or TickerProtocol()
+        self.timeout = timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.max_buffered = max_buffered
+        self.source = f"{exchange} stream"
+        self.stats = {
+            "messages": 0, "updates": 0, "gaps": 0, "snapshots": 0,
+            "stale": 0, "reconnects": 0, "errors": 0
+        }
+        self.lag = Histogram()
+        self.connected = False
+        self.last_error = None
+        self.ready = threading.Event()
+        self._stop = threading.Event()
+        self._connection = None
+        self._thread = None
+        self._expected = None  # Next sequence number, None while waiting for a snapshot
+        self._buffer = deque()  # Updates received while waiting for a snapshot
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"stream-{self.exchange}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        connection = self._connection
+        if connection is not None:
+            connection.close()
+
+    def join(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        delay = self.reconnect_delay
+        while not self._stop.is_set():
+            try:
+                self._connection = WebSocketConnection.connect(self.url, self.timeout)
+                self.connected = True
+                self._resync()
+                self._connection.send(self.protocol.subscribe(self.symbols))
+                self._connection.send(self.protocol.resync())
+                while not self._stop.is_set():
+                    self._handle(self._connection.recv())
+                    if self._expected is not None:
+                        delay = self.reconnect_delay  # A synced connection resets the backoff
+            except (OSError, ConnectionClosed, ValueError, KeyError, TypeError) as e:
+                if self._stop.is_set():
+                    break
+                self.stats["errors"] += 1
+                self.last_error = str(e) or type(e).__name__
+            finally:
+                self.connected = False
+                if self._connection is not None:
+                    self._connection.close()
+                    self._connection = None
+
+            if self._stop.wait(delay):
+                break
+            delay = min(delay * 2, self.max_reconnect_delay)
+            self.stats["reconnects"] += 1
+
+    def _resync(self):
+        """Drops the sequence: updates are buffered until the next snapshot"""
+        self._expected = None
+        self._buffer.clear()
+
+    def _apply(self, prices, timestamp, now):
+        self.store.update(prices, self.source, timestamp or now)
+        if timestamp:
+            self.lag.record(max(0.0, now - timestamp))
+
+    def _handle(self, message):
+        kind, seq, timestamp, prices = self.protocol.parse(message)
+        self.stats["messages"] += 1
+        now = time.time()
+
+        if kind == "snapshot":
+            self._apply(prices, timestamp, now)
+            self.stats["snapshots"] += 1
+            self._expected = seq + 1
+            # Replay what arrived while the snapshot was on its way (until another gap, if any)
+            buffered, self._buffer = self._buffer, deque()
+            for update in buffered:
+                if self._expected is None:
+                    self._buffer.append(update)
+                else:
+                    self._update(*update, now)
+            self.ready.set()
+
+        elif kind == "ticker":
+            if self._expected is None:
+                if len(self._buffer) >= self.max_buffered:
+                    # The snapshot isn't coming: ask again
+                    self._resync()
+                    self._connection.send(self.protocol.resync())
+                self._buffer.append((seq, timestamp, prices))
+            else:
+                self._update(seq, timestamp, prices, now)
+
+        elif kind == "heartbeat":
+            if self._expected is not None and seq >= self._expected:
+                # The last update(s) before the heartbeat were lost
+                self.stats["gaps"] += 1
+                self._resync()
+                self._connection.send(self.protocol.resync())
+
+    def _update(self, seq, timestamp, prices, now):
+        if seq < self._expected:
+            self.stats["stale"] += 1  # Already in the snapshot (or a duplicate)
+        elif seq == self._expected:
+            self._apply(prices, timestamp, now)
+            self.stats["updates"] += 1
+            self._expected += 1
+        else:
+            # An update was lost: resync from a snapshot, keeping this one for after it
+            self.stats["gaps"] += 1
+            self._resync()
+            self._buffer.append((seq, timestamp, prices))
+            self._connection.send(self.protocol.resync())
+
+
+class StreamingFeed:
+    """
+    Streaming tickers of several exchanges ({exchange: url}), each writing to its own PriceStore.
+
+    prices(exchange) returns the streamed prices newer than max_age seconds
+    (price(exchange, symbol) just one of them), so a stalled stream falls back
+    to the other price sources; version changes with every applied update,
+    and freshness(now) every max_age / FRESHNESS_STEPS seconds, so a cached
+    result built on streamed prices can tell when some of them may have
+    expired since.
+    """
+
+    FRESHNESS_STEPS = 5
+
+    def __init__(self, urls, symbols, max_age, protocol=None, **options):
+        self.max_age = max_age
+        self.stores = {exchange: PriceStore(max_age) for exchange in urls}
+        self.tickers = {
+            exchange: StreamingTicker(exchange, url, symbols, self.stores[exchange], protocol, **options)
+            for exchange, url in urls.items()
+        }
+
+    def start(self, wait=0):
+        """Starts every ticker and waits up to wait seconds for their first snapshots"""
+        for ticker in self.tickers.values():
+            ticker.start()
+        deadline = time.time() + wait
+        for ticker in self.tickers.values():
+            ticker.ready.wait(max(0, deadline - time.time()))
+        return self
+
+    def stop(self):
+        for ticker in self.tickers.values():
+            ticker.stop()
+        for ticker in self.tickers.values():
+            ticker.join(1)
+
+    @property
+    def version(self):
+        return sum(store.version for store in self.stores.values())
+
+    def prices(self, exchange):
+        store = self.stores.get(exchange)
+        return store.fresh_prices() if store is not None else None
+
+    def price(self, exchange, symbol):
+        store = self.stores.get(exchange)
+        return store.fresh(symbol) if store is not None else None
+
+    def freshness(self, now=None):
+        """Number of the max_age / FRESHNESS_STEPS period now falls in"""
+        return int((now or time.time()) * self.FRESHNESS_STEPS / self.max_age)
+
+    def stats(self):
+        """Per-exchange connection state, counters and update lag percentiles (seconds)"""
+        return {
+            exchange: dict(
+                ticker.stats,
+                connected=ticker.connected,
+                symbols=len(self.stores[exchange]),
+                lag_p50=ticker.lag.percentile(0.5) if ticker.lag.count else None,
+                lag_p99=ticker.lag.percentile(0.99) if ticker.lag.count else None,
+                last_error=ticker.last_error
+            )
+            for exchange, ticker in self.tickers.items()
+        }
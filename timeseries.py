@@ -0,0 +1,261 @@
+"""
+Fixed-memory time-series store for price history.
+
+Series are keyed by (pair, exchange). Each one keeps its latest raw samples in
+an array-backed ring buffer plus downsampled rollups (open/high/low/close/count/
+sum per 1s, 1m and 1h bucket by default). Appends are O(1), windows are found
+by binary search and memory is bounded by the configured retention, so the
+store can run indefinitely.
+"""
+import threading
+import time
+from array import array
+
+
+class RingTable:
+    """
+    Ring buffer of float rows stored column by column in array('d').
+
+    Grows until it reaches capacity, then each append overwrites the oldest
+    row. Row indexes are logical: 0 is the oldest row, -1 the newest.
+    """
+
+    def __init__(self, fields, capacity):
+        self.fields = tuple(fields)
+        self.capacity = capacity
+        self.columns = [array('d') for _ in self.fields]
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, row):
+        if self.size < self.capacity:
+            for column, value in zip(self.columns, row):
+                column.append(value)
+            self.size += 1
+        else:
+            start = self.start
+            for column, value in zip(self.columns, row):
+                column[start] = value
+            self.start = (start + 1) % self.capacity
+
+    def get(self, column, index):
+        """Value of a column (by position) at a logical row index"""
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("ring table index out of range")
+        return self.columns[column][(self.start + index) % self.size]
+
+    def last(self, column=0):
+        return self.columns[column][(self.start - 1) % self.size] if self.size else None
+
+    def bisect(self, value, column=0):
+        """First logical row whose value in column is >= value (the column must be sorted)"""
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.get(column, middle) < value:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def column(self, column, first=0):
+        """Returns a column from logical row first to the newest, oldest first"""
+        if first >= self.size:
+            return []
+        data = self.columns[column]
+        begin = self.start + first
+        if begin >= self.size:
+            return data[begin - self.size:self.start].tolist()
+        return data[begin:].tolist() + data[:self.start].tolist()
+
+
+class Rollup:
+    """
+    Downsampled series: one open/high/low/close/count/sum bucket per resolution seconds.
+
+    The bucket being filled is kept in a plain list and only written to the
+    ring table once it closes, so most samples cost a few comparisons.
+    """
+
+    FIELDS = ("time", "open", "high", "low", "close", "count", "sum")
+
+    def __init__(self, resolution, capacity):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.buckets = RingTable(self.FIELDS, capacity)
+        self.current = None  # [time, open, high, low, close, count, sum] of the open bucket
+
+    def __len__(self):
+        return len(self.buckets) + (self.current is not None)
+
+    def first_time(self):
+        if len(self.buckets):
+            return self.buckets.get(0, 0)
+        return self.current[0] if self.current else None
+
+    def add(self, timestamp, value):
+        bucket_time = timestamp - timestamp % self.resolution
+        current = self.current
+
+        if current is not None and current[0] == bucket_time:
+            if value > current[2]:
+                current[2] = value
+            if value < current[3]:
+                current[3] = value
+            current[4] = value
+            current[5] += 1
+            current[6] += value
+        elif current is None or bucket_time > current[0]:
+            if current is not None:
+                self.buckets.append(current)
+            self.current = [bucket_time, value, value, value, value, 1, value]
+        # Samples older than the open bucket are only kept in the raw series
+
+    def since(self, start):
+        """Returns the buckets starting at or after start, oldest first"""
+        start -= start % self.resolution
+        first = self.buckets.bisect(start)
+        columns = [self.buckets.column(i, first) for i in range(len(self.FIELDS))]
+        rows = [dict(zip(self.FIELDS, row)) for row in zip(*columns)]
+        if self.current is not None and self.current[0] >= start:
+            rows.append(dict(zip(self.FIELDS, self.current)))
+        return rows
+
+
+class Series:
+    """Raw (timestamp, value) samples of one key plus its rollups"""
+
+    def __init__(self, capacity, rollups):
+        self.samples = RingTable(("timestamp", "value"), capacity)
+        self.rollups = [Rollup(resolution, buckets) for resolution, buckets in sorted(rollups.items())]
+
+    def append(self, timestamp, value):
+        last = self.samples.last()
+        if last is not None and timestamp < last:
+            timestamp = last  # Keep raw timestamps sorted for binary search
+        self.samples.append((timestamp, value))
+        for rollup in self.rollups:
+            rollup.add(timestamp, value)
+
+
+class TimeSeriesStore:
+    """
+    Bounded store of (pair, exchange) price series.
+
+    capacity is the number of raw samples kept per series; rollups maps a
+    bucket resolution in seconds to the number of buckets kept.
+    """
+
+    def __init__(self, capacity=1000, rollups=None):
+        self.capacity = capacity
+        self.rollup_config = dict(rollups if rollups is not None else {1: 600, 60: 1440, 3600: 720})
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self.series
+
+    def keys(self):
+        return list(self.series)
+
+    def _series(self, key):
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = Series(self.capacity, self.rollup_config)
+        return series
+
+    def append(self, key, value, timestamp=None):
+        with self._lock:
+            self._series(key).append(timestamp or time.time(), value)
+
+    def append_many(self, items, timestamp=None):
+        """Appends (key, value) pairs sampled at the same time under a single lock"""
+        timestamp = timestamp or time.time()
+        with self._lock:
+            for key, value in items:
+                self._series(key).append(timestamp, value)
+
+    def last(self, key):
+        series = self.series.get(key)
+        return series.samples.last(1) if series else None
+
+    def window(self, key, seconds, now=None):
+        """Returns (timestamps, values) of the raw samples from the last seconds"""
+        series = self.series.get(key)
+        if series is None:
+            return [], []
+        now = now or time.time()
+        first = series.samples.bisect(now - seconds)
+        return series.samples.column(0, first), series.samples.column(1, first)
+
+    def rollup(self, key, resolution, seconds, now=None):
+        """Returns the rollup buckets of the last seconds at the given resolution"""
+        series = self.series.get(key)
+        if series is None:
+            return []
+        now = now or time.time()
+        for rollup in series.rollups:
+            if rollup.resolution == resolution:
+                return rollup.since(now - seconds)
+        return []
+
+    def summary(self, key, seconds, now=None):
+        """
+        Returns {"count", "min", "max", "mean", "first", "last"} over the last seconds, or None.
+
+        Uses the raw samples when they cover the window and otherwise the finest
+        rollup that does (whole buckets, so the window edge is approximate).
+        """
+        series = self.series.get(key)
+        if series is None or not len(series.samples):
+            return None
+        now = now or time.time()
+        start = now - seconds
+
+        samples = series.samples
+        if len(samples) < samples.capacity or samples.get(0, 0) <= start:
+            _, values = self.window(key, seconds, now)
+            if not values:
+                return None
+            return {
+                "count": len(values),
+                "min": min(values),
+                "max": max(values),
+                "mean": sum(values) / len(values),
+                "first": values[0],
+                "last": values[-1]
+            }
+
+        for rollup in series.rollups:
+            if len(rollup) <= rollup.capacity or rollup.first_time() <= start:
+                buckets = rollup.since(start)
+                if not buckets:
+                    return None
+                count = sum(bucket["count"] for bucket in buckets)
+                return {
+                    "count": int(count),
+                    "min": min(bucket["low"] for bucket in buckets),
+                    "max": max(bucket["high"] for bucket in buckets),
+                    "mean": sum(bucket["sum"] for bucket in buckets) / count,
+                    "first": buckets[0]["open"],
+                    "last": buckets[-1]["close"]
+                }
+        return None
+
+
+def parse_window(text):
+    """Parses a time window like '90s', '30m', '24h' or '7d' into seconds (None if invalid)"""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    text = text.strip().lower()
+    if len(text) < 2 or text[-1] not in units:
+        return None
+    try:
+        amount = float(text[:-1])
+    except ValueError:
+        return None
+    return amount * units[text[-1]] if amount > 0 else None